@@ -1,10 +1,24 @@
 from fastapi import APIRouter, Depends, HTTPException, Request
 from pydantic import BaseModel
 from datetime import timedelta
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.auth.jwt import create_access_token, verify_admin, verify_password
 from app.config import settings
 from app.utils.logger import logger
 from app.middleware.rate_limit import limiter
+from app.models.records import SegmentRecord, RulesRecord
+from app.cache import cache
+from app.database import get_db
+from app.database.models import AnalysisJob, AnalysisRun
+from app.services.analysis_jobs import (
+    ACTIVE_STATES,
+    enqueue_job,
+    job_status,
+    request_cancel,
+)
+from app.services.analysis_engine import HOURLY_JOB_NAME
+from app.services.run_telemetry import compare_runs
 
 # Admin routes
 router = APIRouter(prefix="/api/admin", tags=["admin"])
@@ -63,21 +77,100 @@ async def login(req: Request, request: LoginRequest):
         raise HTTPException(status_code=500, detail="Login failed")
 
 
-@router.post("/trigger-analysis", dependencies=[Depends(verify_admin)])
-async def trigger_analysis():
+class TriggerAnalysisRequest(BaseModel):
+    full: bool = False  # Re-segment every known user, not only due ones
+    fresh: bool = False  # Call the LLM even where a cached response exists
+
+
+@router.post("/trigger-analysis", status_code=202, dependencies=[Depends(verify_admin)])
+async def trigger_analysis(
+    request: Optional[TriggerAnalysisRequest] = None,
+    db: AsyncSession = Depends(get_db),
+):
     """
-    Manually trigger analysis job (protected endpoint)
-    Requires valid JWT token in Authorization header
+    Queue an analysis job (protected endpoint)
+    Returns the already queued or running job instead of adding a duplicate
     """
     try:
-        # TODO: Implement manual analysis trigger
-        logger.info("Manual analysis triggered by admin")
-        return {"status": "triggered", "message": "Analysis job queued"}
+        kind = "full_analysis" if request and request.full else "analysis"
+        fresh = bool(request and request.fresh)
+        job, created = await enqueue_job(
+            db, kind, requested_by="admin", use_cache=not fresh
+        )
+        logger.info(
+            f"Manual {kind} {'queued' if created else 'already pending'}: job {job.id}"
+        )
+        return {
+            "status": "queued" if created else "duplicate",
+            "job_id": job.id,
+            "state": job.state,
+            "message": "Analysis job queued"
+            if created
+            else "An analysis job of this kind is already pending",
+        }
     except Exception as e:
         logger.error(f"Failed to trigger analysis: {e}")
         raise HTTPException(status_code=500, detail="Failed to trigger analysis")
 
 
+@router.get("/jobs/{job_id}", dependencies=[Depends(verify_admin)])
+async def get_job(job_id: int, db: AsyncSession = Depends(get_db)):
+    """Get state, progress and throughput of an analysis job"""
+    job = await db.get(AnalysisJob, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_status(job)
+
+
+@router.post("/jobs/{job_id}/cancel", dependencies=[Depends(verify_admin)])
+async def cancel_job(job_id: int, db: AsyncSession = Depends(get_db)):
+    """Cancel a queued job, or stop a running one after its current batch"""
+    job = await db.get(AnalysisJob, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.state not in ACTIVE_STATES:
+        raise HTTPException(status_code=409, detail=f"Job already {job.state}")
+    await request_cancel(db, job)
+    logger.info(f"Cancellation requested for analysis job {job_id}")
+    return job_status(job)
+
+
+@router.get("/runs", dependencies=[Depends(verify_admin)])
+async def get_runs(
+    job: str = HOURLY_JOB_NAME, limit: int = 10, db: AsyncSession = Depends(get_db)
+):
+    """Compare telemetry of a job's recent finished runs against their median"""
+    from sqlalchemy import select
+
+    limit = max(1, min(limit, 100))
+    stmt = (
+        select(AnalysisRun)
+        .where(AnalysisRun.job_name == job, AnalysisRun.finished_at.isnot(None))
+        .order_by(AnalysisRun.id.desc())
+        .limit(limit)
+    )
+    runs = (await db.execute(stmt)).scalars().all()
+    comparison = compare_runs(
+        [run.telemetry or {} for run in runs], settings.RUN_REGRESSION_FACTOR
+    )
+    return {
+        "job": job,
+        "baseline": comparison["baseline"],
+        "runs": [
+            {
+                "run_id": run.id,
+                "state": run.state,
+                "started_at": run.started_at.isoformat() if run.started_at else None,
+                "finished_at": run.finished_at.isoformat(),
+                "resumed_count": run.resumed_count or 0,
+                "telemetry": run.telemetry or {},
+                "regressions": regressions,
+            }
+            for run, regressions in zip(runs, comparison["regressions"])
+        ],
+    }
+
+
 @router.get("/segments", dependencies=[Depends(verify_admin)])
 async def get_segments():
     """Get user segment distribution"""
@@ -335,9 +428,9 @@ async def get_rules():
             total_rules = count_result.scalar() or 0
 
             # Get all rules
-            rules_stmt = select(PersonalizationRules)
+            rules_stmt = select(*RulesRecord.select_columns())
             rules_result = await session.execute(rules_stmt)
-            rules = rules_result.scalars().all()
+            rules = [RulesRecord.from_row(row) for row in rules_result]
 
             rules_data = []
             for rule in rules:
@@ -349,6 +442,7 @@ async def get_rules():
                         "highlight_skills": rule.highlight_skills,
                         "reasoning": rule.reasoning,
                         "xai_explanation": rule.xai_explanation,
+                        "manual": rule.manual,
                         "created_at": (
                             rule.created_at.isoformat() if rule.created_at else None
                         ),
@@ -372,14 +466,14 @@ async def get_insights():
         async with get_async_session() as session:
             # Get recent segments with xAI explanations
             stmt = (
-                select(UserSegment)
+                select(*SegmentRecord.select_columns())
                 .where(UserSegment.xai_explanation.isnot(None))
                 .order_by(UserSegment.analyzed_at.desc())
                 .limit(10)
             )
 
             result = await session.execute(stmt)
-            segments = result.scalars().all()
+            segments = [SegmentRecord.from_row(row) for row in result]
 
             insights = []
             for segment in segments:
@@ -416,7 +510,8 @@ class RuleOverrideRequest(BaseModel):
 async def create_or_update_rule(request: RuleOverrideRequest):
     """
     Create or update personalization rules for a segment
-    Allows manual override of AI-generated rules
+    Allows manual override of AI-generated rules; the hourly analysis
+    leaves manual rules alone until they are deleted
     """
     try:
         from sqlalchemy import select
@@ -438,6 +533,7 @@ async def create_or_update_rule(request: RuleOverrideRequest):
                 existing_rule.featured_projects = request.featured_projects
                 existing_rule.highlight_skills = request.highlight_skills
                 existing_rule.css_overrides = request.css_overrides
+                existing_rule.manual = True
                 existing_rule.reasoning = (
                     request.reasoning
                     or f"Manual override at {datetime.utcnow().isoformat()}"
@@ -459,6 +555,7 @@ async def create_or_update_rule(request: RuleOverrideRequest):
                     featured_projects=request.featured_projects,
                     highlight_skills=request.highlight_skills,
                     css_overrides=request.css_overrides,
+                    manual=True,
                     reasoning=request.reasoning
                     or f"Manual creation at {datetime.utcnow().isoformat()}",
                     xai_explanation={
@@ -473,6 +570,7 @@ async def create_or_update_rule(request: RuleOverrideRequest):
                 action = "created"
 
             await session.commit()
+            await cache.delete(RulesRecord.cache_key(request.segment))
 
             return {
                 "status": "success",
@@ -513,6 +611,7 @@ async def delete_rule(segment: str):
             )
             await session.execute(delete_stmt)
             await session.commit()
+            await cache.delete(RulesRecord.cache_key(segment))
 
             logger.info(f"Deleted rule for segment {segment}")
 
@@ -4,6 +4,9 @@ from sqlalchemy import select
 from app.models.rules import PersonalizationRulesResponse, PersonalizationRequest
 from app.models.events import EventPayload, EventResponse
 from app.models.segments import UserSegmentResponse
+from app.models.records import SegmentRecord, RulesRecord
+from app.cache import cache
+from app.config import settings
 from app.database import get_db
 from app.database.models import UserSegment, PersonalizationRules, AnalyticsRaw
 from app.utils.logger import logger
@@ -69,27 +72,47 @@ async def get_personalization(
     try:
         logger.info(f"Fetching personalization for user {user_id}")
 
-        # Look up user segment
-        stmt = select(UserSegment).where(UserSegment.user_pseudo_id == user_id)
-        result = await db.execute(stmt)
-        user_segment = result.scalar_one_or_none()
+        # Look up user segment (cache first, then a plain column select)
+        user_segment = None
+        cached_segment = await cache.get(SegmentRecord.cache_key(user_id))
+        if cached_segment:
+            user_segment = SegmentRecord.from_cache(cached_segment)
+        else:
+            stmt = select(*SegmentRecord.select_columns()).where(
+                UserSegment.user_pseudo_id == user_id
+            )
+            result = await db.execute(stmt)
+            row = result.one_or_none()
+            if row:
+                user_segment = SegmentRecord.from_row(row)
 
         if not user_segment:
             logger.warning(f"No segment found for user {user_id}, returning default")
             # Return default rules
-            user_segment = UserSegment(
+            user_segment = SegmentRecord(
                 user_pseudo_id=user_id,
                 segment="CASUAL",
                 confidence=0.5,
                 reasoning="First visit - no profile yet",
             )
 
-        # Get rules for segment
-        stmt = select(PersonalizationRules).where(
-            PersonalizationRules.segment == user_segment.segment
-        )
-        result = await db.execute(stmt)
-        rules = result.scalar_one_or_none()
+        # Get rules for segment (cache first; writers replace or drop the key)
+        rules = None
+        rules_key = RulesRecord.cache_key(user_segment.segment)
+        cached_rules = await cache.get(rules_key)
+        if cached_rules:
+            rules = RulesRecord.from_cache(cached_rules)
+        else:
+            stmt = select(*RulesRecord.select_columns()).where(
+                PersonalizationRules.segment == user_segment.segment
+            )
+            result = await db.execute(stmt)
+            row = result.one_or_none()
+            if row:
+                rules = RulesRecord.from_row(row)
+                await cache.set(
+                    rules_key, rules.to_cache(), ttl=settings.RULES_CACHE_TTL
+                )
 
         if not rules:
             logger.info(
@@ -105,10 +128,10 @@ async def get_personalization(
 
         return PersonalizationRulesResponse(
             segment=rules.segment,
-            priority_sections=rules.priority_sections or [],
-            featured_projects=rules.featured_projects or [],
-            highlight_skills=rules.highlight_skills or [],
-            reasoning=rules.reasoning or "",
+            priority_sections=rules.priority_sections,
+            featured_projects=rules.featured_projects,
+            highlight_skills=rules.highlight_skills,
+            reasoning=rules.reasoning,
         )
     except Exception as e:
         logger.error(f"Failed to get personalization: {e}")
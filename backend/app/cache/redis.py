@@ -2,7 +2,7 @@
 
 import json
 import redis.asyncio as aioredis
-from typing import Any, Optional
+from typing import Any, Dict, List, Optional
 from app.utils.logger import logger
 from app.config import settings
 
@@ -94,6 +94,83 @@ class RedisCache:
             logger.warning(f"Cache set failed for key {key}: {e}")
             return False
 
+    async def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """Retrieve several keys in one round trip
+
+        Args:
+            keys: Cache keys
+
+        Returns:
+            Deserialized values for the keys that were found
+        """
+        try:
+            if not self.client or not keys:
+                return {}
+
+            values = await self.client.mget(keys)
+            found = {}
+            for key, value in zip(keys, values):
+                if value is None:
+                    continue
+                try:
+                    found[key] = json.loads(value)
+                except json.JSONDecodeError:
+                    logger.warning(f"Failed to deserialize cached value for key {key}")
+            return found
+        except Exception as e:
+            logger.warning(f"Cache get_many failed for {len(keys)} keys: {e}")
+            return {}
+
+    async def set_many(self, items: Dict[str, Any], ttl: int = None) -> bool:
+        """Store several values in one pipelined round trip
+
+        Args:
+            items: Values to cache by key (will be JSON serialized)
+            ttl: Time to live in seconds (None for no expiration)
+
+        Returns:
+            True if successful, False otherwise
+        """
+        try:
+            if not self.client or not items:
+                return False
+
+            async with self.client.pipeline(transaction=False) as pipe:
+                for key, value in items.items():
+                    serialized = json.dumps(value)
+                    if ttl:
+                        pipe.setex(key, ttl, serialized)
+                    else:
+                        pipe.set(key, serialized)
+                await pipe.execute()
+
+            return True
+        except Exception as e:
+            logger.warning(f"Cache set_many failed for {len(items)} keys: {e}")
+            return False
+
+    async def run_script(
+        self, script: str, keys: List[str], args: List[Any]
+    ) -> Optional[Any]:
+        """Run a Lua script atomically on the server
+
+        Args:
+            script: Lua source
+            keys: Keys the script touches
+            args: Script arguments
+
+        Returns:
+            The script's reply, or None if Redis is unavailable or it failed
+        """
+        try:
+            if not self.client:
+                return None
+
+            return await self.client.eval(script, len(keys), *keys, *args)
+        except Exception as e:
+            logger.warning(f"Cache script failed for keys {keys}: {e}")
+            return None
+
     async def delete(self, key: str) -> bool:
         """Remove key from cache
 
@@ -16,6 +16,64 @@ class Settings(BaseSettings):
     ENVIRONMENT: str = "development"
     LOG_LEVEL: str = "INFO"
 
+    # Process roles
+    SCHEDULER_ENABLED: bool = True  # Run scheduled analysis jobs in API processes
+    WORKER_METRICS_PORT: int = 9100  # Prometheus port of app.worker (0 disables)
+
+    # Analysis job tuning
+    ANALYSIS_CONCURRENCY: int = 8  # Concurrent segmentation workers
+    LLM_SEGMENT_BATCH_SIZE: int = 20  # Users classified per LLM prompt
+    ANALYSIS_WRITE_BATCH_SIZE: int = 500  # Segments upserted per commit
+    HEURISTIC_CONFIDENCE_THRESHOLD: float = 0.75  # Below this, escalate to LLM
+    SEGMENT_MEMO_TTL: int = 604800  # Fingerprint memo lifetime (7 days)
+    RULES_DRIFT_THRESHOLD: float = 0.15  # Event-mix drift that triggers new rules
+    RULES_CACHE_TTL: int = 86400  # Cached personalization rules lifetime (1 day)
+    EVENT_WATERMARK_LAG: int = 120  # Seconds before the watermark passes an event
+    SEGMENT_TTL_HOURS: int = 24  # Base segment lifetime at 0.5 confidence
+    SEGMENT_TTL_MIN_HOURS: int = 6  # Shortest lifetime for low-confidence segments
+    SEGMENT_TTL_MAX_HOURS: int = 168  # Longest lifetime for stable segments
+    RESEGMENT_LLM_BUDGET: int = 50  # LLM classifications per queue drain
+    RESEGMENT_DRAIN_INTERVAL: int = 60  # Seconds between queue drains
+    RESEGMENT_CLAIM_LEASE: int = 600  # Seconds before an unfinished claim is retried
+    ANALYSIS_JOB_POLL_INTERVAL: int = 10  # Seconds between admin job queue polls
+    RUN_REGRESSION_FACTOR: float = 1.5  # Phase slowdown vs. median flagged by /runs
+
+    # LLM HTTP client
+    LLM_HTTP2: bool = True  # Negotiate HTTP/2 when the h2 package is installed
+    LLM_MAX_CONNECTIONS: int = 20  # Pooled connections per process
+    LLM_KEEPALIVE_CONNECTIONS: int = 10  # Idle connections kept open
+    LLM_KEEPALIVE_EXPIRY: float = 30.0  # Seconds an idle connection is kept
+    LLM_CONNECT_TIMEOUT: float = 5.0  # Seconds to connect or wait for the pool
+    LLM_READ_TIMEOUT: float = 60.0  # Seconds between response bytes
+    LLM_TOTAL_TIMEOUT: float = 90.0  # Seconds for a whole LLM request
+    LLM_HEDGE_SEGMENTATION: bool = True  # Hedge slow segmentation calls
+    LLM_HEDGE_RULES: bool = False  # Hedge slow rule generation calls
+    LLM_HEDGE_QUANTILE: float = 0.95  # Primary latency quantile that triggers a hedge
+    LLM_HEDGE_DELAY: float = 8.0  # Hedge delay until enough latency samples exist
+    LLM_HEDGE_MIN_SAMPLES: int = 20  # Samples needed before using the quantile
+    LLM_HEALTH_EWMA_ALPHA: float = 0.2  # Weight of the newest call in health EWMAs
+    LLM_BREAKER_FAILURES: int = 5  # Consecutive failures that open a circuit
+    LLM_BREAKER_ERROR_RATE: float = 0.5  # EWMA error rate that opens a circuit
+    LLM_BREAKER_MIN_CALLS: int = 10  # Calls before the error rate can open it
+    LLM_BREAKER_COOLDOWN: float = 60.0  # Seconds before an open circuit is probed
+    LLM_RATE_PER_MINUTE: dict[str, float] = {
+        "gemini": 1000,
+        "deepseek": 600,
+    }  # Requests per minute per provider, shared by all processes
+    LLM_RATE_BURST: int = 10  # Requests a full token bucket admits at once
+    LLM_RATE_MAX_WAIT: float = 5.0  # Longest wait for a token before falling back
+    LLM_AIMD_INITIAL: int = 4  # Starting in-flight calls per provider and process
+    LLM_AIMD_MIN: int = 1  # Floor of the adaptive concurrency limit
+    LLM_AIMD_MAX: int = 32  # Ceiling of the adaptive concurrency limit
+    LLM_AIMD_BACKOFF: float = 0.5  # Limit multiplier on a 429 or timeout
+    LLM_CACHE_ENABLED: bool = True  # Answer repeated prompts from llm_response_cache
+    LLM_CACHE_TTL: int = 604800  # Cached response lifetime (7 days)
+    LLM_CACHE_MAX_ENTRIES: int = 50000  # Rows kept by eviction, least recently hit out
+    LLM_CACHE_EVICT_INTERVAL: int = 3600  # Seconds between cache eviction runs
+    LLM_CONTEXT_TOKEN_BUDGET: int = 4000  # Estimated tokens allowed for prompt context
+    LLM_CONTEXT_TOP_K: int = 8  # Entries kept per count/duration map in the context
+    LLM_CONTEXT_PRECISION: int = 1  # Decimals kept for floats in the context
+
     class Config:
         env_file = ".env"
         case_sensitive = True
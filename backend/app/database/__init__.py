@@ -5,6 +5,11 @@ from app.database.models import (
     UserSegment,
     PersonalizationRules,
     LLMInsights,
+    AnalysisWatermark,
+    ResegmentQueue,
+    AnalysisJob,
+    AnalysisRun,
+    LLMResponseCache,
 )
 
 __all__ = [
@@ -17,4 +22,9 @@ __all__ = [
     "UserSegment",
     "PersonalizationRules",
     "LLMInsights",
+    "AnalysisWatermark",
+    "ResegmentQueue",
+    "AnalysisJob",
+    "AnalysisRun",
+    "LLMResponseCache",
 ]
@@ -31,6 +31,11 @@ async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False
 Base = declarative_base()
 
 
+def get_async_session() -> AsyncSession:
+    """New session, for use as `async with get_async_session() as session`"""
+    return async_session()
+
+
 async def get_db():
     async with async_session() as session:
         yield session
@@ -1,4 +1,5 @@
 from sqlalchemy import (
+    Boolean,
     Column,
     Integer,
     String,
@@ -7,16 +8,26 @@ from sqlalchemy import (
     DateTime,
     Index,
     BigInteger,
+    JSON,
+    text,
 )
-from sqlalchemy.dialects.postgresql import ARRAY, JSONB
+from sqlalchemy.dialects import postgresql
 from datetime import datetime
 from app.database.db import Base
 
+# Postgres types with SQLite fallbacks for local replays and benchmarks
+JSONB = postgresql.JSONB().with_variant(JSON(), "sqlite")
+BigIntPK = BigInteger().with_variant(Integer(), "sqlite")  # SQLite rowid alias
+
+
+def StringArray():
+    return postgresql.ARRAY(String).with_variant(JSON(), "sqlite")
+
 
 class AnalyticsRaw(Base):
     __tablename__ = "analytics_raw"
 
-    id = Column(BigInteger, primary_key=True)
+    id = Column(BigIntPK, primary_key=True)
     ga4_event_id = Column(String, unique=True, nullable=False)
     event_name = Column(String, nullable=False)
     user_pseudo_id = Column(String, nullable=False)
@@ -34,7 +45,7 @@ class AnalyticsRaw(Base):
 class UserSegment(Base):
     __tablename__ = "user_segments"
 
-    id = Column(BigInteger, primary_key=True)
+    id = Column(BigIntPK, primary_key=True)
     user_pseudo_id = Column(String, unique=True, nullable=False)
     segment = Column(
         String, nullable=False
@@ -57,14 +68,16 @@ class UserSegment(Base):
 class PersonalizationRules(Base):
     __tablename__ = "personalization_rules"
 
-    id = Column(BigInteger, primary_key=True)
+    id = Column(BigIntPK, primary_key=True)
     segment = Column(String, unique=True, nullable=False)
-    priority_sections = Column(ARRAY(String))
-    featured_projects = Column(ARRAY(String))
-    highlight_skills = Column(ARRAY(String))
+    priority_sections = Column(StringArray())
+    featured_projects = Column(StringArray())
+    highlight_skills = Column(StringArray())
     css_overrides = Column(JSONB)
     reasoning = Column(Text)  # Brief summary
     xai_explanation = Column(JSONB)  # Full xAI explanation
+    input_summary = Column(JSONB)  # Event aggregate the rules were built from
+    manual = Column(Boolean, default=False)  # Admin override, never regenerated
     created_at = Column(DateTime, default=datetime.utcnow)
 
     __table_args__ = (Index("idx_segment_rules", "segment"),)
@@ -73,7 +86,7 @@ class PersonalizationRules(Base):
 class LLMInsights(Base):
     __tablename__ = "llm_insights"
 
-    id = Column(BigInteger, primary_key=True)
+    id = Column(BigIntPK, primary_key=True)
     analysis_period = Column(String)  # ISO date range
     total_visitors = Column(Integer)
     segment_distribution = Column(JSONB)
@@ -84,3 +97,96 @@ class LLMInsights(Base):
     generated_at = Column(DateTime, default=datetime.utcnow)
 
     __table_args__ = (Index("idx_analysis_period", "analysis_period"),)
+
+
+class AnalysisWatermark(Base):
+    __tablename__ = "analysis_watermarks"
+
+    job_name = Column(String, primary_key=True)
+    last_event_id = Column(BigInteger, nullable=False, default=0)  # analytics_raw.id
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class ResegmentQueue(Base):
+    __tablename__ = "resegment_queue"
+
+    user_pseudo_id = Column(String, primary_key=True)
+    due_at = Column(DateTime, nullable=False)  # Segment expiry, or now on activity
+    confidence = Column(Float, default=0.0)  # Confidence of the current segment
+    active = Column(Boolean, default=False)  # New events since last segmentation
+    claimed_by_run = Column(BigInteger)  # analysis_runs.id of an unfinished claim
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (Index("idx_resegment_due", "due_at"),)
+
+
+class AnalysisJob(Base):
+    __tablename__ = "analysis_jobs"
+
+    id = Column(BigIntPK, primary_key=True)
+    kind = Column(String, nullable=False)  # analysis, full_analysis
+    state = Column(
+        String, nullable=False, default="queued"
+    )  # queued, running, succeeded, failed, cancelled
+    users_total = Column(Integer)  # Due users at drain start, None until counted
+    users_done = Column(Integer, default=0)
+    users_failed = Column(Integer, default=0)
+    error = Column(Text)
+    cancel_requested = Column(Boolean, default=False)
+    requested_by = Column(String)
+    use_cache = Column(Boolean, default=True)  # False: skip cached LLM responses
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+
+    __table_args__ = (
+        Index("idx_analysis_jobs_state", "state", "id"),
+        # At most one queued or running job per kind
+        Index(
+            "uq_analysis_jobs_active_kind",
+            "kind",
+            unique=True,
+            postgresql_where=text("state IN ('queued', 'running')"),
+            sqlite_where=text("state IN ('queued', 'running')"),
+        ),
+    )
+
+
+class AnalysisRun(Base):
+    __tablename__ = "analysis_runs"
+
+    id = Column(BigIntPK, primary_key=True)
+    job_name = Column(String, nullable=False)
+    state = Column(
+        String, nullable=False, default="running"
+    )  # running, completed, failed
+    phase = Column(String, nullable=False, default="started")  # Last checkpointed phase
+    event_low = Column(BigInteger)  # analytics_raw.id window of the run
+    event_high = Column(BigInteger)
+    users_done = Column(Integer, default=0)
+    users_failed = Column(Integer, default=0)
+    llm_classified = Column(Integer, default=0)
+    resumed_count = Column(Integer, default=0)
+    telemetry = Column(JSONB)  # RunTelemetry snapshot: phase timings, LLM, cache
+    started_at = Column(DateTime, default=datetime.utcnow)
+    checkpoint_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime)
+
+    __table_args__ = (Index("idx_analysis_runs_job_state", "job_name", "state"),)
+
+
+class LLMResponseCache(Base):
+    __tablename__ = "llm_response_cache"
+
+    key = Column(String(64), primary_key=True)  # sha256 of model and full prompt
+    model = Column(String, nullable=False)
+    response = Column(Text, nullable=False)
+    hits = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_hit_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("idx_llm_response_cache_expires", "expires_at"),
+        Index("idx_llm_response_cache_last_hit", "last_hit_at"),
+    )
@@ -0,0 +1,41 @@
+"""Dialect-aware bulk INSERT ... ON CONFLICT DO UPDATE"""
+
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def dialect_insert(session: AsyncSession, model: Any):
+    """INSERT construct with ON CONFLICT support for the session's dialect"""
+    dialect = session.get_bind().dialect.name
+    if dialect not in _INSERTS:
+        raise NotImplementedError(f"Upsert not supported for dialect {dialect}")
+    return _INSERTS[dialect](model)
+
+
+def upsert_statement(
+    session: AsyncSession,
+    model: Any,
+    rows: List[Dict[str, Any]],
+    index_elements: Sequence[str],
+    update_columns: Optional[Sequence[str]] = None,
+):
+    """Build a multi-row upsert for the session's dialect
+
+    Args:
+        session: Session whose bind decides the dialect
+        model: ORM model to insert into
+        rows: Column values per row (must not repeat a conflict key)
+        index_elements: Columns of the unique constraint to conflict on
+        update_columns: Columns to overwrite on conflict (default: all others)
+    """
+    stmt = dialect_insert(session, model).values(rows)
+    if update_columns is None:
+        update_columns = [c for c in rows[0] if c not in index_elements]
+    return stmt.on_conflict_do_update(
+        index_elements=list(index_elements),
+        set_={column: stmt.excluded[column] for column in update_columns},
+    )
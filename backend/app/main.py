@@ -6,7 +6,9 @@ from prometheus_client import generate_latest
 from slowapi.errors import RateLimitExceeded
 from app.database import init_db
 from app.cache import cache
-from app.services.scheduler import start_scheduler
+from app.utils.http_client import http_client
+from app.services.scheduler import start_scheduler, stop_scheduler
+from app.config import settings
 from app.utils.logger import logger
 from app.middleware.metrics import MetricsMiddleware
 from app.middleware.rate_limit import limiter, rate_limit_error_handler
@@ -19,11 +21,16 @@ async def lifespan(app: FastAPI):
     logger.info("Starting up...")
     await init_db()
     await cache.connect()
-    start_scheduler()
+    # Deployments running app.worker disable the in-process scheduler
+    if settings.SCHEDULER_ENABLED:
+        start_scheduler()
     yield
     # Shutdown
     logger.info("Shutting down...")
+    if settings.SCHEDULER_ENABLED:
+        stop_scheduler()
     await cache.disconnect()
+    await http_client.close()
 
 
 app = FastAPI(
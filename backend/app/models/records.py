@@ -0,0 +1,212 @@
+"""Immutable value records shared by the DB, cache and API layers
+
+Read paths select plain columns into these records instead of hydrating
+ORM instances, and the cache stores their dict form directly.
+"""
+
+import json
+from dataclasses import dataclass, field, fields
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Union
+
+from app.database.models import UserSegment, PersonalizationRules
+
+
+def _parse_datetime(value: Any) -> Optional[datetime]:
+    """Accept datetimes or ISO strings coming back from the cache"""
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
+
+
+def _format_datetime(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+@dataclass(frozen=True, slots=True)
+class SegmentRecord:
+    """Read-only snapshot of a user's segment"""
+
+    user_pseudo_id: str
+    segment: str
+    confidence: float = 0.5
+    reasoning: str = ""
+    xai_explanation: Dict[str, Any] = field(default_factory=dict)
+    event_summary: Dict[str, Any] = field(default_factory=dict)
+    expires_at: Optional[datetime] = None
+    analyzed_at: Optional[datetime] = None
+    id: Optional[int] = None
+
+    @staticmethod
+    def cache_key(user_pseudo_id: str) -> str:
+        """Redis key holding the cached segment for a user"""
+        return f"user_segment:{user_pseudo_id}"
+
+    @staticmethod
+    def select_columns() -> List[Any]:
+        """Columns to select so rows map 1:1 onto the record fields"""
+        return [getattr(UserSegment, f.name) for f in fields(SegmentRecord)]
+
+    @classmethod
+    def from_row(cls, row: Any) -> "SegmentRecord":
+        """Build from a column-select Row or any object with matching attributes"""
+        return cls(
+            user_pseudo_id=row.user_pseudo_id,
+            segment=row.segment,
+            confidence=row.confidence if row.confidence is not None else 0.5,
+            reasoning=row.reasoning or "",
+            xai_explanation=row.xai_explanation or {},
+            event_summary=row.event_summary or {},
+            expires_at=row.expires_at,
+            analyzed_at=getattr(row, "analyzed_at", None),
+            id=getattr(row, "id", None),
+        )
+
+    @classmethod
+    def from_cache(cls, data: Dict[str, Any]) -> "SegmentRecord":
+        """Build from the dict stored in Redis"""
+        return cls(
+            user_pseudo_id=data["user_pseudo_id"],
+            segment=data["segment"],
+            confidence=data.get("confidence", 0.5),
+            reasoning=data.get("reasoning") or "",
+            xai_explanation=data.get("xai_explanation") or {},
+            event_summary=data.get("event_summary") or {},
+            expires_at=_parse_datetime(data.get("expires_at")),
+            analyzed_at=_parse_datetime(data.get("analyzed_at")),
+            id=data.get("id"),
+        )
+
+    @classmethod
+    def from_json(cls, raw: Union[str, bytes]) -> "SegmentRecord":
+        return cls.from_cache(json.loads(raw))
+
+    def to_cache(self) -> Dict[str, Any]:
+        """JSON-safe dict for Redis and API responses"""
+        return {
+            "id": self.id,
+            "user_pseudo_id": self.user_pseudo_id,
+            "segment": self.segment,
+            "confidence": self.confidence,
+            "reasoning": self.reasoning,
+            "xai_explanation": self.xai_explanation,
+            "event_summary": self.event_summary,
+            "expires_at": _format_datetime(self.expires_at),
+            "analyzed_at": _format_datetime(self.analyzed_at),
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_cache())
+
+    def to_row(self) -> Dict[str, Any]:
+        """Column values for an insert/upsert (the id is assigned by the DB)"""
+        return {
+            "user_pseudo_id": self.user_pseudo_id,
+            "segment": self.segment,
+            "confidence": self.confidence,
+            "reasoning": self.reasoning,
+            "xai_explanation": self.xai_explanation,
+            "event_summary": self.event_summary,
+            "analyzed_at": self.analyzed_at,
+            "expires_at": self.expires_at,
+        }
+
+
+@dataclass(frozen=True, slots=True)
+class RulesRecord:
+    """Read-only snapshot of a segment's personalization rules"""
+
+    segment: str
+    priority_sections: List[str] = field(default_factory=list)
+    featured_projects: List[str] = field(default_factory=list)
+    highlight_skills: List[str] = field(default_factory=list)
+    css_overrides: Dict[str, Any] = field(default_factory=dict)
+    reasoning: str = ""
+    xai_explanation: Dict[str, Any] = field(default_factory=dict)
+    input_summary: Dict[str, Any] = field(default_factory=dict)
+    manual: bool = False
+    created_at: Optional[datetime] = None
+    id: Optional[int] = None
+
+    @staticmethod
+    def cache_key(segment: str) -> str:
+        """Redis key holding the cached rules for a segment"""
+        return f"personalization_rules:{segment}"
+
+    @staticmethod
+    def select_columns(input_summary: bool = False) -> List[Any]:
+        """Columns to select so rows map onto the record fields
+
+        input_summary is only read by the rules drift check, so read paths
+        leave that JSON column out unless asked for it.
+        """
+        return [
+            getattr(PersonalizationRules, f.name)
+            for f in fields(RulesRecord)
+            if input_summary or f.name != "input_summary"
+        ]
+
+    @classmethod
+    def from_row(cls, row: Any) -> "RulesRecord":
+        """Build from a column-select Row or any object with matching attributes"""
+        return cls(
+            segment=row.segment,
+            priority_sections=list(row.priority_sections or []),
+            featured_projects=list(row.featured_projects or []),
+            highlight_skills=list(row.highlight_skills or []),
+            css_overrides=getattr(row, "css_overrides", None) or {},
+            reasoning=row.reasoning or "",
+            xai_explanation=row.xai_explanation or {},
+            input_summary=getattr(row, "input_summary", None) or {},
+            manual=bool(getattr(row, "manual", False)),
+            created_at=getattr(row, "created_at", None),
+            id=getattr(row, "id", None),
+        )
+
+    @classmethod
+    def from_cache(cls, data: Dict[str, Any]) -> "RulesRecord":
+        """Build from the dict stored in Redis"""
+        return cls(
+            segment=data["segment"],
+            priority_sections=data.get("priority_sections") or [],
+            featured_projects=data.get("featured_projects") or [],
+            highlight_skills=data.get("highlight_skills") or [],
+            css_overrides=data.get("css_overrides") or {},
+            reasoning=data.get("reasoning") or "",
+            xai_explanation=data.get("xai_explanation") or {},
+            input_summary=data.get("input_summary") or {},
+            manual=bool(data.get("manual")),
+            created_at=_parse_datetime(data.get("created_at")),
+            id=data.get("id"),
+        )
+
+    def to_cache(self) -> Dict[str, Any]:
+        """JSON-safe dict for Redis and API responses"""
+        return {
+            "id": self.id,
+            "segment": self.segment,
+            "priority_sections": self.priority_sections,
+            "featured_projects": self.featured_projects,
+            "highlight_skills": self.highlight_skills,
+            "css_overrides": self.css_overrides,
+            "reasoning": self.reasoning,
+            "xai_explanation": self.xai_explanation,
+            "input_summary": self.input_summary,
+            "manual": self.manual,
+            "created_at": _format_datetime(self.created_at),
+        }
+
+    def to_row(self) -> Dict[str, Any]:
+        """Column values for an insert/upsert (the id is assigned by the DB)"""
+        return {
+            "segment": self.segment,
+            "priority_sections": self.priority_sections,
+            "featured_projects": self.featured_projects,
+            "highlight_skills": self.highlight_skills,
+            "css_overrides": self.css_overrides,
+            "reasoning": self.reasoning,
+            "xai_explanation": self.xai_explanation,
+            "input_summary": self.input_summary,
+            "manual": self.manual,
+            "created_at": self.created_at,
+        }
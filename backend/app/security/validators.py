@@ -5,6 +5,9 @@ from pydantic import BaseModel, Field, field_validator
 from typing import Optional, List, Dict, Any
 import json
 
+# Params aggregated as numbers by the analysis engine
+NUMERIC_EVENT_PARAMS = ("duration", "time_spent")
+
 
 class EventSegment(str, Enum):
     """User segment types."""
@@ -62,13 +65,19 @@ class ValidatedEvent(BaseModel):
     @field_validator("event_params")
     @classmethod
     def validate_event_params(cls, v: Dict[str, Any]) -> Dict[str, Any]:
-        """Validate event_params doesn't exceed 10KB when serialized."""
+        """Validate event_params size (max 10KB) and numeric timing params."""
         serialized = json.dumps(v)
         size_bytes = len(serialized.encode("utf-8"))
         if size_bytes > 10240:  # 10KB = 10240 bytes
             raise ValueError(
                 f"event_params exceeds maximum size of 10KB (current size: {size_bytes} bytes)"
             )
+        for key in NUMERIC_EVENT_PARAMS:
+            value = v.get(key)
+            if value is not None and (
+                isinstance(value, bool) or not isinstance(value, (int, float))
+            ):
+                raise ValueError(f"event_params.{key} must be a number")
         return v
 
     @field_validator("event_timestamp")
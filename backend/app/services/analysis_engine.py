@@ -1,203 +1,735 @@
-from typing import Dict, Any
+import asyncio
+from collections import Counter
+from contextlib import nullcontext
+from dataclasses import replace
+from typing import (
+    Any,
+    AsyncIterable,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from app.database.models import UserSegment, PersonalizationRules, AnalyticsRaw
+from sqlalchemy import case, func, select
+from app.database.models import (
+    UserSegment,
+    PersonalizationRules,
+    AnalyticsRaw,
+    AnalysisWatermark,
+)
+from app.models.records import SegmentRecord, RulesRecord
 from app.services.ga4_service import GA4Service
-from app.services.llm_service import LLMService
+from app.services.llm_service import DEFAULT_SEGMENT_REASONING, LLMService
+from app.services.heuristic_classifier import HeuristicClassifier
+from app.services.segment_memo import SegmentMemo, behavior_fingerprint
+from app.services.segment_writer import SegmentWriter
+from app.services.resegment_queue import (
+    adaptive_ttl,
+    claim_due_users,
+    enqueue_active_users,
+    release_claims,
+)
+from app.services.analysis_runs import checkpoint, finish_run, start_or_resume_run
+from app.services.run_telemetry import RunTelemetry, phase, record_cache
+from app.services.drift import distribution_drift
+from app.database.upsert import upsert_statement
+from app.utils.exceptions import LLMError
 from app.utils.logger import logger
+from app.utils.metrics import segmentation_decisions_total
 from app.cache import cache
+from app.config import settings
 from datetime import datetime, timedelta
 
+HOURLY_JOB_NAME = "hourly_analysis"
+DRAIN_JOB_NAME = "resegment_drain"
+
+SEGMENTS = ["ML_ENGINEER", "FULLSTACK_DEV", "RECRUITER", "STUDENT", "CASUAL"]
+
+# Segment assigned to users with no recorded events
+NO_EVENTS_SEGMENT = {
+    "segment": "CASUAL",
+    "confidence": 0.3,
+    "reasoning": "No events found",
+}
+
+
+def summarize_events(
+    distribution: Dict[str, int],
+    durations: Optional[Dict[str, float]] = None,
+    last_seen: Optional[datetime] = None,
+) -> Dict[str, Any]:
+    """Event summary for the LLM from per-event-name counts and durations"""
+    summary = {
+        "total_events": sum(distribution.values()),
+        "unique_event_types": sorted(distribution),
+        "event_distribution": distribution,
+    }
+    if durations:
+        summary["event_durations"] = durations
+    if last_seen:
+        summary["last_seen_at"] = last_seen.isoformat()
+    return summary
+
+
+def numeric_param(key: str, dialect: str):
+    """event_params[key] as a float, NULL unless it is a JSON number
+
+    Event params come from public clients, so a non-numeric value must not
+    make the cast (and the whole grouped query) fail.
+    """
+    params = AnalyticsRaw.event_params
+    if dialect == "postgresql":
+        is_number = func.jsonb_typeof(params[key]) == "number"
+    else:
+        is_number = func.json_type(params, f"$.{key}").in_(["integer", "real"])
+    return case((is_number, params[key].as_float()))
+
 
 class AnalysisEngine:
     """Core business logic for analyzing users and generating rules"""
 
     def __init__(
-        self, ga4_svc: GA4Service, llm_svc: LLMService, db_session: AsyncSession
+        self,
+        ga4_svc: GA4Service,
+        llm_svc: LLMService,
+        db_session: AsyncSession,
+        session_factory: Optional[Callable[[], AsyncSession]] = None,
+        concurrency: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        write_batch_size: Optional[int] = None,
+        classifier: Optional[HeuristicClassifier] = None,
+        memo: Optional[SegmentMemo] = None,
+        use_cache: bool = True,
     ):
         self.ga4 = ga4_svc
         self.llm = llm_svc
         self.db = db_session
-
-    async def segment_user(self, user_pseudo_id: str) -> UserSegment:
+        # Factory for per-worker sessions; an AsyncSession is not safe to share
+        self.session_factory = session_factory
+        self.concurrency = max(1, concurrency or settings.ANALYSIS_CONCURRENCY)
+        self.batch_size = max(1, batch_size or settings.LLM_SEGMENT_BATCH_SIZE)
+        self.write_batch_size = write_batch_size or settings.ANALYSIS_WRITE_BATCH_SIZE
+        # Batch writer used by segment_users workers; None writes immediately
+        self.writer: Optional[SegmentWriter] = None
+        self.classifier = classifier or HeuristicClassifier(
+            settings.HEURISTIC_CONFIDENCE_THRESHOLD
+        )
+        self.memo = memo or SegmentMemo()
+        # False makes every LLM call skip the response cache (fresh analysis)
+        self.use_cache = use_cache
+        # Decisions by source: unchanged, no_events, heuristic, memo, llm
+        self.decisions: Counter = Counter()
+
+    async def segment_user(self, user_pseudo_id: str) -> SegmentRecord:
         """Classify user into segment based on their events"""
         try:
             logger.info(f"Segmenting user {user_pseudo_id}")
 
             # Check cache first
-            cache_key = f"user_segment:{user_pseudo_id}"
-            cached_segment = await cache.get(cache_key)
+            cached_segment = await cache.get(SegmentRecord.cache_key(user_pseudo_id))
             if cached_segment:
                 logger.info(f"Cache hit for user segment {user_pseudo_id}")
-                return cached_segment
-
-            # Fetch user's events
-            stmt = (
-                select(AnalyticsRaw)
-                .where(AnalyticsRaw.user_pseudo_id == user_pseudo_id)
-                .order_by(AnalyticsRaw.created_at.desc())
-                .limit(50)
-            )
+                return SegmentRecord.from_cache(cached_segment)
 
-            result = await self.db.execute(stmt)
-            events = result.scalars().all()
-
-            if not events:
-                logger.warning(f"No events found for user {user_pseudo_id}")
-                # Default segment
-                segment_data = {
-                    "segment": "CASUAL",
-                    "confidence": 0.3,
-                    "reasoning": "No events found",
-                }
-            else:
-                # Aggregate event summary
-                event_summary = self._aggregate_events(events)
+            summaries = await self._load_event_summaries([user_pseudo_id])
+            results = await self._classify_summaries(summaries)
+            if not results:
+                raise LLMError(f"No segment available for user {user_pseudo_id}")
 
-                # Call LLM to classify
-                segment_data = await self.llm.segment_user(event_summary)
+            records = await self._save_segments(results)
+            return records[0]
+        except Exception as e:
+            logger.error(f"Segmentation failed for user {user_pseudo_id}: {e}")
+            raise
 
-                logger.info(
-                    f"User {user_pseudo_id} classified as {segment_data['segment']}"
+    async def segment_batch(self, user_ids: List[str]) -> List[SegmentRecord]:
+        """Re-segment users whose behavior changed, in one prompt and one commit
+
+        Users whose bucketed event summary still matches their stored
+        segment's summary keep that segment, with its lifetime extended.
+        Users the LLM could not classify are left out of the result and
+        stay claimed, so they are retried once the claim lease runs out.
+        """
+        now = datetime.utcnow()
+        kept = []
+        summaries = {}
+        with phase("event_fetch"):
+            existing = await self._load_existing_segments(user_ids)
+        loaded = await self._load_event_summaries(user_ids)
+        with phase("aggregation"):
+            for user_id, summary in loaded.items():
+                current = existing.get(user_id)
+                if (
+                    current
+                    and current.reasoning != DEFAULT_SEGMENT_REASONING
+                    and behavior_fingerprint(current.event_summary)
+                    == behavior_fingerprint(summary)
+                ):
+                    previous_ttl = (
+                        current.expires_at - current.analyzed_at
+                        if current.expires_at and current.analyzed_at
+                        else None
+                    )
+                    kept.append(
+                        replace(
+                            current,
+                            analyzed_at=now,
+                            expires_at=now
+                            + adaptive_ttl(current.confidence, previous_ttl),
+                        )
+                    )
+                    self._record_decision("unchanged")
+                    continue
+                summaries[user_id] = summary
+
+        results = await self._classify_summaries(summaries)
+        return await self._save_segments(results, kept)
+
+    async def _load_existing_segments(
+        self, user_ids: List[str]
+    ) -> Dict[str, SegmentRecord]:
+        """Current segments for users, from the cache or a column select"""
+        cached = await cache.get_many(
+            [SegmentRecord.cache_key(user_id) for user_id in user_ids]
+        )
+        record_cache("user_segment", len(cached), len(user_ids) - len(cached))
+        existing = {}
+        for data in cached.values():
+            record = SegmentRecord.from_cache(data)
+            existing[record.user_pseudo_id] = record
+
+        missing = [user_id for user_id in user_ids if user_id not in existing]
+        if missing:
+            stmt = select(*SegmentRecord.select_columns()).where(
+                UserSegment.user_pseudo_id.in_(missing)
+            )
+            for row in await self.db.execute(stmt):
+                existing[row.user_pseudo_id] = SegmentRecord.from_row(row)
+        return existing
+
+    async def _classify_summaries(
+        self, summaries: Dict[str, Dict[str, Any]]
+    ) -> Dict[str, Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """Pick a segment per user: defaults, heuristics, memo, then the LLM"""
+        results = {}
+        to_classify = {}
+        for user_id, summary in summaries.items():
+            if not summary["total_events"]:
+                logger.warning(f"No events found for user {user_id}")
+                results[user_id] = (NO_EVENTS_SEGMENT, summary)
+                self._record_decision("no_events")
+            else:
+                to_classify[user_id] = summary
+
+        if to_classify:
+            # Score the batch locally and keep only the ambiguous users
+            with phase("aggregation"):
+                confident = self.classifier.classify_many(to_classify)
+            for user_id, segment_data in confident.items():
+                if segment_data:
+                    results[user_id] = (segment_data, to_classify.pop(user_id))
+                    self._record_decision("heuristic")
+
+        with phase("llm_classification"):
+            if to_classify:
+                # Reuse results for users whose behavior was already classified
+                fingerprints = {
+                    user_id: behavior_fingerprint(summary)
+                    for user_id, summary in to_classify.items()
+                }
+                memoized = await self.memo.get_many(fingerprints.values())
+                for user_id, fingerprint in fingerprints.items():
+                    if fingerprint in memoized:
+                        results[user_id] = (memoized[fingerprint], to_classify[user_id])
+                        self._record_decision("memo")
+                        del to_classify[user_id]
+
+            if to_classify:
+                # Call LLM to classify the ambiguous users
+                classified = await self.llm.segment_users_batch(
+                    to_classify, batch_size=self.batch_size, use_cache=self.use_cache
+                )
+                for user_id, segment_data in classified.items():
+                    self._record_decision("llm")
+                    if segment_data.get("is_default"):
+                        # Error fallback: leave the user due instead of saving it
+                        logger.warning(f"LLM could not classify user {user_id}")
+                        continue
+                    results[user_id] = (segment_data, to_classify[user_id])
+                    logger.info(
+                        f"User {user_id} classified as {segment_data['segment']}"
+                    )
+
+                await self.memo.set_many(
+                    {
+                        fingerprints[user_id]: segment_data
+                        for user_id, segment_data in classified.items()
+                    }
                 )
 
-            # Save to database
-            segment = UserSegment(
-                user_pseudo_id=user_pseudo_id,
+        return results
+
+    def _record_decision(self, source: str):
+        self.decisions[source] += 1
+        segmentation_decisions_total.labels(source=source).inc()
+
+    def llm_bypass_ratio(self) -> float:
+        """Fraction of classified users that never reached the LLM"""
+        bypassed = self.decisions["heuristic"] + self.decisions["memo"]
+        total = bypassed + self.decisions["llm"]
+        return bypassed / total if total else 0.0
+
+    async def _load_event_summaries(
+        self, user_ids: List[str]
+    ) -> Dict[str, Dict[str, Any]]:
+        """Aggregate events for many users in one grouped query
+
+        Returns a summary for every requested user, empty for users
+        without events.
+        """
+        dialect = self.db.get_bind().dialect.name
+        duration = func.coalesce(
+            numeric_param("duration", dialect), numeric_param("time_spent", dialect)
+        )
+        stmt = (
+            select(
+                AnalyticsRaw.user_pseudo_id,
+                AnalyticsRaw.event_name,
+                func.count(AnalyticsRaw.id).label("count"),
+                func.sum(duration).label("duration"),
+                func.max(AnalyticsRaw.created_at).label("last_seen"),
+            )
+            .where(AnalyticsRaw.user_pseudo_id.in_(user_ids))
+            .group_by(AnalyticsRaw.user_pseudo_id, AnalyticsRaw.event_name)
+        )
+        with phase("event_fetch"):
+            rows = await self.db.execute(stmt)
+
+        with phase("aggregation"):
+            distributions = {user_id: {} for user_id in user_ids}
+            durations = {user_id: {} for user_id in user_ids}
+            last_seen = {}
+            for row in rows:
+                distributions[row.user_pseudo_id][row.event_name] = row.count
+                if row.duration is not None:
+                    durations[row.user_pseudo_id][row.event_name] = row.duration
+                if row.last_seen is not None:
+                    last_seen[row.user_pseudo_id] = max(
+                        row.last_seen, last_seen.get(row.user_pseudo_id, row.last_seen)
+                    )
+
+            return {
+                user_id: summarize_events(
+                    distributions[user_id], durations[user_id], last_seen.get(user_id)
+                )
+                for user_id in user_ids
+            }
+
+    async def _save_segments(
+        self,
+        results: Dict[str, Tuple[Dict[str, Any], Dict[str, Any]]],
+        kept: Iterable[SegmentRecord] = (),
+    ) -> List[SegmentRecord]:
+        """Persist (segment_data, event_summary) per user and refresh the cache
+
+        `kept` records are written as they are. With a batch writer attached
+        the records are only buffered; otherwise they are upserted and
+        committed right away.
+        """
+        now = datetime.utcnow()
+        records = list(kept) + [
+            SegmentRecord(
+                user_pseudo_id=user_id,
                 segment=segment_data["segment"],
                 confidence=segment_data.get("confidence", 0.5),
                 reasoning=segment_data.get("reasoning", ""),
                 xai_explanation=segment_data.get("xai_explanation", {}),
-                event_summary=self._aggregate_events([]),
-                expires_at=datetime.utcnow() + timedelta(hours=24),
-            )
-
-            self.db.add(segment)
-            await self.db.commit()
-
-            # Cache the segment with 24-hour TTL (86400 seconds)
-            await cache.set(
-                cache_key,
-                {
-                    "id": segment.id,
-                    "user_pseudo_id": segment.user_pseudo_id,
-                    "segment": segment.segment,
-                    "confidence": segment.confidence,
-                    "reasoning": segment.reasoning,
-                    "xai_explanation": segment.xai_explanation,
-                    "event_summary": segment.event_summary,
-                    "expires_at": (
-                        segment.expires_at.isoformat() if segment.expires_at else None
-                    ),
-                },
-                ttl=86400,
+                event_summary=event_summary,
+                analyzed_at=now,
+                expires_at=now + adaptive_ttl(segment_data.get("confidence", 0.5)),
             )
-
-            return segment
-        except Exception as e:
-            logger.error(f"Segmentation failed for user {user_pseudo_id}: {e}")
-            raise
-
-    async def generate_rules_for_segment(self, segment: str) -> PersonalizationRules:
-        """Generate personalization rules for a segment"""
+            for user_id, (segment_data, event_summary) in results.items()
+        ]
+        if not records:
+            return []
+
+        if self.writer is not None:
+            self.writer.add(records)
+            return records
+
+        writer = SegmentWriter(self.db)
+        writer.add(records)
+        return await writer.flush()
+
+    async def generate_rules_for_segment(
+        self, segment: str, event_context: Optional[Dict[str, Any]] = None
+    ) -> RulesRecord:
+        """Generate personalization rules for a segment and upsert them"""
         try:
             logger.info(f"Generating rules for segment {segment}")
 
-            # Get sample events for this segment
-            stmt = (
-                select(AnalyticsRaw)
-                .join(
-                    UserSegment,
-                    AnalyticsRaw.user_pseudo_id == UserSegment.user_pseudo_id,
-                )
-                .where(UserSegment.segment == segment)
-                .limit(100)
-            )
-
-            result = await self.db.execute(stmt)
-            sample_events = result.scalars().all()
-
-            # Aggregate for LLM
-            event_context = self._aggregate_events(sample_events)
+            # Aggregate the segment's events for the LLM
+            if event_context is None:
+                aggregates = await self._segment_aggregates([segment])
+                event_context = aggregates[segment]
 
-            # Generate rules
-            rules_data = await self.llm.generate_rules(event_context, segment)
+            # Generate rules; an error fallback is not saved, so the stored
+            # rules stay and the next run retries
+            rules_data = await self.llm.generate_rules(
+                event_context, segment, use_cache=self.use_cache
+            )
+            if rules_data.get("is_default"):
+                raise LLMError(f"No rules generated for segment {segment}")
 
             logger.info(f"Rules generated for segment {segment}")
 
-            # Save to database
-            rules = PersonalizationRules(
+            # Save to database, keeping admin css_overrides on existing rows
+            rules = RulesRecord(
                 segment=segment,
                 priority_sections=rules_data.get("priority_sections", []),
                 featured_projects=rules_data.get("featured_projects", []),
                 highlight_skills=rules_data.get("highlight_skills", []),
                 reasoning=rules_data.get("reasoning", ""),
                 xai_explanation=rules_data.get("xai_explanation", {}),
+                input_summary=event_context,
+                created_at=datetime.utcnow(),
             )
+            row = rules.to_row()
+            stmt = upsert_statement(
+                self.db,
+                PersonalizationRules,
+                [row],
+                index_elements=["segment"],
+                update_columns=[
+                    c for c in row if c not in ("segment", "css_overrides")
+                ],
+            ).returning(*RulesRecord.select_columns())
 
-            self.db.add(rules)
+            result = await self.db.execute(stmt)
+            saved = RulesRecord.from_row(result.one())
             await self.db.commit()
+            await cache.set(
+                RulesRecord.cache_key(segment),
+                saved.to_cache(),
+                ttl=settings.RULES_CACHE_TTL,
+            )
 
-            return rules
+            return saved
         except Exception as e:
+            await self.db.rollback()
             logger.error(f"Rule generation failed for segment {segment}: {e}")
             raise
 
-    async def run_hourly_analysis(self):
-        """Run hourly analysis job"""
-        try:
-            logger.info("Starting hourly analysis job")
+    async def refresh_rules(self, segments: List[str] = SEGMENTS) -> Dict[str, str]:
+        """Regenerate rules only for segments whose event mix drifted
+
+        Each segment's current aggregate is compared with the aggregate its
+        stored rules were generated from; rules are regenerated when the
+        drift reaches RULES_DRIFT_THRESHOLD or when no aggregate is stored.
+        Manual rules set by an admin are never regenerated.
+        """
+        aggregates = await self._segment_aggregates(segments)
+        stmt = select(*RulesRecord.select_columns(input_summary=True)).where(
+            PersonalizationRules.segment.in_(segments)
+        )
+        existing = {
+            row.segment: RulesRecord.from_row(row)
+            for row in await self.db.execute(stmt)
+        }
 
-            # 1. Fetch last 1h of events
-            stmt = select(AnalyticsRaw).where(
-                AnalyticsRaw.created_at > datetime.utcnow() - timedelta(hours=1)
+        outcomes = {}
+        for segment in segments:
+            current = existing.get(segment)
+            if current and current.manual:
+                outcomes[segment] = "manual"
+                continue
+            if current and current.input_summary:
+                drift = distribution_drift(current.input_summary, aggregates[segment])
+                if drift < settings.RULES_DRIFT_THRESHOLD:
+                    logger.info(f"Rules for {segment} still fresh (drift {drift:.3f})")
+                    outcomes[segment] = "skipped"
+                    continue
+            try:
+                await self.generate_rules_for_segment(segment, aggregates[segment])
+                outcomes[segment] = "regenerated"
+            except Exception as e:
+                outcomes[segment] = "failed"
+                logger.error(f"Failed to generate rules for {segment}: {e}")
+
+        regenerated = sum(1 for o in outcomes.values() if o == "regenerated")
+        logger.info(f"Regenerated rules for {regenerated}/{len(segments)} segments")
+        return outcomes
+
+    async def _segment_aggregates(
+        self, segments: List[str]
+    ) -> Dict[str, Dict[str, Any]]:
+        """Event distribution per segment from one grouped query"""
+        stmt = (
+            select(
+                UserSegment.segment,
+                AnalyticsRaw.event_name,
+                func.count(AnalyticsRaw.id).label("count"),
             )
-            result = await self.db.execute(stmt)
-            events = result.scalars().all()
-
-            if not events:
-                logger.info("No new events to analyze")
-                return
-
-            # 2. Get unique users
-            unique_users = set(event.user_pseudo_id for event in events)
-            logger.info(f"Found {len(unique_users)} unique users")
-
-            # 3. Segment each user
-            for user_id in unique_users:
-                try:
-                    await self.segment_user(user_id)
-                except Exception as e:
-                    logger.error(f"Failed to segment user {user_id}: {e}")
-
-            # 4. Generate/update rules per segment
-            segments = [
-                "ML_ENGINEER",
-                "FULLSTACK_DEV",
-                "RECRUITER",
-                "STUDENT",
-                "CASUAL",
-            ]
-            for segment in segments:
-                try:
-                    await self.generate_rules_for_segment(segment)
-                except Exception as e:
-                    logger.error(f"Failed to generate rules for {segment}: {e}")
-
-            logger.info("Hourly analysis job completed")
-        except Exception as e:
-            logger.error(f"Hourly analysis failed: {e}")
-            raise
-
-    def _aggregate_events(self, events: list) -> Dict[str, Any]:
-        """Aggregate events for LLM analysis"""
-        event_types = {}
-        for event in events:
-            name = event.event_name if hasattr(event, "event_name") else "unknown"
-            event_types[name] = event_types.get(name, 0) + 1
+            .join(
+                UserSegment,
+                AnalyticsRaw.user_pseudo_id == UserSegment.user_pseudo_id,
+            )
+            .where(UserSegment.segment.in_(segments))
+            .group_by(UserSegment.segment, AnalyticsRaw.event_name)
+        )
+        distributions = {segment: {} for segment in segments}
+        for row in await self.db.execute(stmt):
+            distributions[row.segment][row.event_name] = row.count
 
         return {
-            "total_events": len(events),
-            "unique_event_types": list(event_types.keys()),
-            "event_distribution": event_types,
+            segment: summarize_events(distribution)
+            for segment, distribution in distributions.items()
         }
+
+    async def run_hourly_analysis(self):
+        """Run hourly analysis job over events added since the last run
+
+        Each phase is checkpointed on an analysis_runs row, so a run cut
+        short by a restart resumes after its last completed phase.
+        """
+        run, resumed = await start_or_resume_run(self.db, HOURLY_JOB_NAME)
+        telemetry = RunTelemetry(run.telemetry)
+        with telemetry.active():
+            try:
+                logger.info("Starting hourly analysis job")
+
+                if run.phase == "started":
+                    # 1. Event id range between the persisted watermark and the newest id
+                    with phase("event_fetch"):
+                        low, high = await self._event_window(HOURLY_JOB_NAME)
+                    run.event_low, run.event_high = low, high
+                    if high <= low:
+                        logger.info("No new events to analyze")
+                        await finish_run(self.db, run, telemetry=telemetry)
+                        return
+
+                    # 2. Make every user with new events due for re-segmentation
+                    # 3. Advance the watermark, committing the queue entries and
+                    # the checkpoint with it
+                    with phase("db_write"):
+                        enqueued = await enqueue_active_users(self.db, low, high)
+                        run.phase = "users_queued"
+                        await self._set_watermark(HOURLY_JOB_NAME, high)
+                    logger.info(
+                        f"Queued {enqueued} active users from events {low + 1}..{high}"
+                    )
+
+                if run.phase == "users_queued":
+                    # 4. Regenerate rules for segments whose behavior drifted
+                    with phase("rule_generation"):
+                        await self.refresh_rules()
+                    await checkpoint(self.db, run, "rules_refreshed", telemetry)
+
+                await finish_run(self.db, run, telemetry=telemetry)
+                logger.info("Hourly analysis job completed")
+            except Exception as e:
+                logger.error(f"Hourly analysis failed: {e}")
+                await self.db.rollback()
+                await finish_run(self.db, run, "failed", telemetry)
+                raise
+
+    async def _event_window(self, job_name: str) -> Tuple[int, int]:
+        """(last processed id, newest settled id) of analytics_raw for a job
+
+        Ids are assigned at insert but rows become visible at commit, so a
+        slow transaction can commit an id below the newest visible one. The
+        window therefore stops at the newest id older than
+        EVENT_WATERMARK_LAG; younger events wait for the next run. The first
+        run starts from events created in the last hour, matching the old
+        sliding window.
+        """
+        settled = datetime.utcnow() - timedelta(seconds=settings.EVENT_WATERMARK_LAG)
+        stmt = select(func.max(AnalyticsRaw.id)).where(
+            AnalyticsRaw.created_at <= settled
+        )
+        high = (await self.db.execute(stmt)).scalar()
+        watermark = await self.db.get(AnalysisWatermark, job_name)
+        if watermark:
+            low = watermark.last_event_id
+        else:
+            stmt = select(func.max(AnalyticsRaw.id)).where(
+                AnalyticsRaw.created_at <= datetime.utcnow() - timedelta(hours=1)
+            )
+            low = (await self.db.execute(stmt)).scalar()
+        return low or 0, high or 0
+
+    async def _set_watermark(self, job_name: str, last_event_id: int):
+        """Persist the last analytics_raw.id a job has processed"""
+        watermark = await self.db.get(AnalysisWatermark, job_name)
+        if watermark:
+            watermark.last_event_id = last_event_id
+        else:
+            self.db.add(
+                AnalysisWatermark(job_name=job_name, last_event_id=last_event_id)
+            )
+        await self.db.commit()
+        logger.info(f"Watermark for {job_name} advanced to {last_event_id}")
+
+    async def drain_resegment_queue(
+        self,
+        llm_budget: Optional[int] = None,
+        on_progress: Optional[Callable[[Dict[str, int]], Awaitable[bool]]] = None,
+        run_name: str = DRAIN_JOB_NAME,
+    ) -> Dict[str, int]:
+        """Re-segment due users, most urgent first, until the LLM budget is spent
+
+        Users are claimed in rounds no larger than the remaining budget, so
+        at most `llm_budget` users are classified by the LLM per drain.
+        `on_progress` gets the running stats after each round and stops the
+        drain by returning False.
+
+        The drain is an analysis run named `run_name`, checkpointed after
+        every round. Resuming an interrupted run releases the users it had
+        claimed but not saved and carries over its counters and spent budget.
+        """
+        run, resumed = await start_or_resume_run(self.db, run_name)
+        if resumed:
+            released = await release_claims(self.db, run.id)
+            await self.db.commit()
+            logger.info(f"Released {released} unfinished claims of run {run.id}")
+
+        budget = llm_budget or settings.RESEGMENT_LLM_BUDGET
+        llm_before = self.decisions["llm"] - (run.llm_classified or 0)
+        stats = Counter(segmented=run.users_done or 0, failed=run.users_failed or 0)
+        telemetry = RunTelemetry(run.telemetry)
+        with telemetry.active():
+            try:
+                while self.decisions["llm"] - llm_before < budget:
+                    remaining = budget - (self.decisions["llm"] - llm_before)
+                    user_ids = await claim_due_users(
+                        self.db,
+                        min(remaining, self.batch_size * self.concurrency),
+                        run_id=run.id,
+                    )
+                    if not user_ids:
+                        break
+                    stats.update(await self.segment_users(user_ids))
+
+                    run.users_done = stats["segmented"]
+                    run.users_failed = stats["failed"]
+                    run.llm_classified = self.decisions["llm"] - llm_before
+                    await checkpoint(self.db, run, telemetry=telemetry)
+                    if on_progress and not await on_progress(dict(stats)):
+                        logger.info("Re-segmentation drain stopped early")
+                        break
+            except Exception:
+                run_id = run.id
+                await self.db.rollback()
+                await release_claims(self.db, run_id)
+                await finish_run(self.db, run, "failed", telemetry)
+                raise
+            await finish_run(self.db, run, telemetry=telemetry)
+
+        logger.info(
+            f"Drained re-segmentation queue: {stats['segmented']} segmented, "
+            f"{stats['failed']} failed, "
+            f"{self.decisions['llm'] - llm_before}/{budget} LLM classifications"
+        )
+        return {"segmented": stats["segmented"], "failed": stats["failed"]}
+
+    async def segment_users(
+        self, user_ids: Union[Iterable[str], AsyncIterable[str]]
+    ) -> Dict[str, int]:
+        """Segment many users in batches with up to `concurrency` workers
+
+        Each worker opens its own session from `session_factory`, classifies
+        `batch_size` users per LLM prompt and upserts results every
+        `write_batch_size` users. Without a factory the engine's own session
+        is used and batches run one at a time. Failures are logged per batch
+        and never abort the run.
+        """
+        stats = {"segmented": 0, "failed": 0}
+        workers = self.concurrency if self.session_factory else 1
+        queue: asyncio.Queue = asyncio.Queue(maxsize=workers * 2)
+
+        async def flush(writer: SegmentWriter):
+            pending = len(writer)
+            try:
+                await writer.flush()
+            except Exception as e:
+                stats["segmented"] -= pending
+                stats["failed"] += pending
+                logger.error(f"Failed to write {pending} segments: {e}")
+
+        async def worker():
+            session_scope = (
+                self.session_factory() if self.session_factory else nullcontext(self.db)
+            )
+            async with session_scope as session:
+                engine = self._child_engine(session)
+                engine.writer = SegmentWriter(session, self.write_batch_size)
+                while True:
+                    batch = await queue.get()
+                    try:
+                        if batch is None:
+                            break
+                        records = await engine.segment_batch(batch)
+                        stats["segmented"] += len(records)
+                        stats["failed"] += len(batch) - len(records)
+                        if engine.writer.full:
+                            await flush(engine.writer)
+                    except Exception as e:
+                        stats["failed"] += len(batch)
+                        logger.error(
+                            f"Failed to segment batch of {len(batch)} users: {e}"
+                        )
+                    finally:
+                        queue.task_done()
+                await flush(engine.writer)
+
+        async def produce():
+            if hasattr(user_ids, "__aiter__"):
+                async for user_id in user_ids:
+                    yield user_id
+            else:
+                for user_id in user_ids:
+                    yield user_id
+
+        tasks = [asyncio.create_task(worker()) for _ in range(workers)]
+        try:
+            batch = []
+            async for user_id in produce():
+                batch.append(user_id)
+                if len(batch) >= self.batch_size:
+                    await queue.put(batch)
+                    batch = []
+            if batch:
+                await queue.put(batch)
+            for _ in tasks:
+                await queue.put(None)
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        logger.info(
+            f"Segmented {stats['segmented']} users "
+            f"({stats['failed']} failed, concurrency={workers}, "
+            f"batch_size={self.batch_size}, "
+            f"llm_bypass={self.llm_bypass_ratio():.1%})"
+        )
+        return stats
+
+    def _child_engine(self, session: AsyncSession) -> "AnalysisEngine":
+        """Engine bound to a worker session, sharing config and counters"""
+        engine = type(self)(
+            self.ga4,
+            self.llm,
+            session,
+            batch_size=self.batch_size,
+            write_batch_size=self.write_batch_size,
+            classifier=self.classifier,
+            memo=self.memo,
+        )
+        engine.decisions = self.decisions
+        return engine
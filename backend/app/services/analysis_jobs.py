@@ -0,0 +1,185 @@
+"""Persistent queue of admin-triggered analysis jobs
+
+Jobs live in the analysis_jobs table. A partial unique index allows one
+queued or running job per kind, so repeated triggers return the job that
+is already pending. The scheduler claims queued jobs one at a time and
+runs them under the hourly analysis lock, recording progress as the
+re-segmentation queue drains.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.models import AnalysisJob
+from app.services.analysis_engine import AnalysisEngine, HOURLY_JOB_NAME
+from app.services.job_lock import job_lock
+from app.services.resegment_queue import count_due_users, requeue_all_users
+from app.utils.logger import logger
+
+JOB_KINDS = ("analysis", "full_analysis")
+ACTIVE_STATES = ("queued", "running")
+
+
+async def enqueue_job(
+    session: AsyncSession,
+    kind: str,
+    requested_by: Optional[str] = None,
+    use_cache: bool = True,
+) -> Tuple[AnalysisJob, bool]:
+    """Queue a job unless one of this kind is pending; returns (job, created)
+
+    Jobs queued with use_cache=False call the LLM for every user and rule
+    instead of reusing cached responses.
+    """
+    existing = await _active_job(session, kind)
+    if existing:
+        return existing, False
+
+    job = AnalysisJob(
+        kind=kind,
+        state="queued",
+        users_done=0,
+        users_failed=0,
+        cancel_requested=False,
+        requested_by=requested_by,
+        use_cache=use_cache,
+        created_at=datetime.utcnow(),
+    )
+    session.add(job)
+    try:
+        await session.commit()
+    except IntegrityError:
+        # Another request queued the same kind between our check and insert
+        await session.rollback()
+        return await _active_job(session, kind), False
+    return job, True
+
+
+async def _active_job(session: AsyncSession, kind: str) -> Optional[AnalysisJob]:
+    stmt = select(AnalysisJob).where(
+        AnalysisJob.kind == kind, AnalysisJob.state.in_(ACTIVE_STATES)
+    )
+    return (await session.execute(stmt)).scalars().first()
+
+
+async def request_cancel(session: AsyncSession, job: AnalysisJob) -> AnalysisJob:
+    """Cancel a queued job now, or ask a running job to stop at its next batch"""
+    if job.state == "queued":
+        job.state = "cancelled"
+        job.finished_at = datetime.utcnow()
+    elif job.state == "running":
+        job.cancel_requested = True
+    await session.commit()
+    return job
+
+
+def job_status(job: AnalysisJob) -> Dict[str, Any]:
+    """JSON-safe job state, progress and throughput"""
+    throughput = None
+    if job.started_at:
+        elapsed = (
+            (job.finished_at or datetime.utcnow()) - job.started_at
+        ).total_seconds()
+        throughput = round(job.users_done / elapsed, 2) if elapsed > 0 else None
+    return {
+        "job_id": job.id,
+        "kind": job.kind,
+        "state": job.state,
+        "cancel_requested": bool(job.cancel_requested),
+        "progress": {
+            "users_done": job.users_done or 0,
+            "users_failed": job.users_failed or 0,
+            "users_total": job.users_total or 0,
+        },
+        "throughput_users_per_sec": throughput,
+        "error": job.error,
+        "requested_by": job.requested_by,
+        "use_cache": job.use_cache is not False,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+async def claim_next_job(session: AsyncSession) -> Optional[int]:
+    """Mark the oldest queued job running and return its id
+
+    Jobs run one at a time under the "analysis_jobs" lock, so a job still
+    running when the lock is taken was interrupted; it is returned first
+    so run_analysis_job resumes it.
+    """
+    oldest = (
+        select(AnalysisJob.id)
+        .where(AnalysisJob.state.in_(ACTIVE_STATES))
+        .order_by((AnalysisJob.state == "running").desc(), AnalysisJob.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    )
+    stmt = (
+        update(AnalysisJob)
+        .where(AnalysisJob.id == oldest.scalar_subquery())
+        .values(
+            state="running",
+            started_at=func.coalesce(AnalysisJob.started_at, datetime.utcnow()),
+        )
+        .returning(AnalysisJob.id)
+        .execution_options(synchronize_session=False)
+    )
+    try:
+        job_id = (await session.execute(stmt)).scalar()
+        await session.commit()
+    except Exception:
+        await session.rollback()
+        raise
+    return job_id
+
+
+async def run_analysis_job(engine: AnalysisEngine, job_id: int):
+    """Run a claimed job: analysis, then a full drain of due users"""
+    db = engine.db
+    job = await db.get(AnalysisJob, job_id, populate_existing=True)
+    engine.use_cache = job.use_cache is not False
+    try:
+        async with job_lock(HOURLY_JOB_NAME) as acquired:
+            if not acquired:
+                # The scheduled run is in progress; retry on the next poll
+                job.state = "queued"
+                job.started_at = None
+                await db.commit()
+                return
+
+            await engine.run_hourly_analysis()
+            if job.users_total is None:
+                # Not yet set when resuming an interrupted job's drain
+                if job.kind == "full_analysis":
+                    await requeue_all_users(db)
+                job.users_total = await count_due_users(db)
+                await db.commit()
+
+            async def record_progress(stats: Dict[str, int]) -> bool:
+                await db.refresh(job, ["cancel_requested"])
+                job.users_done = stats["segmented"]
+                job.users_failed = stats["failed"]
+                await db.commit()
+                return not job.cancel_requested
+
+            await engine.drain_resegment_queue(
+                llm_budget=max(job.users_total, 1),
+                on_progress=record_progress,
+                run_name=f"analysis_job:{job.id}",
+            )
+            job.state = "cancelled" if job.cancel_requested else "succeeded"
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Analysis job {job_id} failed: {e}")
+        job.state = "failed"
+        job.error = str(e)
+
+    if job.state != "queued":
+        job.finished_at = datetime.utcnow()
+        await db.commit()
+        logger.info(f"Analysis job {job_id} {job.state}")
@@ -0,0 +1,98 @@
+"""Checkpointed analysis runs
+
+Each execution of a scheduled job is an analysis_runs row that records
+the last completed phase and running counters. Jobs only run while
+holding their job lock, so a row still marked running when the lock is
+taken belongs to a process that died mid-run. The new holder resumes it
+from its checkpoint instead of starting over.
+"""
+
+from datetime import datetime
+from typing import Optional, Tuple
+
+from sqlalchemy import inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.models import AnalysisRun
+from app.services.job_lock import ensure_locks_held
+from app.services.run_telemetry import RunTelemetry
+from app.utils.logger import logger
+
+
+async def start_or_resume_run(
+    session: AsyncSession, job_name: str
+) -> Tuple[AnalysisRun, bool]:
+    """Interrupted run of this job if any, else a new one; returns (run, resumed)
+
+    Must be called while holding the job's lock.
+    """
+    stmt = (
+        select(AnalysisRun)
+        .where(AnalysisRun.job_name == job_name, AnalysisRun.state == "running")
+        .order_by(AnalysisRun.id.desc())
+    )
+    run = (await session.execute(stmt)).scalars().first()
+    if run:
+        run.resumed_count = (run.resumed_count or 0) + 1
+        await session.commit()
+        logger.info(f"Resuming {job_name} run {run.id} from phase {run.phase}")
+        return run, True
+
+    now = datetime.utcnow()
+    run = AnalysisRun(
+        job_name=job_name,
+        state="running",
+        phase="started",
+        users_done=0,
+        users_failed=0,
+        llm_classified=0,
+        resumed_count=0,
+        started_at=now,
+        checkpoint_at=now,
+    )
+    session.add(run)
+    await session.commit()
+    return run, False
+
+
+async def checkpoint(
+    session: AsyncSession,
+    run: AnalysisRun,
+    phase: str = None,
+    telemetry: Optional[RunTelemetry] = None,
+):
+    """Commit the run's counters, and its phase when one is given
+
+    Raises JobLockLostError instead when the job's lock was lost.
+    """
+    await ensure_locks_held()
+    if phase:
+        run.phase = phase
+    if telemetry:
+        run.telemetry = telemetry.snapshot(run.users_done or 0, run.users_failed or 0)
+    run.checkpoint_at = datetime.utcnow()
+    await session.commit()
+
+
+async def finish_run(
+    session: AsyncSession,
+    run: AnalysisRun,
+    state: str = "completed",
+    telemetry: Optional[RunTelemetry] = None,
+):
+    """Mark a run completed or failed, storing and exporting its telemetry
+
+    Safe to call after a rollback: attributes the rollback expired are
+    reloaded before they are read.
+    """
+    if telemetry:
+        expired = inspect(run).unloaded & {"job_name", "users_done", "users_failed"}
+        if expired:
+            await session.refresh(run, list(expired))
+    run.state = state
+    run.finished_at = datetime.utcnow()
+    if telemetry:
+        users_done, users_failed = run.users_done or 0, run.users_failed or 0
+        run.telemetry = telemetry.snapshot(users_done, users_failed)
+        telemetry.export(run.job_name, state, users_done, users_failed)
+    await session.commit()
@@ -0,0 +1,23 @@
+"""Drift measures between aggregated event summaries"""
+
+from typing import Any, Dict
+
+
+def distribution_drift(previous: Dict[str, Any], current: Dict[str, Any]) -> float:
+    """Total variation distance between two event distributions
+
+    Both arguments are summaries shaped like the output of
+    analysis_engine.summarize_events. Returns 0.0 for identical event mixes and 1.0 for disjoint ones;
+    an empty side against a non-empty one counts as full drift.
+    """
+    p = previous.get("event_distribution") or {}
+    q = current.get("event_distribution") or {}
+    p_total = sum(p.values())
+    q_total = sum(q.values())
+    if not p_total or not q_total:
+        return 0.0 if p_total == q_total else 1.0
+
+    return 0.5 * sum(
+        abs(p.get(name, 0) / p_total - q.get(name, 0) / q_total)
+        for name in set(p) | set(q)
+    )
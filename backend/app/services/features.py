@@ -0,0 +1,148 @@
+"""Dense user x event-type feature matrices for vectorized scoring
+
+Rows are users, columns follow EVENT_TYPES. Counts and summed durations
+come straight from grouped query rows or stored event summaries, so
+normalization and scoring run as NumPy array ops instead of per-user
+Python dicts.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from itertools import repeat
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
+
+import numpy as np
+
+# Events tracked by the portfolio frontend (assets/js/analytics.js)
+EVENT_TYPES = (
+    "project_click",
+    "section_view",
+    "contact_intent",
+    "skill_hover",
+    "deep_read",
+    "scroll_depth",
+    "language_switch",
+    "repeat_view",
+    "career_timeline_interact",
+    "download_resume",
+    "external_link_click",
+)
+
+
+@dataclass
+class FeatureMatrix:
+    """Per-user event counts, dwell time and recency"""
+
+    user_ids: List[str]
+    event_types: Sequence[str]
+    counts: np.ndarray  # users x event types
+    total_events: np.ndarray  # users, including event types outside the columns
+    durations: np.ndarray  # users x event types, summed event durations
+    recency_hours: np.ndarray  # users, hours since the last event (nan if unknown)
+
+    @classmethod
+    def from_rows(
+        cls,
+        rows: Iterable[Any],
+        user_ids: Optional[List[str]] = None,
+        event_types: Sequence[str] = EVENT_TYPES,
+        now: Optional[datetime] = None,
+    ) -> "FeatureMatrix":
+        """Build from (user_pseudo_id, event_name, count[, duration, last_seen]) rows
+
+        Rows may be query Rows or plain tuples in that column order, with
+        last_seen as epoch seconds. Event names outside event_types only
+        count towards total_events; users listed in user_ids without rows
+        get all-zero features.
+        """
+        rows = list(rows)
+        columns = list(zip(*rows)) or [()] * 5
+        if user_ids is None:
+            user_ids = list(dict.fromkeys(columns[0]))
+
+        # Map ids and names to matrix indexes
+        users, user_known = _lookup(user_ids, columns[0])
+        events, event_known = _lookup(event_types, columns[1])
+        row_counts = np.array(columns[2], dtype=float)
+        total_events = np.bincount(
+            users[user_known], weights=row_counts[user_known], minlength=len(user_ids)
+        )
+
+        recency_hours = np.full(len(user_ids), np.nan)
+        if len(columns) > 4:
+            now = _epoch(now or datetime.utcnow())
+            seen = np.array(columns[4], dtype=float)[user_known]
+            np.fmin.at(recency_hours, users[user_known], (now - seen) / 3600)
+
+        known = user_known & event_known
+        users, events = users[known], events[known]
+        shape = (len(user_ids), len(event_types))
+        counts = np.zeros(shape)
+        np.add.at(counts, (users, events), row_counts[known])
+
+        durations = np.zeros(shape)
+        if len(columns) > 3:
+            row_durations = np.array(columns[3], dtype=float)[known]
+            np.add.at(durations, (users, events), np.nan_to_num(row_durations))
+
+        return cls(
+            user_ids, tuple(event_types), counts, total_events, durations, recency_hours
+        )
+
+    @classmethod
+    def from_summaries(
+        cls,
+        summaries: Dict[str, Dict[str, Any]],
+        event_types: Sequence[str] = EVENT_TYPES,
+        now: Optional[datetime] = None,
+    ) -> "FeatureMatrix":
+        """Build from event summaries shaped like summarize_events output"""
+        rows = [
+            (
+                user_id,
+                event_name,
+                count,
+                (summary.get("event_durations") or {}).get(event_name),
+                _epoch(summary.get("last_seen_at")),
+            )
+            for user_id, summary in summaries.items()
+            for event_name, count in (summary.get("event_distribution") or {}).items()
+        ]
+        return cls.from_rows(rows, list(summaries), event_types, now)
+
+    def shares(self) -> np.ndarray:
+        """Counts over each user's total events; all-zero rows for no events"""
+        totals = self.total_events[:, None]
+        return np.divide(
+            self.counts, totals, out=np.zeros_like(self.counts), where=totals > 0
+        )
+
+    def dwell_shares(self) -> np.ndarray:
+        """Row-normalized durations"""
+        totals = self.durations.sum(axis=1)[:, None]
+        return np.divide(
+            self.durations,
+            totals,
+            out=np.zeros_like(self.durations),
+            where=totals > 0,
+        )
+
+
+def _lookup(keys: Sequence[str], values: Sequence[str]):
+    """Index of each value in keys, plus a mask of values found in keys"""
+    index = {key: i for i, key in enumerate(keys)}
+    positions = np.fromiter(
+        map(index.get, values, repeat(-1)), dtype=np.intp, count=len(values)
+    )
+    return positions, positions >= 0
+
+
+def _epoch(value: Union[datetime, str, None]) -> Optional[float]:
+    """Epoch seconds, reading naive datetimes as UTC like the rest of the app"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
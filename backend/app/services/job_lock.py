@@ -0,0 +1,128 @@
+"""Cluster-wide single-run gating for scheduled jobs
+
+Every process runs its own scheduler, so each job run first takes a
+Postgres session-level advisory lock keyed by the job name. Whoever holds
+it runs; everyone else skips that tick. The lock lives on one pooled
+connection for the whole run and Postgres drops it when that connection
+dies, so a crashed node cannot leave a stale lock behind and no lease
+renewal is needed.
+
+The lock connection runs in autocommit mode, so it never sits idle in a
+transaction where idle_in_transaction_session_timeout would kill it.
+Should it be lost anyway, ensure_locks_held (called before every run
+checkpoint) notices and stops the run. Session-level advisory locks need
+a direct connection or session pooling: behind PgBouncer in transaction
+pooling mode the lock may be taken on a server connection the job does
+not keep.
+
+Databases without advisory locks (SQLite in tests) fall back to a
+process-local lock.
+"""
+
+import asyncio
+import functools
+import hashlib
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Awaitable, Callable, Dict, Tuple
+
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from app.database.db import engine as default_engine
+from app.utils.exceptions import JobLockLostError
+from app.utils.logger import logger
+from app.utils.metrics import scheduled_job_runs_total
+
+_local_locks: Dict[str, asyncio.Lock] = {}
+
+# (job name, lock connection, key) of the advisory locks held by this task
+_held: ContextVar[Tuple[Tuple[str, AsyncConnection, int], ...]] = ContextVar(
+    "held_job_locks", default=()
+)
+
+# pg_locks shows a bigint key as its high half in classid, low half in objid
+_HOLDS_LOCK = text(
+    "SELECT EXISTS (SELECT 1 FROM pg_locks WHERE locktype = 'advisory' "
+    "AND pid = pg_backend_pid() AND granted AND objsubid = 1 "
+    "AND classid = :classid AND objid = :objid)"
+)
+
+
+def lock_key(name: str) -> int:
+    """Stable signed 64-bit advisory lock key for a job name"""
+    digest = hashlib.sha256(f"job:{name}".encode()).digest()
+    return int.from_bytes(digest[:8], "big", signed=True)
+
+
+@asynccontextmanager
+async def job_lock(name: str, engine: AsyncEngine = None) -> AsyncIterator[bool]:
+    """Try to take the job's lock without waiting; yields whether it was taken"""
+    engine = engine or default_engine
+    if engine.dialect.name != "postgresql":
+        lock = _local_locks.setdefault(name, asyncio.Lock())
+        if lock.locked():
+            yield False
+            return
+        async with lock:
+            yield True
+        return
+
+    key = lock_key(name)
+    async with engine.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        acquired = (await conn.execute(select(func.pg_try_advisory_lock(key)))).scalar()
+        if not acquired:
+            yield False
+            return
+
+        token = _held.set(_held.get() + ((name, conn, key),))
+        try:
+            yield True
+        finally:
+            _held.reset(token)
+            try:
+                await conn.execute(select(func.pg_advisory_unlock(key)))
+            except Exception as e:
+                logger.warning(f"Could not release lock for {name}: {e}")
+
+
+async def ensure_locks_held():
+    """Raise JobLockLostError if a job lock taken by this task was lost
+
+    A lost lock means another node may already run the same job, so the
+    current run must stop before it writes more progress.
+    """
+    for name, conn, key in _held.get():
+        unsigned = key & 0xFFFFFFFFFFFFFFFF
+        params = {"classid": unsigned >> 32, "objid": unsigned & 0xFFFFFFFF}
+        try:
+            held = (await conn.execute(_HOLDS_LOCK, params)).scalar()
+        except Exception as e:
+            raise JobLockLostError(f"Lock for {name} lost: {e}") from e
+        if not held:
+            raise JobLockLostError(f"Lock for {name} lost")
+
+
+def single_instance(name: str):
+    """Skip a scheduled job run while another run holds its lock anywhere"""
+
+    def decorator(job: Callable[[], Awaitable[None]]):
+        @functools.wraps(job)
+        async def wrapper(*args, **kwargs):
+            async with job_lock(name) as acquired:
+                if not acquired:
+                    logger.info(f"Skipping {name}: already running elsewhere")
+                    scheduled_job_runs_total.labels(job=name, outcome="skipped").inc()
+                    return None
+                try:
+                    result = await job(*args, **kwargs)
+                except Exception:
+                    scheduled_job_runs_total.labels(job=name, outcome="failed").inc()
+                    raise
+                scheduled_job_runs_total.labels(job=name, outcome="completed").inc()
+                return result
+
+        return wrapper
+
+    return decorator
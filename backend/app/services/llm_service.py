@@ -1,14 +1,143 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
+import asyncio
 import json
-import httpx
+import re
+import time
+from app.config import settings
 from app.utils.logger import logger
-from app.utils.exceptions import LLMError
+from app.utils.exceptions import (
+    LLMError,
+    LLMRateLimitError,
+    ProviderUnavailableError,
+)
+from app.utils.http_client import http_client
+from app.services.run_telemetry import record_llm_call, record_llm_tokens
+from app.services.provider_health import provider_health
+from app.services.rate_limiter import provider_limiter
+from app.services.prompt_context import CONTEXT_LEGEND, encode_context, estimate_tokens
+from app.services.response_cache import ResponseCache, cache_key
+from app.utils.metrics import llm_hedged_requests_total, llm_prompt_tokens_estimated
+
+SEGMENT_DEFINITIONS = """SEGMENTS:
+1. ML_ENGINEER: Heavy AI/ML project focus, deep technical engagement
+2. FULLSTACK_DEV: Balanced frontend/backend interest, holistic view
+3. RECRUITER: Quick scan, contact-focused, evaluation mode
+4. STUDENT: Exploratory, long session time, learning intent
+5. CASUAL: Brief visit, no clear pattern, browsing mode"""
+
+BATCH_SEGMENT_PROMPT = (
+    """Analyze the behavior events of EACH visitor below and classify every visitor into ONE segment.
+
+"""
+    + SEGMENT_DEFINITIONS
+    + """
+
+Each visitor in the context has a stable "id". Return exactly one result per id and copy the id unchanged.
+
+Provide a short xAI-style explanation per visitor (what, why, so_what, recommendation).
+
+Respond ONLY with a JSON array (no markdown, no code fences), one object per visitor:
+[
+  {
+    "id": "u0",
+    "segment": "SEGMENT_NAME",
+    "confidence": 0.0-1.0,
+    "reasoning": "Brief summary",
+    "xai_explanation": {
+      "what": "Key events and patterns",
+      "why": "Why this indicates the segment",
+      "so_what": "What this means for their intent",
+      "recommendation": "How to personalize"
+    }
+  }
+]"""
+)
+
+SEGMENT_PROMPT = (
+    """Analyze these user behavior events and classify the visitor into ONE segment.
+
+"""
+    + SEGMENT_DEFINITIONS
+    + """
+
+Provide xAI-style explanation:
+- WHAT: What did the user do? (key events, patterns)
+- WHY: Why does this indicate the segment? (causal reasoning)
+- SO WHAT: What does this mean for their intent? (business impact)
+- RECOMMENDATION: How should we personalize? (actionable insight)
+
+Respond ONLY with JSON (no markdown, no code fences):
+{
+  "segment": "SEGMENT_NAME",
+  "confidence": 0.0-1.0,
+  "reasoning": "Brief summary",
+  "xai_explanation": {
+    "what": "User clicked 3 AI projects, hovered on Python/TensorFlow skills for 15s total",
+    "why": "Heavy ML engagement indicates technical depth and domain expertise",
+    "so_what": "This is a potential technical hire or peer looking for ML capabilities",
+    "recommendation": "Prioritize AI/ML projects, emphasize technical depth and model architecture"
+  }
+}"""
+)
+
+RULES_INSTRUCTIONS = """AVAILABLE SECTIONS: projects, skills, experience, about, contact
+AVAILABLE PROJECTS: ai_projects, fullstack_apps, data_science, mobile_apps, cloud_infra
+AVAILABLE SKILLS: python, javascript, react, tensorflow, docker, kubernetes, aws
+
+Provide xAI-style explanation for your rule choices:
+- WHAT: What rules are you creating? (the changes)
+- WHY: Why these rules for this segment? (reasoning)
+- SO WHAT: What impact will this have? (expected outcome)
+- RECOMMENDATION: What else to consider? (future improvements)
+
+Respond ONLY with JSON (no markdown, no code fences):
+{
+  "priority_sections": ["section1", "section2", "section3"],
+  "featured_projects": ["proj1", "proj2"],
+  "highlight_skills": ["skill1", "skill2", "skill3"],
+  "reasoning": "Brief summary of personalization strategy",
+  "xai_explanation": {
+    "what": "Prioritizing projects section, featuring AI projects, highlighting ML skills",
+    "why": "ML_ENGINEER segment values technical depth and hands-on ML experience",
+    "so_what": "User will immediately see relevant projects and technical competence, increasing engagement",
+    "recommendation": "Consider adding technical blog section or GitHub integration for this segment"
+  }
+}"""
+
+
+def render_prompt(prompt: str, context: Dict[str, Any]) -> str:
+    """Full text sent to a provider: instructions plus the compact context"""
+    return f"{prompt}\n\n{CONTEXT_LEGEND}\nContext: {encode_context(context)}"
+
+
+# Reasoning of the fallback segment, also found on rows saved before
+# fallbacks stopped being persisted
+DEFAULT_SEGMENT_REASONING = "Default due to error"
+
+
+def _default_segment() -> Dict[str, Any]:
+    """Segment returned when the LLM cannot classify a user"""
+    return {
+        "is_default": True,
+        "segment": "CASUAL",
+        "confidence": 0.5,
+        "reasoning": DEFAULT_SEGMENT_REASONING,
+        "xai_explanation": {
+            "what": "Error during analysis",
+            "why": "LLM provider unavailable or data malformed",
+            "so_what": "Cannot determine user intent reliably",
+            "recommendation": "Show default content, no personalization",
+        },
+    }
 
 
 class LLMProvider(ABC):
     """Abstract base for LLM providers"""
 
+    name = "llm"  # Metrics label
+    model_name = "llm"  # Response cache key component
+
     @abstractmethod
     async def generate(self, prompt: str, context: Dict[str, Any]) -> str:
         """Generate response from LLM"""
@@ -18,6 +147,8 @@ class LLMProvider(ABC):
 class GeminiProvider(LLMProvider):
     """Google Gemini 2.0 Flash provider"""
 
+    name = "gemini"
+
     def __init__(self, api_key: str):
         self.api_key = api_key
         self.model_name = "gemini-2.0-flash"
@@ -41,23 +172,38 @@ class GeminiProvider(LLMProvider):
     async def generate(self, prompt: str, context: Dict[str, Any]) -> str:
         """Generate response from Gemini"""
         try:
-            # Build full prompt with context
-            full_prompt = f"{prompt}\n\nContext: {json.dumps(context)}"
+            full_prompt = render_prompt(prompt, context)
 
             logger.info("Calling Gemini API")
-            response = self.client.generate_content(full_prompt)
+            # The async SDK call keeps the event loop free while Gemini works
+            response = await asyncio.wait_for(
+                self.client.generate_content_async(full_prompt),
+                timeout=settings.LLM_TOTAL_TIMEOUT,
+            )
 
             result = response.text
+            usage = getattr(response, "usage_metadata", None)
+            if usage:
+                record_llm_tokens(
+                    self.name,
+                    getattr(usage, "prompt_token_count", 0) or 0,
+                    getattr(usage, "candidates_token_count", 0) or 0,
+                )
             logger.info("Gemini response received")
             return result
         except Exception as e:
+            # google.api_core errors carry the HTTP status as .code
+            if getattr(e, "code", None) == 429:
+                raise LLMRateLimitError(f"Gemini rate limited: {str(e)}") from e
             logger.error(f"Gemini generation failed: {e}")
-            raise LLMError(f"Gemini generation failed: {str(e)}")
+            raise LLMError(f"Gemini generation failed: {str(e)}") from e
 
 
 class DeepSeekProvider(LLMProvider):
     """DeepSeek V3 provider"""
 
+    name = "deepseek"
+
     def __init__(self, api_key: str):
         self.api_key = api_key
         self.base_url = "https://api.deepseek.com/v1"
@@ -67,11 +213,12 @@ class DeepSeekProvider(LLMProvider):
     async def generate(self, prompt: str, context: Dict[str, Any]) -> str:
         """Generate response from DeepSeek"""
         try:
-            full_prompt = f"{prompt}\n\nContext: {json.dumps(context)}"
+            full_prompt = render_prompt(prompt, context)
 
-            async with httpx.AsyncClient() as client:
-                logger.info("Calling DeepSeek API")
-                response = await client.post(
+            logger.info("Calling DeepSeek API")
+            # Pooled keep-alive client; read/connect timeouts are set on it
+            response = await asyncio.wait_for(
+                http_client.client.post(
                     f"{self.base_url}/chat/completions",
                     headers={"Authorization": f"Bearer {self.api_key}"},
                     json={
@@ -80,39 +227,140 @@ class DeepSeekProvider(LLMProvider):
                         "temperature": 0.7,
                         "max_tokens": 1000,
                     },
+                ),
+                timeout=settings.LLM_TOTAL_TIMEOUT,
+            )
+
+            if response.status_code == 429:
+                raise LLMRateLimitError(
+                    "DeepSeek rate limited",
+                    retry_after=_retry_after(response.headers.get("retry-after")),
                 )
-
-                if response.status_code != 200:
-                    raise LLMError(f"DeepSeek API error: {response.status_code}")
-
-                result = response.json()["choices"][0]["message"]["content"]
-                logger.info("DeepSeek response received")
-                return result
+            if response.status_code != 200:
+                raise LLMError(f"DeepSeek API error: {response.status_code}")
+
+            body = response.json()
+            result = body["choices"][0]["message"]["content"]
+            usage = body.get("usage") or {}
+            record_llm_tokens(
+                self.name,
+                usage.get("prompt_tokens", 0),
+                usage.get("completion_tokens", 0),
+            )
+            logger.info("DeepSeek response received")
+            return result
+        except LLMRateLimitError:
+            raise
         except Exception as e:
             logger.error(f"DeepSeek generation failed: {e}")
-            raise LLMError(f"DeepSeek generation failed: {str(e)}")
+            raise LLMError(f"DeepSeek generation failed: {str(e)}") from e
+
+
+def _has_json(text: str) -> bool:
+    """Whether a response holds a parseable JSON object or array
+
+    Only such responses are cached, so a malformed answer is retried
+    instead of being replayed until it expires.
+    """
+    match = re.search(r"[\[{].*[\]}]", text, re.DOTALL)
+    try:
+        json.loads(match.group() if match else text)
+    except (ValueError, TypeError):
+        return False
+    return True
+
+
+def _retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds from a Retry-After header; None for dates or garbage"""
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
 
 
 class LLMService:
-    """Service for LLM operations with provider fallback"""
+    """Service for LLM operations with provider fallback and hedging"""
+
+    # Call types and the setting that enables hedging for them
+    HEDGED_CALL_TYPES = {
+        "segmentation": "LLM_HEDGE_SEGMENTATION",
+        "rules": "LLM_HEDGE_RULES",
+    }
 
     def __init__(self, gemini_key: str, deepseek_key: str):
         self.providers = [GeminiProvider(gemini_key), DeepSeekProvider(deepseek_key)]
         self.current_idx = 0
+        self.response_cache = ResponseCache() if settings.LLM_CACHE_ENABLED else None
         logger.info(f"LLMService initialized with {len(self.providers)} providers")
 
-    async def generate_with_fallback(self, prompt: str, context: Dict[str, Any]) -> str:
-        """Generate with provider fallback"""
+    async def generate_with_fallback(
+        self,
+        prompt: str,
+        context: Dict[str, Any],
+        call_type: str = "segmentation",
+        use_cache: bool = True,
+    ) -> str:
+        """Generate with provider fallback
+
+        A response cached for any provider is returned without a call,
+        unless use_cache is False. Otherwise providers are tried healthiest
+        first (see route). For hedged call types, a primary that has not
+        answered within its hedge delay races the next provider; the first
+        answer wins and the other request is cancelled.
+        """
+        providers = self.route()
+        full_prompt = render_prompt(prompt, context)
+        llm_prompt_tokens_estimated.labels(call_type=call_type).observe(
+            estimate_tokens(full_prompt)
+        )
+        cache = self.response_cache if use_cache else None
+        if cache is not None:
+            # Prefer the response of the provider we would call first
+            keys = {
+                provider: cache_key(provider.model_name, full_prompt)
+                for provider in providers
+                + [p for p in self.providers if p not in providers]
+            }
+            cached = await cache.get(list(keys.values()))
+            if cached is not None:
+                return cached
+
+        if not providers:
+            raise ProviderUnavailableError("All LLM provider circuits are open")
+        result, provider = await self._generate(providers, prompt, context, call_type)
+        if cache is not None and _has_json(result):
+            await cache.put(keys[provider], provider.model_name, result)
+        return result
+
+    async def _generate(
+        self,
+        providers: List[LLMProvider],
+        prompt: str,
+        context: Dict[str, Any],
+        call_type: str,
+    ) -> Tuple[str, LLMProvider]:
+        """Response and the provider that gave it, hedging and falling back"""
         last_error = None
 
-        for i, provider in enumerate(self.providers):
+        if len(providers) > 1 and getattr(
+            settings, self.HEDGED_CALL_TYPES.get(call_type, ""), False
+        ):
+            try:
+                return await self._generate_hedged(
+                    providers[0], providers[1], prompt, context, call_type
+                )
+            except Exception as e:
+                last_error = e
+                providers = providers[2:]
+
+        for i, provider in enumerate(providers):
             try:
                 logger.info(
-                    f"Attempting generation with provider {i+1}/{len(self.providers)}"
+                    f"Attempting generation with provider {i+1}/{len(providers)}"
                 )
-                result = await provider.generate(prompt, context)
-                self.current_idx = i  # Set as current successful provider
-                return result
+                result = await self._call(provider, prompt, context)
+                self.current_idx = self.providers.index(provider)
+                return result, provider
             except Exception as e:
                 logger.warning(f"Provider {i+1} failed: {e}")
                 last_error = e
@@ -122,42 +370,128 @@ class LLMService:
         logger.error(f"All LLM providers exhausted. Last error: {last_error}")
         raise LLMError(f"All LLM providers failed. Last error: {str(last_error)}")
 
-    async def segment_user(self, events: Dict[str, Any]) -> Dict[str, Any]:
+    def route(self) -> List[LLMProvider]:
+        """Providers whose circuit admits calls, lowest expected cost first
+
+        Ties keep the configured order, so Gemini leads until latency or
+        errors say otherwise.
+        """
+        ranked = sorted(
+            enumerate(self.providers),
+            key=lambda item: (provider_health(item[1].name).score(), item[0]),
+        )
+        return [
+            provider
+            for _, provider in ranked
+            if provider_health(provider.name).available()
+        ]
+
+    async def _call(
+        self, provider: LLMProvider, prompt: str, context: Dict[str, Any]
+    ) -> str:
+        """One provider call, recording its outcome, latency and health
+
+        The call waits for the provider's rate limiter first; that wait
+        does not count towards its latency.
+        """
+        health = provider_health(provider.name)
+        if not health.acquire():
+            raise ProviderUnavailableError(f"{provider.name} circuit is open")
+        started = time.perf_counter()
+        calling = False
+        try:
+            async with provider_limiter(provider.name).slot():
+                started = time.perf_counter()
+                calling = True
+                result = await provider.generate(prompt, context)
+        except asyncio.CancelledError:
+            if calling:
+                # E.g. a hedge loser: it took at least this long
+                health.record_censored(time.perf_counter() - started)
+            health.release()
+            raise
+        except LLMRateLimitError:
+            # Throttled is not broken: the limiter backs off, the circuit stays
+            health.release()
+            raise
+        except Exception:
+            elapsed = time.perf_counter() - started
+            record_llm_call(provider.name, False, elapsed)
+            health.record_failure(elapsed)
+            raise
+        elapsed = time.perf_counter() - started
+        record_llm_call(provider.name, True, elapsed)
+        health.record_success(elapsed)
+        return result
+
+    def hedge_delay(self, provider: LLMProvider) -> float:
+        """Seconds to wait for a provider before hedging: its latency quantile"""
+        delay = provider_health(provider.name).quantile(settings.LLM_HEDGE_QUANTILE)
+        return settings.LLM_HEDGE_DELAY if delay is None else delay
+
+    async def _generate_hedged(
+        self,
+        primary: LLMProvider,
+        secondary: LLMProvider,
+        prompt: str,
+        context: Dict[str, Any],
+        call_type: str,
+    ) -> Tuple[str, LLMProvider]:
+        """Race the secondary against a slow primary; first success wins
+
+        A primary that fails before its hedge delay falls back to the
+        secondary as usual.
+        """
+        tasks = {asyncio.create_task(self._call(primary, prompt, context)): primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay(primary))
+            if not done:
+                logger.info(
+                    f"{primary.name} slower than {self.hedge_delay(primary):.2f}s, "
+                    f"hedging {call_type} call with {secondary.name}"
+                )
+            elif next(iter(done)).exception() is not None:
+                logger.warning(f"{primary.name} failed: {next(iter(done)).exception()}")
+                tasks = {}
+            else:
+                self.current_idx = self.providers.index(primary)
+                return next(iter(done)).result(), primary
+
+            tasks[
+                asyncio.create_task(self._call(secondary, prompt, context))
+            ] = secondary
+            pending = set(tasks)
+            last_error = None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        winner = tasks[task]
+                        if len(tasks) > 1:
+                            llm_hedged_requests_total.labels(
+                                call_type=call_type, winner=winner.name
+                            ).inc()
+                        self.current_idx = self.providers.index(winner)
+                        return task.result(), winner
+                    last_error = task.exception()
+            raise last_error
+        finally:
+            # Cancel the losing request, or both if our caller was cancelled
+            for task in tasks:
+                task.cancel()
+
+    async def segment_user(
+        self, events: Dict[str, Any], use_cache: bool = True
+    ) -> Dict[str, Any]:
         """Classify user segment based on events with xAI explanations"""
-        prompt = """Analyze these user behavior events and classify the visitor into ONE segment.
-
-SEGMENTS:
-1. ML_ENGINEER: Heavy AI/ML project focus, deep technical engagement
-2. FULLSTACK_DEV: Balanced frontend/backend interest, holistic view
-3. RECRUITER: Quick scan, contact-focused, evaluation mode
-4. STUDENT: Exploratory, long session time, learning intent
-5. CASUAL: Brief visit, no clear pattern, browsing mode
-
-Provide xAI-style explanation:
-- WHAT: What did the user do? (key events, patterns)
-- WHY: Why does this indicate the segment? (causal reasoning)
-- SO WHAT: What does this mean for their intent? (business impact)
-- RECOMMENDATION: How should we personalize? (actionable insight)
-
-Respond ONLY with JSON (no markdown, no code fences):
-{
-  "segment": "SEGMENT_NAME",
-  "confidence": 0.0-1.0,
-  "reasoning": "Brief summary",
-  "xai_explanation": {
-    "what": "User clicked 3 AI projects, hovered on Python/TensorFlow skills for 15s total",
-    "why": "Heavy ML engagement indicates technical depth and domain expertise",
-    "so_what": "This is a potential technical hire or peer looking for ML capabilities",
-    "recommendation": "Prioritize AI/ML projects, emphasize technical depth and model architecture"
-  }
-}"""
-
         try:
-            result_str = await self.generate_with_fallback(prompt, events)
+            result_str = await self.generate_with_fallback(
+                SEGMENT_PROMPT, events, use_cache=use_cache
+            )
 
             # Parse JSON response
-            import re
-
             json_match = re.search(r"\{.*\}", result_str, re.DOTALL)
             if json_match:
                 result = json.loads(json_match.group())
@@ -168,52 +502,115 @@ Respond ONLY with JSON (no markdown, no code fences):
         except Exception as e:
             logger.error(f"Segmentation failed: {e}")
             # Return default segment on failure with xAI structure
-            return {
-                "segment": "CASUAL",
-                "confidence": 0.5,
-                "reasoning": "Default due to error",
-                "xai_explanation": {
-                    "what": "Error during analysis",
-                    "why": "LLM provider unavailable or data malformed",
-                    "so_what": "Cannot determine user intent reliably",
-                    "recommendation": "Show default content, no personalization",
-                },
-            }
+            return _default_segment()
+
+    async def segment_users_batch(
+        self,
+        summaries: Dict[str, Dict[str, Any]],
+        batch_size: int = None,
+        use_cache: bool = True,
+    ) -> Dict[str, Dict[str, Any]]:
+        """Classify many users, packing up to `batch_size` into each prompt
+
+        Args:
+            summaries: Event summary per user_pseudo_id
+            batch_size: Users per prompt (default LLM_SEGMENT_BATCH_SIZE)
+            use_cache: Whether cached responses may answer the prompts
+
+        Returns:
+            Segment result per user_pseudo_id, same shape as segment_user
+        """
+        batch_size = max(1, batch_size or settings.LLM_SEGMENT_BATCH_SIZE)
+        user_ids = list(summaries)
+        results = {}
+        for start in range(0, len(user_ids), batch_size):
+            chunk = user_ids[start : start + batch_size]
+            results.update(await self._segment_chunk(chunk, summaries, use_cache))
+        return results
+
+    async def _segment_chunk(
+        self,
+        user_ids: List[str],
+        summaries: Dict[str, Dict[str, Any]],
+        use_cache: bool = True,
+    ) -> Dict[str, Dict[str, Any]]:
+        """Classify one batch, splitting it when the response is malformed"""
+        if len(user_ids) == 1:
+            user_id = user_ids[0]
+            return {user_id: await self.segment_user(summaries[user_id], use_cache)}
+
+        # Short positional ids keep the prompt small and never leak pseudo ids
+        ids = {f"u{i}": user_id for i, user_id in enumerate(user_ids)}
+        context = {
+            "visitors": [
+                {"id": short_id, **summaries[user_id]}
+                for short_id, user_id in ids.items()
+            ]
+        }
+
+        try:
+            result_str = await self.generate_with_fallback(
+                BATCH_SEGMENT_PROMPT, context, use_cache=use_cache
+            )
+        except Exception as e:
+            # Every provider failed; splitting would only multiply failures
+            logger.error(f"Batch segmentation failed for {len(user_ids)} users: {e}")
+            return {user_id: _default_segment() for user_id in user_ids}
+
+        parsed = self._parse_batch_response(result_str, ids)
+        results = {ids[short_id]: item for short_id, item in parsed.items()}
+        missing = [user_id for user_id in user_ids if user_id not in results]
+        if not missing:
+            return results
+
+        logger.warning(
+            f"Batch response covered {len(results)}/{len(user_ids)} users, "
+            f"retrying {len(missing)} in smaller batches"
+        )
+        if len(missing) == len(user_ids):
+            middle = len(missing) // 2
+            retries = [missing[:middle], missing[middle:]]
+        else:
+            retries = [missing]
+        for retry in retries:
+            results.update(await self._segment_chunk(retry, summaries, use_cache))
+        return results
+
+    @staticmethod
+    def _parse_batch_response(
+        result_str: str, ids: Dict[str, str]
+    ) -> Dict[str, Dict[str, Any]]:
+        """Extract valid per-visitor results keyed by short id"""
+        try:
+            json_match = re.search(r"\[.*\]", result_str, re.DOTALL)
+            items = json.loads(json_match.group() if json_match else result_str)
+        except (ValueError, TypeError):
+            return {}
+        if not isinstance(items, list):
+            return {}
+
+        parsed = {}
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            short_id = item.pop("id", None)
+            if short_id in ids and isinstance(item.get("segment"), str):
+                parsed[short_id] = item
+        return parsed
 
     async def generate_rules(
-        self, events: Dict[str, Any], segment: str
+        self, events: Dict[str, Any], segment: str, use_cache: bool = True
     ) -> Dict[str, Any]:
         """Generate personalization rules for segment with xAI explanations"""
-        prompt = f"""Based on segment {segment} and behavior patterns, generate personalization rules that maximize engagement.
-
-AVAILABLE SECTIONS: projects, skills, experience, about, contact
-AVAILABLE PROJECTS: ai_projects, fullstack_apps, data_science, mobile_apps, cloud_infra
-AVAILABLE SKILLS: python, javascript, react, tensorflow, docker, kubernetes, aws
-
-Provide xAI-style explanation for your rule choices:
-- WHAT: What rules are you creating? (the changes)
-- WHY: Why these rules for this segment? (reasoning)
-- SO WHAT: What impact will this have? (expected outcome)
-- RECOMMENDATION: What else to consider? (future improvements)
-
-Respond ONLY with JSON (no markdown, no code fences):
-{{
-  "priority_sections": ["section1", "section2", "section3"],
-  "featured_projects": ["proj1", "proj2"],
-  "highlight_skills": ["skill1", "skill2", "skill3"],
-  "reasoning": "Brief summary of personalization strategy",
-  "xai_explanation": {{
-    "what": "Prioritizing projects section, featuring AI projects, highlighting ML skills",
-    "why": "ML_ENGINEER segment values technical depth and hands-on ML experience",
-    "so_what": "User will immediately see relevant projects and technical competence, increasing engagement",
-    "recommendation": "Consider adding technical blog section or GitHub integration for this segment"
-  }}
-}}"""
+        prompt = (
+            f"Based on segment {segment} and behavior patterns, generate "
+            "personalization rules that maximize engagement.\n\n" + RULES_INSTRUCTIONS
+        )
 
         try:
-            result_str = await self.generate_with_fallback(prompt, events)
-
-            import re
+            result_str = await self.generate_with_fallback(
+                prompt, events, call_type="rules", use_cache=use_cache
+            )
 
             json_match = re.search(r"\{.*\}", result_str, re.DOTALL)
             if json_match:
@@ -225,6 +622,7 @@ Respond ONLY with JSON (no markdown, no code fences):
         except Exception as e:
             logger.error(f"Rule generation failed: {e}")
             return {
+                "is_default": True,
                 "priority_sections": ["projects", "skills"],
                 "featured_projects": [],
                 "highlight_skills": [],
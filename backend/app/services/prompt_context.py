@@ -0,0 +1,106 @@
+"""Compact, token-budgeted encoding of LLM prompt context
+
+Contexts are event summaries (see summarize_events), batches of them under
+"visitors", or segment aggregates. They are sent as canonical JSON:
+short sorted keys, no whitespace, durations in seconds, floats rounded,
+derivable fields dropped and numeric maps cut to their top-k entries with
+the rest summed into "other". If the result exceeds the token budget, k is halved until
+it fits. The same context always encodes to the same text, which also
+keeps response cache keys stable.
+"""
+
+import json
+import math
+from typing import Any, Dict
+
+from app.config import settings
+from app.utils.logger import logger
+
+# Long field names sent in every summary, and their short forms
+CONTEXT_KEYS = {
+    "total_events": "n",
+    "event_distribution": "ev",
+    "event_durations": "dur",
+    "last_seen_at": "seen",
+}
+
+# Derivable from the event counts, so not sent
+DROPPED_KEYS = frozenset({"unique_event_types"})
+
+# The tracker reports durations in milliseconds; the LLM is sent seconds
+MS_KEYS = frozenset({"event_durations"})
+
+CONTEXT_LEGEND = (
+    "Context keys: n = total events, ev = event counts by type, "
+    "dur = seconds spent per event type, seen = last activity (UTC); "
+    '"other" sums the less frequent event types.'
+)
+
+CHARS_PER_TOKEN = 4  # Rough average for JSON-heavy English prompts
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of a prompt, without a tokenizer"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def encode_context(context: Dict[str, Any], budget: int = None) -> str:
+    """Canonical compact JSON of a context, shrunk to fit `budget` tokens"""
+    budget = settings.LLM_CONTEXT_TOKEN_BUDGET if budget is None else budget
+    top_k = settings.LLM_CONTEXT_TOP_K
+    while True:
+        text = json.dumps(
+            _compact(context, top_k), sort_keys=True, separators=(",", ":")
+        )
+        if estimate_tokens(text) <= budget:
+            return text
+        if top_k <= 1:
+            logger.warning(
+                f"Prompt context of ~{estimate_tokens(text)} tokens exceeds "
+                f"budget of {budget}"
+            )
+            return text
+        top_k //= 2
+
+
+def _compact(value: Any, top_k: int) -> Any:
+    if isinstance(value, dict):
+        if len(value) > top_k and all(_is_number(v) for v in value.values()):
+            value = _top(value, top_k)
+        return {
+            CONTEXT_KEYS.get(key, key): (
+                # Minute precision is plenty for recency
+                item[:16]
+                if key == "last_seen_at" and isinstance(item, str)
+                else _compact(_to_seconds(item) if key in MS_KEYS else item, top_k)
+            )
+            for key, item in value.items()
+            if key not in DROPPED_KEYS
+        }
+    if isinstance(value, list):
+        return [_compact(item, top_k) for item in value]
+    if isinstance(value, float):
+        return round(value, settings.LLM_CONTEXT_PRECISION)
+    return value
+
+
+def _to_seconds(durations: Any) -> Any:
+    """Millisecond durations as float seconds"""
+    if not isinstance(durations, dict):
+        return durations
+    return {
+        name: value / 1000 if _is_number(value) else value
+        for name, value in durations.items()
+    }
+
+
+def _top(values: Dict[str, float], top_k: int) -> Dict[str, float]:
+    """Largest top_k entries plus the sum of the rest as "other" """
+    ranked = sorted(values.items(), key=lambda item: (-item[1], item[0]))
+    kept = dict(ranked[:top_k])
+    kept["other"] = sum(value for _, value in ranked[top_k:])
+    return kept
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
@@ -0,0 +1,147 @@
+"""Health tracking and circuit breakers for LLM providers
+
+Each provider keeps an EWMA of its latency and error rate plus a circuit
+breaker. A closed circuit lets every call through. Repeated failures open
+it, and calls are skipped without touching the network. After
+LLM_BREAKER_COOLDOWN the circuit turns half-open and a single probe call
+decides whether it closes again or stays open for another cooldown.
+
+State is per process and outlives LLMService instances, so an outage
+learned in one job still applies to the next.
+"""
+
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Optional
+
+from app.config import settings
+from app.utils.logger import logger
+from app.utils.metrics import llm_provider_circuit_state, llm_provider_latency_ewma
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class ProviderHealth:
+    """EWMA latency, error rate and circuit breaker of one provider"""
+
+    def __init__(self, name: str, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.clock = clock
+        self.state = CLOSED
+        self.latency_ewma: Optional[float] = None
+        self.error_rate = 0.0
+        self.calls = 0
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        # Recent latencies of successful and cancelled calls, for hedge delays
+        self.latencies: Deque[float] = deque(maxlen=200)
+
+    def available(self) -> bool:
+        """Whether a call could go through now (no side effects)"""
+        if self.state == CLOSED:
+            return True
+        if self.probing:
+            return False
+        return self.state == HALF_OPEN or self._cooled_down()
+
+    def acquire(self) -> bool:
+        """Admit a call; in half-open state only one probe at a time"""
+        if self.state == CLOSED:
+            return True
+        if self.probing or (self.state == OPEN and not self._cooled_down()):
+            return False
+        self._set_state(HALF_OPEN)
+        self.probing = True
+        logger.info(f"Probing LLM provider {self.name}")
+        return True
+
+    def release(self):
+        """Give back an admitted call that was cancelled before finishing"""
+        self.probing = False
+
+    def record_success(self, latency: float):
+        self._record(latency, failed=False)
+        self.latencies.append(latency)
+        self.latency_ewma = self._ewma(self.latency_ewma, latency)
+        llm_provider_latency_ewma.labels(provider=self.name).set(self.latency_ewma)
+        self.consecutive_failures = 0
+        if self.state != CLOSED:
+            logger.info(f"LLM provider {self.name} recovered, closing circuit")
+            self._set_state(CLOSED)
+
+    def record_censored(self, latency: float):
+        """Lower bound on the latency of a call cancelled before it answered
+
+        Hedge losers are cancelled, so without these samples the quantile
+        would only see fast calls and the hedge delay would keep shrinking.
+        """
+        self.latencies.append(latency)
+
+    def record_failure(self, latency: float):
+        self._record(latency, failed=True)
+        self.consecutive_failures += 1
+        if self.state == HALF_OPEN or (
+            self.state == CLOSED
+            and (
+                self.consecutive_failures >= settings.LLM_BREAKER_FAILURES
+                or (
+                    self.calls >= settings.LLM_BREAKER_MIN_CALLS
+                    and self.error_rate >= settings.LLM_BREAKER_ERROR_RATE
+                )
+            )
+        ):
+            logger.warning(
+                f"Opening circuit for LLM provider {self.name} "
+                f"({self.consecutive_failures} consecutive failures, "
+                f"error rate {self.error_rate:.0%})"
+            )
+            self.opened_at = self.clock()
+            self._set_state(OPEN)
+
+    def score(self) -> float:
+        """Expected cost of a call: latency inflated by the error rate"""
+        latency = self.latency_ewma
+        if latency is None:
+            latency = settings.LLM_HEDGE_DELAY
+        return latency / max(1.0 - self.error_rate, 0.05)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Latency quantile of recent successes and cancelled calls
+
+        None without enough samples.
+        """
+        if len(self.latencies) < settings.LLM_HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[int(q * (len(ordered) - 1))]
+
+    def _record(self, latency: float, failed: bool):
+        self.calls += 1
+        self.probing = False
+        self.error_rate = self._ewma(self.error_rate, 1.0 if failed else 0.0)
+
+    def _cooled_down(self) -> bool:
+        return self.clock() - self.opened_at >= settings.LLM_BREAKER_COOLDOWN
+
+    def _set_state(self, state: str):
+        self.state = state
+        llm_provider_circuit_state.labels(provider=self.name).set(_STATE_VALUES[state])
+
+    @staticmethod
+    def _ewma(current: Optional[float], value: float) -> float:
+        if current is None:
+            return value
+        alpha = settings.LLM_HEALTH_EWMA_ALPHA
+        return alpha * value + (1 - alpha) * current
+
+
+_registry: Dict[str, ProviderHealth] = {}
+
+
+def provider_health(name: str) -> ProviderHealth:
+    """Process-wide health tracker for a provider"""
+    if name not in _registry:
+        _registry[name] = ProviderHealth(name)
+    return _registry[name]
@@ -0,0 +1,234 @@
+"""Rate limiting and adaptive concurrency for LLM providers
+
+Every provider call first takes a token from the provider's token bucket
+and then a slot under its concurrency limit.
+
+The bucket caps the request rate. Its state lives in Redis, so API and
+worker processes share one budget per provider, and a 429 carrying a
+Retry-After pauses it for everyone. Without Redis each process falls back
+to a local bucket.
+
+The concurrency limit is per process and adapts AIMD-style: every
+successful call adds 1/limit (about one slot per round of calls), while a
+429 or timeout multiplies it by LLM_AIMD_BACKOFF. Only calls that started
+after the last decrease can shrink it again, so one burst of rejections
+halves the limit once instead of collapsing it.
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Deque, Dict
+
+import httpx
+
+from app.cache import cache
+from app.config import settings
+from app.utils.exceptions import LLMRateLimitError
+from app.utils.logger import logger
+from app.utils.metrics import llm_concurrency_limit, llm_rate_limited_total
+
+# Refill by server time, take one token, or return the milliseconds to wait
+_BUCKET_SCRIPT = """
+local pause = redis.call('PTTL', KEYS[2])
+if pause > 0 then return pause end
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+else
+  wait = math.ceil((1 - tokens) / rate)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate) + 1000)
+return wait
+"""
+
+SUCCESS, OVERLOAD, FAILURE, CANCELLED = "success", "overload", "failure", "cancelled"
+
+
+class TokenBucket:
+    """Request rate limit of one provider, shared through Redis"""
+
+    KEY_PREFIX = "llm_rate:"
+
+    def __init__(
+        self,
+        name: str,
+        per_minute: float,
+        burst: int,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.rate = per_minute / 60
+        self.burst = burst
+        self.clock = clock
+        # Process-local state, used when Redis is unavailable
+        self.tokens = float(burst)
+        self.updated = clock()
+        self.paused_until = 0.0
+
+    async def reserve(self) -> float:
+        """Take a token; returns 0, or the seconds to wait before retrying"""
+        now = self.clock()
+        if now < self.paused_until:
+            return self.paused_until - now
+
+        wait_ms = await cache.run_script(
+            _BUCKET_SCRIPT,
+            [f"{self.KEY_PREFIX}{self.name}", f"{self.KEY_PREFIX}{self.name}:pause"],
+            [self.rate / 1000, self.burst],
+        )
+        if wait_ms is not None:
+            return int(wait_ms) / 1000
+
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    async def pause(self, seconds: float):
+        """Stop handing out tokens, e.g. for a 429's Retry-After"""
+        self.paused_until = max(self.paused_until, self.clock() + seconds)
+        await cache.set(
+            f"{self.KEY_PREFIX}{self.name}:pause", 1, ttl=max(1, math.ceil(seconds))
+        )
+
+
+class AdaptiveConcurrency:
+    """AIMD limit on in-flight calls to one provider in this process"""
+
+    def __init__(self, name: str, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.clock = clock
+        self.limit = float(settings.LLM_AIMD_INITIAL)
+        self.in_flight = 0
+        self.decreased_at = -math.inf
+        self._waiters: Deque[asyncio.Future] = deque()
+        llm_concurrency_limit.labels(provider=name).set(self.limit)
+
+    async def acquire(self) -> float:
+        """Wait for a free slot; returns the call's start time for release"""
+        while self.in_flight >= int(self.limit):
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                # Pass a wake-up we may have received on to the next waiter
+                self._wake()
+                raise
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        self.in_flight += 1
+        return self.clock()
+
+    def release(self, started: float, outcome: str):
+        """Free a slot and adapt the limit to the call's outcome"""
+        self.in_flight -= 1
+        if outcome == SUCCESS:
+            self.limit = min(settings.LLM_AIMD_MAX, self.limit + 1 / self.limit)
+        elif outcome == OVERLOAD and started >= self.decreased_at:
+            self.limit = max(
+                settings.LLM_AIMD_MIN, self.limit * settings.LLM_AIMD_BACKOFF
+            )
+            self.decreased_at = self.clock()
+            logger.info(
+                f"LLM provider {self.name} overloaded, "
+                f"concurrency limit now {int(self.limit)}"
+            )
+        llm_concurrency_limit.labels(provider=self.name).set(self.limit)
+        self._wake()
+
+    def _wake(self):
+        free = int(self.limit) - self.in_flight
+        for waiter in list(self._waiters):
+            if free <= 0:
+                break
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+
+class ProviderLimiter:
+    """Token bucket plus adaptive concurrency in front of one provider"""
+
+    def __init__(self, name: str):
+        self.name = name
+        per_minute = settings.LLM_RATE_PER_MINUTE.get(name)
+        self.bucket = (
+            TokenBucket(name, per_minute, settings.LLM_RATE_BURST)
+            if per_minute
+            else None
+        )
+        self.concurrency = AdaptiveConcurrency(name)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold a token and a concurrency slot for the duration of one call
+
+        Raises LLMRateLimitError without calling the provider when the
+        bucket would make us wait longer than LLM_RATE_MAX_WAIT, so the
+        caller can fall back to another provider instead.
+        """
+        await self._take_token()
+        started = await self.concurrency.acquire()
+        outcome = CANCELLED
+        try:
+            yield
+            outcome = SUCCESS
+        except LLMRateLimitError as e:
+            outcome = OVERLOAD
+            llm_rate_limited_total.labels(provider=self.name, source="provider").inc()
+            if e.retry_after and self.bucket is not None:
+                await self.bucket.pause(e.retry_after)
+            raise
+        except Exception as e:
+            outcome = OVERLOAD if _is_timeout(e) else FAILURE
+            raise
+        finally:
+            self.concurrency.release(started, outcome)
+
+    async def _take_token(self):
+        if self.bucket is None:
+            return
+        waited = 0.0
+        while True:
+            wait = await self.bucket.reserve()
+            if wait <= 0:
+                return
+            if waited + wait > settings.LLM_RATE_MAX_WAIT:
+                llm_rate_limited_total.labels(provider=self.name, source="local").inc()
+                raise LLMRateLimitError(
+                    f"{self.name} rate limit reached", retry_after=wait
+                )
+            await asyncio.sleep(wait)
+            waited += wait
+
+
+def _is_timeout(error: BaseException) -> bool:
+    """Whether a provider error was caused by a timeout"""
+    cause = error.__cause__ or error
+    return isinstance(cause, (asyncio.TimeoutError, httpx.TimeoutException))
+
+
+_registry: Dict[str, ProviderLimiter] = {}
+
+
+def provider_limiter(name: str) -> ProviderLimiter:
+    """Process-wide limiter for a provider"""
+    if name not in _registry:
+        _registry[name] = ProviderLimiter(name)
+    return _registry[name]
@@ -0,0 +1,168 @@
+"""Persistent priority queue of users due for re-segmentation
+
+Every segmented user has a queue row that becomes due when the segment
+expires. New activity makes a user due immediately. Due users are claimed
+active first, then lowest confidence, then longest overdue.
+"""
+
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
+
+from sqlalchemy import false, func, literal, select, true, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database.models import AnalyticsRaw, ResegmentQueue
+from app.database.upsert import dialect_insert
+from app.models.records import SegmentRecord
+
+
+def adaptive_ttl(
+    confidence: float, previous_ttl: Optional[timedelta] = None
+) -> timedelta:
+    """Segment lifetime: doubled while behavior is stable, else by confidence
+
+    A fresh classification lives SEGMENT_TTL_HOURS scaled by 0.5 + confidence;
+    each unchanged re-check doubles the previous lifetime. Both are clamped
+    to [SEGMENT_TTL_MIN_HOURS, SEGMENT_TTL_MAX_HOURS].
+    """
+    if previous_ttl:
+        ttl = previous_ttl * 2
+    else:
+        ttl = timedelta(hours=settings.SEGMENT_TTL_HOURS) * (0.5 + confidence)
+    return min(
+        max(ttl, timedelta(hours=settings.SEGMENT_TTL_MIN_HOURS)),
+        timedelta(hours=settings.SEGMENT_TTL_MAX_HOURS),
+    )
+
+
+def schedule_statement(session: AsyncSession, records: Iterable[SegmentRecord]):
+    """Upsert making each record's user due again when its segment expires"""
+    stmt = dialect_insert(session, ResegmentQueue).values(
+        [
+            {
+                "user_pseudo_id": record.user_pseudo_id,
+                "due_at": record.expires_at,
+                "confidence": record.confidence,
+                "active": False,
+                "updated_at": record.analyzed_at,
+                "claimed_by_run": None,
+            }
+            for record in records
+        ]
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=["user_pseudo_id"],
+        set_={
+            column: stmt.excluded[column]
+            for column in (
+                "due_at",
+                "confidence",
+                "active",
+                "updated_at",
+                "claimed_by_run",
+            )
+        },
+    )
+
+
+async def enqueue_active_users(session: AsyncSession, low: int, high: int) -> int:
+    """Make users with events in (low, high] due now, in one INSERT ... SELECT
+
+    Does not commit, so the caller can commit it together with its watermark.
+    """
+    now = datetime.utcnow()
+    active_users = (
+        select(
+            AnalyticsRaw.user_pseudo_id,
+            literal(now),
+            literal(0.0),
+            true(),
+            literal(now),
+        )
+        .where(AnalyticsRaw.id > low, AnalyticsRaw.id <= high)
+        .group_by(AnalyticsRaw.user_pseudo_id)
+    )
+    stmt = dialect_insert(session, ResegmentQueue).from_select(
+        ["user_pseudo_id", "due_at", "confidence", "active", "updated_at"],
+        active_users,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_pseudo_id"],
+        set_={"due_at": now, "active": True, "updated_at": now},
+    )
+    result = await session.execute(stmt)
+    return result.rowcount
+
+
+async def claim_due_users(
+    session: AsyncSession, limit: int, run_id: Optional[int] = None
+) -> List[str]:
+    """Claim up to `limit` of the most urgent due users and commit
+
+    Claimed rows are pushed back by RESEGMENT_CLAIM_LEASE, so users whose
+    segmentation never completes become due again. Concurrent claimers skip
+    each other's locked rows. Claims are tagged with `run_id` until the
+    user's segment is saved, so a resumed run can release them early.
+    """
+    now = datetime.utcnow()
+    due = (
+        select(ResegmentQueue.user_pseudo_id)
+        .where(ResegmentQueue.due_at <= now)
+        .order_by(
+            ResegmentQueue.active.desc(),
+            ResegmentQueue.confidence.asc(),
+            ResegmentQueue.due_at.asc(),
+        )
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    stmt = (
+        update(ResegmentQueue)
+        .where(ResegmentQueue.user_pseudo_id.in_(due.scalar_subquery()))
+        .values(
+            due_at=now + timedelta(seconds=settings.RESEGMENT_CLAIM_LEASE),
+            active=false(),
+            updated_at=now,
+            claimed_by_run=run_id,
+        )
+        .returning(ResegmentQueue.user_pseudo_id)
+        .execution_options(synchronize_session=False)
+    )
+    try:
+        user_ids = list((await session.execute(stmt)).scalars())
+        await session.commit()
+    except Exception:
+        await session.rollback()
+        raise
+    return user_ids
+
+
+async def release_claims(session: AsyncSession, run_id: int) -> int:
+    """Make users still claimed by a run due now (does not commit)"""
+    now = datetime.utcnow()
+    result = await session.execute(
+        update(ResegmentQueue)
+        .where(ResegmentQueue.claimed_by_run == run_id)
+        .values(due_at=now, claimed_by_run=None, updated_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+async def count_due_users(session: AsyncSession) -> int:
+    """Number of users currently due for re-segmentation"""
+    stmt = select(func.count()).where(ResegmentQueue.due_at <= datetime.utcnow())
+    return (await session.execute(stmt)).scalar() or 0
+
+
+async def requeue_all_users(session: AsyncSession) -> int:
+    """Make every queued user due now (does not commit)"""
+    now = datetime.utcnow()
+    result = await session.execute(
+        update(ResegmentQueue)
+        .where(ResegmentQueue.due_at > now)
+        .values(due_at=now, updated_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
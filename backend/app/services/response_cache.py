@@ -0,0 +1,130 @@
+"""Persistent prompt -> response cache for LLM calls
+
+Segmentation and rule prompts are pure functions of the prompt text,
+context and model, so a response is stored in Postgres under a hash of
+the model and the full rendered prompt. Identical requests in reruns,
+replays or after a restart are answered from the table without a
+provider call. Entries expire after LLM_CACHE_TTL; evict() removes
+expired rows and trims the table to LLM_CACHE_MAX_ENTRIES, dropping the
+least recently hit first.
+
+The cache never fails a generation: database errors are logged and
+treated as a miss.
+"""
+
+import hashlib
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import delete, select, update
+
+from app.config import settings
+from app.database.db import async_session
+from app.database.models import LLMResponseCache
+from app.database.upsert import upsert_statement
+from app.services.run_telemetry import record_cache
+from app.utils.logger import logger
+
+
+def cache_key(model: str, full_prompt: str) -> str:
+    """Content address of one request to one model"""
+    return hashlib.sha256(f"{model}\n{full_prompt}".encode()).hexdigest()
+
+
+class ResponseCache:
+    """llm_response_cache access with TTL and LRU trimming"""
+
+    def __init__(self, session_factory=None, ttl: int = None):
+        self.session_factory = session_factory or async_session
+        self.ttl = ttl or settings.LLM_CACHE_TTL
+
+    async def get(self, keys: List[str]) -> Optional[str]:
+        """Response stored under the first of `keys` that is cached, if any
+
+        Keys are given in order of preference, e.g. one per provider in
+        routing order.
+        """
+        now = datetime.utcnow()
+        try:
+            async with self.session_factory() as session:
+                rows = dict(
+                    (
+                        await session.execute(
+                            select(
+                                LLMResponseCache.key, LLMResponseCache.response
+                            ).where(
+                                LLMResponseCache.key.in_(keys),
+                                LLMResponseCache.expires_at > now,
+                            )
+                        )
+                    ).all()
+                )
+                key = next((key for key in keys if key in rows), None)
+                if key is not None:
+                    await session.execute(
+                        update(LLMResponseCache)
+                        .where(LLMResponseCache.key == key)
+                        .values(hits=LLMResponseCache.hits + 1, last_hit_at=now)
+                    )
+                    await session.commit()
+        except Exception as e:
+            logger.warning(f"LLM response cache lookup failed: {e}")
+            return None
+
+        record_cache("llm_response", int(key is not None), int(key is None))
+        return rows[key] if key is not None else None
+
+    async def put(self, key: str, model: str, response: str) -> bool:
+        """Store a response, replacing any expired or older entry"""
+        now = datetime.utcnow()
+        try:
+            async with self.session_factory() as session:
+                await session.execute(
+                    upsert_statement(
+                        session,
+                        LLMResponseCache,
+                        [
+                            {
+                                "key": key,
+                                "model": model,
+                                "response": response,
+                                "hits": 0,
+                                "created_at": now,
+                                "last_hit_at": now,
+                                "expires_at": now + timedelta(seconds=self.ttl),
+                            }
+                        ],
+                        ["key"],
+                    )
+                )
+                await session.commit()
+            return True
+        except Exception as e:
+            logger.warning(f"LLM response cache write failed: {e}")
+            return False
+
+    async def evict(self, max_entries: int = None) -> int:
+        """Delete expired entries, then the least recently hit beyond the cap"""
+        max_entries = (
+            settings.LLM_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        )
+        async with self.session_factory() as session:
+            expired = await session.execute(
+                delete(LLMResponseCache).where(
+                    LLMResponseCache.expires_at <= datetime.utcnow()
+                )
+            )
+            overflow = (
+                select(LLMResponseCache.key)
+                .order_by(LLMResponseCache.last_hit_at.desc())
+                .offset(max_entries)
+            )
+            trimmed = await session.execute(
+                delete(LLMResponseCache).where(LLMResponseCache.key.in_(overflow))
+            )
+            await session.commit()
+
+        removed = expired.rowcount + trimmed.rowcount
+        if removed:
+            logger.info(f"Evicted {removed} LLM response cache entries")
+        return removed
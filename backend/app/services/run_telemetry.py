@@ -0,0 +1,212 @@
+"""Per-run telemetry for analysis jobs
+
+A RunTelemetry collects phase timings, LLM usage per provider and cache
+hit ratios while it is active. It is found through a context variable, so
+worker tasks spawned during the run and the LLM service record into it
+without threading it through every call. Snapshots are stored on the
+analysis_runs row and exported as Prometheus metrics when the run ends.
+"""
+
+import statistics
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from app.utils.metrics import (
+    analysis_phase_seconds_total,
+    analysis_run_duration,
+    analysis_run_users_per_second,
+    analysis_run_users_total,
+    cache_hits_total,
+    cache_misses_total,
+    llm_request_duration,
+    llm_requests_total,
+    llm_tokens_total,
+)
+
+PHASES = (
+    "event_fetch",
+    "aggregation",
+    "llm_classification",
+    "db_write",
+    "rule_generation",
+)
+
+_LLM_COUNTERS = ("calls", "failures", "prompt_tokens", "completion_tokens", "seconds")
+
+_current: ContextVar[Optional["RunTelemetry"]] = ContextVar(
+    "run_telemetry", default=None
+)
+
+
+class RunTelemetry:
+    """Timings and counters of one analysis run
+
+    Phase times are summed over concurrent workers, so with several
+    workers they can add up to more than the run's wall time.
+    """
+
+    def __init__(self, data: Optional[Dict[str, Any]] = None):
+        # Continue from a stored snapshot when resuming a run
+        data = data or {}
+        self.elapsed = data.get("elapsed_seconds", 0.0)
+        self.phase_seconds = Counter(data.get("phase_seconds") or {})
+        self.llm = {
+            provider: Counter({k: v for k, v in usage.items() if k in _LLM_COUNTERS})
+            for provider, usage in (data.get("llm") or {}).items()
+        }
+        self.cache = {
+            pattern: Counter(hits=stats.get("hits", 0), misses=stats.get("misses", 0))
+            for pattern, stats in (data.get("cache") or {}).items()
+        }
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def active(self):
+        """Make this the telemetry recorded into by the current task"""
+        token = _current.set(self)
+        try:
+            yield self
+        finally:
+            _current.reset(token)
+
+    def elapsed_seconds(self) -> float:
+        return self.elapsed + time.perf_counter() - self._started
+
+    def snapshot(self, users_done: int = 0, users_failed: int = 0) -> Dict[str, Any]:
+        """JSON-safe summary, stored on the analysis_runs row"""
+        elapsed = self.elapsed_seconds()
+        return {
+            "elapsed_seconds": round(elapsed, 3),
+            "phase_seconds": {
+                name: round(seconds, 3) for name, seconds in self.phase_seconds.items()
+            },
+            "users_done": users_done,
+            "users_failed": users_failed,
+            "users_per_sec": round(users_done / elapsed, 2) if elapsed > 0 else 0.0,
+            "llm": {
+                provider: {
+                    **dict(usage),
+                    "seconds": round(usage.get("seconds", 0.0), 3),
+                }
+                for provider, usage in self.llm.items()
+            },
+            "cache": {
+                pattern: {
+                    "hits": stats["hits"],
+                    "misses": stats["misses"],
+                    "hit_ratio": _ratio(stats["hits"], stats["hits"] + stats["misses"]),
+                }
+                for pattern, stats in self.cache.items()
+            },
+        }
+
+    def export(self, job_name: str, state: str, users_done: int, users_failed: int):
+        """Publish the finished run's totals as Prometheus metrics"""
+        # Admin jobs run as "analysis_job:<id>"; keep the label bounded
+        job = job_name.split(":")[0]
+        elapsed = self.elapsed_seconds()
+        for name, seconds in self.phase_seconds.items():
+            analysis_phase_seconds_total.labels(job=job, phase=name).inc(seconds)
+        analysis_run_duration.labels(job=job, state=state).observe(elapsed)
+        analysis_run_users_total.labels(job=job, outcome="done").inc(users_done)
+        analysis_run_users_total.labels(job=job, outcome="failed").inc(users_failed)
+        if users_done and elapsed > 0:
+            analysis_run_users_per_second.labels(job=job).set(users_done / elapsed)
+
+
+@contextmanager
+def phase(name: str):
+    """Add the block's wall time to a phase of the active run, if any"""
+    telemetry = _current.get()
+    if telemetry is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        telemetry.phase_seconds[name] += time.perf_counter() - started
+
+
+def record_llm_call(provider: str, ok: bool, seconds: float):
+    """Count one LLM request and its latency"""
+    llm_requests_total.labels(
+        provider=provider, status="success" if ok else "error"
+    ).inc()
+    llm_request_duration.labels(provider=provider).observe(seconds)
+    telemetry = _current.get()
+    if telemetry is not None:
+        usage = telemetry.llm.setdefault(provider, Counter())
+        usage["calls"] += 1
+        usage["failures"] += 0 if ok else 1
+        usage["seconds"] += seconds
+
+
+def record_llm_tokens(provider: str, prompt_tokens: int, completion_tokens: int):
+    """Count tokens reported by a provider's usage metadata"""
+    llm_tokens_total.labels(provider=provider, kind="prompt").inc(prompt_tokens)
+    llm_tokens_total.labels(provider=provider, kind="completion").inc(completion_tokens)
+    telemetry = _current.get()
+    if telemetry is not None:
+        usage = telemetry.llm.setdefault(provider, Counter())
+        usage["prompt_tokens"] += prompt_tokens
+        usage["completion_tokens"] += completion_tokens
+
+
+def record_cache(key_pattern: str, hits: int, misses: int):
+    """Count cache hits and misses for a key pattern"""
+    if hits:
+        cache_hits_total.labels(key_pattern=key_pattern).inc(hits)
+    if misses:
+        cache_misses_total.labels(key_pattern=key_pattern).inc(misses)
+    telemetry = _current.get()
+    if telemetry is not None:
+        stats = telemetry.cache.setdefault(key_pattern, Counter())
+        stats["hits"] += hits
+        stats["misses"] += misses
+
+
+def compare_runs(snapshots: List[Dict[str, Any]], factor: float) -> Dict[str, Any]:
+    """Baseline of recent runs and the metrics where each run regressed
+
+    The baseline is the median over the given snapshots. A run regressed
+    on a phase that took more than `factor` times its baseline time, or on
+    throughput below the baseline divided by `factor`.
+    """
+    baseline = {
+        "elapsed_seconds": _median(s.get("elapsed_seconds") for s in snapshots),
+        "users_per_sec": _median(s.get("users_per_sec") for s in snapshots),
+        "phase_seconds": {
+            name: _median((s.get("phase_seconds") or {}).get(name) for s in snapshots)
+            for name in PHASES
+        },
+    }
+
+    regressions = []
+    for snapshot in snapshots:
+        slow = [
+            name
+            for name, seconds in (snapshot.get("phase_seconds") or {}).items()
+            if baseline["phase_seconds"].get(name)
+            and seconds > factor * baseline["phase_seconds"][name]
+        ]
+        if (
+            baseline["users_per_sec"]
+            and snapshot.get("users_done")
+            and snapshot.get("users_per_sec", 0) * factor < baseline["users_per_sec"]
+        ):
+            slow.append("users_per_sec")
+        regressions.append(slow)
+    return {"baseline": baseline, "regressions": regressions}
+
+
+def _median(values) -> Optional[float]:
+    values = [value for value in values if value is not None]
+    return round(statistics.median(values), 3) if values else None
+
+
+def _ratio(part: int, total: int) -> Optional[float]:
+    return round(part / total, 3) if total else None
@@ -1,7 +1,14 @@
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from app.services.ga4_service import GA4Service
 from app.services.llm_service import LLMService
-from app.services.analysis_engine import AnalysisEngine
+from app.services.analysis_engine import (
+    AnalysisEngine,
+    DRAIN_JOB_NAME,
+    HOURLY_JOB_NAME,
+)
+from app.services.job_lock import single_instance
+from app.services.analysis_jobs import claim_next_job, run_analysis_job
+from app.services.response_cache import ResponseCache
 from app.database import async_session
 from app.config import settings
 from app.utils.logger import logger
@@ -9,6 +16,7 @@ from app.utils.logger import logger
 scheduler = AsyncIOScheduler()
 
 
+@single_instance(HOURLY_JOB_NAME)
 async def hourly_analysis_job():
     """Runs every hour to analyze GA4 data and generate insights"""
     try:
@@ -21,7 +29,7 @@ async def hourly_analysis_job():
         llm_svc = LLMService(settings.GEMINI_API_KEY, settings.DEEPSEEK_API_KEY)
 
         async with async_session() as db:
-            engine = AnalysisEngine(ga4_svc, llm_svc, db)
+            engine = AnalysisEngine(ga4_svc, llm_svc, db, session_factory=async_session)
             await engine.run_hourly_analysis()
 
         logger.info("=" * 50)
@@ -32,27 +40,94 @@ async def hourly_analysis_job():
         raise
 
 
+@single_instance(DRAIN_JOB_NAME)
+async def resegment_drain_job():
+    """Re-segments due users from the queue within the LLM budget"""
+    try:
+        llm_svc = LLMService(settings.GEMINI_API_KEY, settings.DEEPSEEK_API_KEY)
+
+        async with async_session() as db:
+            engine = AnalysisEngine(None, llm_svc, db, session_factory=async_session)
+            await engine.drain_resegment_queue()
+    except Exception as e:
+        logger.error(f"Re-segmentation drain failed: {e}")
+        raise
+
+
+@single_instance("analysis_jobs")
+async def analysis_jobs_job():
+    """Runs the oldest admin-triggered analysis job, if any"""
+    try:
+        async with async_session() as db:
+            job_id = await claim_next_job(db)
+            if job_id is None:
+                return
+
+            ga4_svc = GA4Service(
+                settings.GA4_CREDENTIALS_JSON, settings.GA4_PROPERTY_ID
+            )
+            llm_svc = LLMService(settings.GEMINI_API_KEY, settings.DEEPSEEK_API_KEY)
+            engine = AnalysisEngine(ga4_svc, llm_svc, db, session_factory=async_session)
+            await run_analysis_job(engine, job_id)
+    except Exception as e:
+        logger.error(f"Analysis job runner failed: {e}")
+        raise
+
+
+@single_instance("llm_cache_eviction")
+async def llm_cache_eviction_job():
+    """Drops expired and least recently hit cached LLM responses"""
+    try:
+        await ResponseCache().evict()
+    except Exception as e:
+        logger.error(f"LLM response cache eviction failed: {e}")
+        raise
+
+
 def start_scheduler():
     """Start the APScheduler"""
     try:
-        # Add job to run every hour
-        scheduler.add_job(hourly_analysis_job, "interval", hours=1)
+        # Runs that outlast their interval are never stacked locally
+        # (max_instances/coalesce); the job lock extends that cluster-wide
+        scheduler.add_job(
+            hourly_analysis_job, "interval", hours=1, max_instances=1, coalesce=True
+        )
+        # Drain the re-segmentation queue continuously in small budgets
+        scheduler.add_job(
+            resegment_drain_job,
+            "interval",
+            seconds=settings.RESEGMENT_DRAIN_INTERVAL,
+            max_instances=1,
+            coalesce=True,
+        )
+        # Pick up admin-triggered jobs from analysis_jobs
+        scheduler.add_job(
+            analysis_jobs_job,
+            "interval",
+            seconds=settings.ANALYSIS_JOB_POLL_INTERVAL,
+            max_instances=1,
+            coalesce=True,
+        )
+        if settings.LLM_CACHE_ENABLED:
+            scheduler.add_job(
+                llm_cache_eviction_job,
+                "interval",
+                seconds=settings.LLM_CACHE_EVICT_INTERVAL,
+                max_instances=1,
+                coalesce=True,
+            )
         scheduler.start()
-        logger.info("Scheduler started - jobs will run every hour")
+        logger.info(
+            "Scheduler started - analysis every hour, re-segmentation every "
+            f"{settings.RESEGMENT_DRAIN_INTERVAL}s"
+        )
     except Exception as e:
         logger.error(f"Failed to start scheduler: {e}")
         raise
 
 
-# Services package
-from app.services.ga4_service import GA4Service
-from app.services.llm_service import LLMService
-from app.services.analysis_engine import AnalysisEngine
-from app.services.scheduler import start_scheduler
-
-__all__ = [
-    "GA4Service",
-    "LLMService",
-    "AnalysisEngine",
-    "start_scheduler",
-]
+def stop_scheduler():
+    """Stop the APScheduler without waiting for running jobs"""
+    if scheduler.running:
+        scheduler.shutdown(wait=False)
+        logger.info("Scheduler stopped")
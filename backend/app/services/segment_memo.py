@@ -0,0 +1,64 @@
+"""Memoization of segmentation results by behavior fingerprint
+
+Users whose event summaries land in the same log-scale buckets share a
+fingerprint, so a segment classified once can be reused without another
+LLM call until the memo entry expires.
+"""
+
+import hashlib
+import json
+import math
+from typing import Any, Dict, Iterable
+
+from app.cache import cache
+from app.config import settings
+from app.services.run_telemetry import record_cache
+
+
+def bucket_count(count: int) -> int:
+    """Log2 bucket: 1 -> 1, 2-3 -> 2, 4-7 -> 3, 8-15 -> 4, ..."""
+    return int(math.log2(count)) + 1 if count > 0 else 0
+
+
+def behavior_fingerprint(event_summary: Dict[str, Any]) -> str:
+    """Canonical hash of the bucketed event distribution"""
+    distribution = event_summary.get("event_distribution") or {}
+    buckets = {
+        event_name: bucket_count(count)
+        for event_name, count in distribution.items()
+        if count > 0
+    }
+    canonical = json.dumps(buckets, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()[:32]
+
+
+class SegmentMemo:
+    """Redis-backed fingerprint -> segment data memo with a TTL"""
+
+    KEY_PREFIX = "segment_memo:"
+
+    def __init__(self, ttl: int = None):
+        self.ttl = ttl or settings.SEGMENT_MEMO_TTL
+
+    def _key(self, fingerprint: str) -> str:
+        return f"{self.KEY_PREFIX}{fingerprint}"
+
+    async def get_many(self, fingerprints: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Look up memoized segment data, recording hits and misses"""
+        fingerprints = list(set(fingerprints))
+        found = await cache.get_many([self._key(fp) for fp in fingerprints])
+
+        hits = {
+            fp: found[self._key(fp)] for fp in fingerprints if self._key(fp) in found
+        }
+        record_cache("segment_memo", len(hits), len(fingerprints) - len(hits))
+        return hits
+
+    async def set_many(self, results: Dict[str, Dict[str, Any]]) -> bool:
+        """Memoize segment data by fingerprint, skipping error fallbacks"""
+        items = {
+            self._key(fp): segment_data
+            for fp, segment_data in results.items()
+            if not segment_data.get("is_default")
+        }
+        return await cache.set_many(items, ttl=self.ttl)
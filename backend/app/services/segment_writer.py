@@ -0,0 +1,76 @@
+"""Buffered bulk writer for user segments"""
+
+from typing import Dict, Iterable, List
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache import cache
+from app.config import settings
+from app.database.models import UserSegment
+from app.database.upsert import upsert_statement
+from app.models.records import SegmentRecord
+from app.services.resegment_queue import schedule_statement
+from app.services.run_telemetry import phase
+
+# Segments stay cached for 24 hours (86400 seconds)
+SEGMENT_CACHE_TTL = 86400
+
+
+class SegmentWriter:
+    """Collects segment records and writes them in batched upserts
+
+    Each flush is one INSERT ... ON CONFLICT (user_pseudo_id) DO UPDATE, a
+    matching re-segmentation queue upsert, one commit and one pipelined
+    cache write.
+    """
+
+    def __init__(self, session: AsyncSession, flush_size: int = None):
+        self.session = session
+        self.flush_size = max(1, flush_size or settings.ANALYSIS_WRITE_BATCH_SIZE)
+        self._pending: Dict[str, SegmentRecord] = {}
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    @property
+    def full(self) -> bool:
+        return len(self._pending) >= self.flush_size
+
+    def add(self, records: Iterable[SegmentRecord]):
+        """Buffer records; a later record for the same user replaces the earlier"""
+        for record in records:
+            self._pending[record.user_pseudo_id] = record
+
+    async def flush(self) -> List[SegmentRecord]:
+        """Write all buffered records and return them with their database ids"""
+        if not self._pending:
+            return []
+
+        # Sorted keys give concurrent writers a consistent row lock order
+        pending = [self._pending[key] for key in sorted(self._pending)]
+        self._pending = {}
+
+        stmt = upsert_statement(
+            self.session,
+            UserSegment,
+            [record.to_row() for record in pending],
+            index_elements=["user_pseudo_id"],
+        ).returning(*SegmentRecord.select_columns())
+        with phase("db_write"):
+            try:
+                result = await self.session.execute(stmt)
+                written = [SegmentRecord.from_row(row) for row in result]
+                await self.session.execute(schedule_statement(self.session, written))
+                await self.session.commit()
+            except Exception:
+                await self.session.rollback()
+                raise
+
+        await cache.set_many(
+            {
+                SegmentRecord.cache_key(record.user_pseudo_id): record.to_cache()
+                for record in written
+            },
+            ttl=SEGMENT_CACHE_TTL,
+        )
+        return written
@@ -19,6 +19,26 @@ class LLMError(AppException):
     pass
 
 
+class ProviderUnavailableError(LLMError):
+    """LLM provider skipped because its circuit breaker is open"""
+
+    pass
+
+
+class LLMRateLimitError(LLMError):
+    """LLM provider rejected or would reject a call for exceeding its rate limit"""
+
+    def __init__(self, message: str, retry_after: float = None):
+        super().__init__(message, 429)
+        self.retry_after = retry_after
+
+
+class JobLockLostError(AppException):
+    """A scheduled job's lock was released while the job was still running"""
+
+    pass
+
+
 class DatabaseError(AppException):
     """Database errors"""
 
@@ -0,0 +1,59 @@
+"""Shared keep-alive HTTP client for outbound API calls"""
+
+import httpx
+from typing import Optional
+from app.config import settings
+from app.utils.logger import logger
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class SharedHTTPClient:
+    """Long-lived httpx.AsyncClient with a bounded connection pool
+
+    The client is created on first use, so scheduler jobs, the worker and
+    scripts get one without going through the app lifespan; close() is
+    called on shutdown to release pooled connections.
+    """
+
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            http2 = settings.LLM_HTTP2 and _http2_available()
+            self._client = httpx.AsyncClient(
+                http2=http2,
+                transport=self.transport,
+                limits=httpx.Limits(
+                    max_connections=settings.LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.LLM_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY,
+                ),
+                timeout=httpx.Timeout(
+                    connect=settings.LLM_CONNECT_TIMEOUT,
+                    read=settings.LLM_READ_TIMEOUT,
+                    write=settings.LLM_CONNECT_TIMEOUT,
+                    pool=settings.LLM_CONNECT_TIMEOUT,
+                ),
+            )
+            logger.info(f"HTTP client created (http2={http2})")
+        return self._client
+
+    async def close(self) -> None:
+        """Close pooled connections"""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+            logger.info("HTTP client closed")
+        self._client = None
+
+
+http_client = SharedHTTPClient()
@@ -74,6 +74,102 @@ llm_request_duration = Histogram(
     registry=metrics_registry,
 )
 
+llm_tokens_total = Counter(
+    name="llm_tokens_total",
+    documentation="LLM tokens reported by providers (prompt, completion)",
+    labelnames=["provider", "kind"],
+    registry=metrics_registry,
+)
+
+llm_prompt_tokens_estimated = Histogram(
+    name="llm_prompt_tokens_estimated",
+    documentation="Estimated tokens of each rendered LLM prompt",
+    labelnames=["call_type"],
+    buckets=(250, 500, 1000, 2000, 4000, 8000, 16000),
+    registry=metrics_registry,
+)
+
+llm_hedged_requests_total = Counter(
+    name="llm_hedged_requests_total",
+    documentation="Hedged LLM requests by call type and winning provider",
+    labelnames=["call_type", "winner"],
+    registry=metrics_registry,
+)
+
+llm_provider_circuit_state = Gauge(
+    name="llm_provider_circuit_state",
+    documentation="LLM provider circuit breaker state (0 closed, 1 half-open, 2 open)",
+    labelnames=["provider"],
+    registry=metrics_registry,
+)
+
+llm_provider_latency_ewma = Gauge(
+    name="llm_provider_latency_ewma",
+    documentation="EWMA of successful LLM call latency in seconds",
+    labelnames=["provider"],
+    registry=metrics_registry,
+)
+
+llm_concurrency_limit = Gauge(
+    name="llm_concurrency_limit",
+    documentation="Adaptive (AIMD) limit on in-flight LLM calls per provider",
+    labelnames=["provider"],
+    registry=metrics_registry,
+)
+
+llm_rate_limited_total = Counter(
+    name="llm_rate_limited_total",
+    documentation="Rate-limited LLM calls by source "
+    "(provider: 429 response, local: token bucket wait too long)",
+    labelnames=["provider", "source"],
+    registry=metrics_registry,
+)
+
+# Analysis Metrics
+segmentation_decisions_total = Counter(
+    name="segmentation_decisions_total",
+    documentation="User segmentation decisions by source "
+    "(unchanged, no_events, heuristic, memo, llm)",
+    labelnames=["source"],
+    registry=metrics_registry,
+)
+
+scheduled_job_runs_total = Counter(
+    name="scheduled_job_runs_total",
+    documentation="Scheduled job runs by outcome (completed, failed, skipped)",
+    labelnames=["job", "outcome"],
+    registry=metrics_registry,
+)
+
+analysis_phase_seconds_total = Counter(
+    name="analysis_phase_seconds_total",
+    documentation="Time spent per analysis run phase, summed over workers",
+    labelnames=["job", "phase"],
+    registry=metrics_registry,
+)
+
+analysis_run_duration = Histogram(
+    name="analysis_run_duration",
+    documentation="Analysis run wall time in seconds",
+    labelnames=["job", "state"],
+    buckets=(1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0),
+    registry=metrics_registry,
+)
+
+analysis_run_users_total = Counter(
+    name="analysis_run_users_total",
+    documentation="Users processed by analysis runs by outcome (done, failed)",
+    labelnames=["job", "outcome"],
+    registry=metrics_registry,
+)
+
+analysis_run_users_per_second = Gauge(
+    name="analysis_run_users_per_second",
+    documentation="Throughput of the last finished analysis run",
+    labelnames=["job"],
+    registry=metrics_registry,
+)
+
 # Cache Metrics
 cache_hits_total = Counter(
     name="cache_hits_total",
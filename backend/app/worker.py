@@ -0,0 +1,46 @@
+"""Standalone analysis worker: python -m app.worker
+
+Owns the scheduler and runs every analysis job on its own event loop, so
+LLM-bound work never competes with API requests. Run API processes with
+SCHEDULER_ENABLED=false next to one or more workers; the job locks keep
+multiple workers from running the same job at once.
+"""
+
+import asyncio
+import signal
+
+from prometheus_client import start_http_server
+
+from app.cache import cache
+from app.utils.http_client import http_client
+from app.config import settings
+from app.services.scheduler import start_scheduler, stop_scheduler
+from app.utils.logger import logger
+from app.utils.metrics import metrics_registry
+
+
+async def run_worker():
+    """Run scheduled jobs until SIGINT or SIGTERM"""
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    logger.info("Analysis worker starting...")
+    await cache.connect()
+    if settings.WORKER_METRICS_PORT:
+        start_http_server(settings.WORKER_METRICS_PORT, registry=metrics_registry)
+        logger.info(f"Worker metrics on port {settings.WORKER_METRICS_PORT}")
+
+    start_scheduler()
+    try:
+        await stop.wait()
+    finally:
+        logger.info("Analysis worker shutting down...")
+        stop_scheduler()
+        await cache.disconnect()
+        await http_client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(run_worker())
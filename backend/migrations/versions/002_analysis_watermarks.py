@@ -0,0 +1,30 @@
+"""Add analysis_watermarks table for incremental analysis runs
+
+Revision ID: 002
+Revises: 001
+Create Date: 2025-01-25 09:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "002"
+down_revision = "001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "analysis_watermarks",
+        sa.Column("job_name", sa.String(), nullable=False),
+        sa.Column("last_event_id", sa.BigInteger(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("job_name"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("analysis_watermarks")
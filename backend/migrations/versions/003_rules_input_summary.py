@@ -0,0 +1,30 @@
+"""Store the event aggregate personalization rules were generated from
+
+Revision ID: 003
+Revises: 002
+Create Date: 2025-01-26 09:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "003"
+down_revision = "002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "personalization_rules",
+        sa.Column(
+            "input_summary", postgresql.JSONB(astext_type=sa.Text()), nullable=True
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("personalization_rules", "input_summary")
@@ -0,0 +1,43 @@
+"""Add resegment_queue table for continuous re-segmentation
+
+Revision ID: 004
+Revises: 003
+Create Date: 2025-01-27 09:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "004"
+down_revision = "003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "resegment_queue",
+        sa.Column("user_pseudo_id", sa.String(), nullable=False),
+        sa.Column("due_at", sa.DateTime(), nullable=False),
+        sa.Column("confidence", sa.Float(), nullable=True),
+        sa.Column("active", sa.Boolean(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("user_pseudo_id"),
+    )
+    op.create_index("idx_resegment_due", "resegment_queue", ["due_at"])
+
+    # Queue every segmented user for re-segmentation when it expires
+    op.execute(
+        """
+        INSERT INTO resegment_queue (user_pseudo_id, due_at, confidence, active)
+        SELECT user_pseudo_id, COALESCE(expires_at, NOW()), confidence, false
+        FROM user_segments
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("idx_resegment_due", table_name="resegment_queue")
+    op.drop_table("resegment_queue")
@@ -0,0 +1,49 @@
+"""Add analysis_jobs table for admin-triggered analysis runs
+
+Revision ID: 005
+Revises: 004
+Create Date: 2025-01-28 09:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "005"
+down_revision = "004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "analysis_jobs",
+        sa.Column("id", sa.BigInteger(), nullable=False),
+        sa.Column("kind", sa.String(), nullable=False),
+        sa.Column("state", sa.String(), nullable=False),
+        sa.Column("users_total", sa.Integer(), nullable=True),
+        sa.Column("users_done", sa.Integer(), nullable=True),
+        sa.Column("users_failed", sa.Integer(), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("cancel_requested", sa.Boolean(), nullable=True),
+        sa.Column("requested_by", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("started_at", sa.DateTime(), nullable=True),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("idx_analysis_jobs_state", "analysis_jobs", ["state", "id"])
+    op.create_index(
+        "uq_analysis_jobs_active_kind",
+        "analysis_jobs",
+        ["kind"],
+        unique=True,
+        postgresql_where=sa.text("state IN ('queued', 'running')"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("uq_analysis_jobs_active_kind", table_name="analysis_jobs")
+    op.drop_index("idx_analysis_jobs_state", table_name="analysis_jobs")
+    op.drop_table("analysis_jobs")
@@ -0,0 +1,48 @@
+"""Add analysis_runs checkpoints and queue claim ownership
+
+Revision ID: 006
+Revises: 005
+Create Date: 2025-01-29 09:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "006"
+down_revision = "005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "analysis_runs",
+        sa.Column("id", sa.BigInteger(), nullable=False),
+        sa.Column("job_name", sa.String(), nullable=False),
+        sa.Column("state", sa.String(), nullable=False),
+        sa.Column("phase", sa.String(), nullable=False),
+        sa.Column("event_low", sa.BigInteger(), nullable=True),
+        sa.Column("event_high", sa.BigInteger(), nullable=True),
+        sa.Column("users_done", sa.Integer(), nullable=True),
+        sa.Column("users_failed", sa.Integer(), nullable=True),
+        sa.Column("llm_classified", sa.Integer(), nullable=True),
+        sa.Column("resumed_count", sa.Integer(), nullable=True),
+        sa.Column("started_at", sa.DateTime(), nullable=True),
+        sa.Column("checkpoint_at", sa.DateTime(), nullable=True),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "idx_analysis_runs_job_state", "analysis_runs", ["job_name", "state"]
+    )
+    op.add_column(
+        "resegment_queue", sa.Column("claimed_by_run", sa.BigInteger(), nullable=True)
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("resegment_queue", "claimed_by_run")
+    op.drop_index("idx_analysis_runs_job_state", table_name="analysis_runs")
+    op.drop_table("analysis_runs")
@@ -0,0 +1,28 @@
+"""Add per-run telemetry to analysis_runs
+
+Revision ID: 007
+Revises: 006
+Create Date: 2025-01-30 09:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "007"
+down_revision = "006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "analysis_runs",
+        sa.Column("telemetry", postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("analysis_runs", "telemetry")
@@ -0,0 +1,42 @@
+"""Add llm_response_cache
+
+Revision ID: 008
+Revises: 007
+Create Date: 2025-01-31 09:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "008"
+down_revision = "007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "llm_response_cache",
+        sa.Column("key", sa.String(length=64), nullable=False),
+        sa.Column("model", sa.String(), nullable=False),
+        sa.Column("response", sa.Text(), nullable=False),
+        sa.Column("hits", sa.Integer(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("last_hit_at", sa.DateTime(), nullable=True),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("key"),
+    )
+    op.create_index(
+        "idx_llm_response_cache_expires", "llm_response_cache", ["expires_at"]
+    )
+    op.create_index(
+        "idx_llm_response_cache_last_hit", "llm_response_cache", ["last_hit_at"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("idx_llm_response_cache_last_hit", table_name="llm_response_cache")
+    op.drop_index("idx_llm_response_cache_expires", table_name="llm_response_cache")
+    op.drop_table("llm_response_cache")
@@ -0,0 +1,27 @@
+"""Mark personalization rules set manually by an admin
+
+Revision ID: 009
+Revises: 008
+Create Date: 2025-02-01 09:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "009"
+down_revision = "008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "personalization_rules",
+        sa.Column("manual", sa.Boolean(), server_default=sa.false(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("personalization_rules", "manual")
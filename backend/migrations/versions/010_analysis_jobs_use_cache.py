@@ -0,0 +1,27 @@
+"""Let analysis jobs bypass the LLM response cache
+
+Revision ID: 010
+Revises: 009
+Create Date: 2025-02-02 09:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "010"
+down_revision = "009"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "analysis_jobs",
+        sa.Column("use_cache", sa.Boolean(), server_default=sa.true(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("analysis_jobs", "use_cache")
@@ -5,10 +5,12 @@ Provides test database, HTTP client, and common fixtures
 
 import pytest
 import asyncio
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
 from typing import AsyncGenerator
 from httpx import AsyncClient
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy.pool import NullPool
+from sqlalchemy.pool import NullPool, StaticPool
 
 from app.main import app
 from app.database.models import Base
@@ -18,6 +20,56 @@ from app.database.db import get_db
 TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
 
 
+class FakeSession:
+    """AsyncSession stand-in for tests that need no database
+
+    get() returns the object it was created with, commits are counted and
+    get_bind() reports the given dialect.
+    """
+
+    def __init__(self, obj=None, dialect_name="postgresql"):
+        self.obj = obj
+        self.commits = 0
+        self.bind = SimpleNamespace(dialect=SimpleNamespace(name=dialect_name))
+
+    def get_bind(self):
+        return self.bind
+
+    async def get(self, model, ident, **kwargs):
+        return self.obj
+
+    async def refresh(self, obj, attribute_names=None):
+        pass
+
+    async def commit(self):
+        self.commits += 1
+
+    async def rollback(self):
+        pass
+
+
+def make_session_factory(opened):
+    """Session factory yielding a new FakeSession, recorded in `opened`"""
+
+    @asynccontextmanager
+    async def factory():
+        session = FakeSession()
+        opened.append(session)
+        yield session
+
+    return factory
+
+
+class FakeClock:
+    """Monotonic clock that only moves when a test sets `now`"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
 @pytest.fixture(scope="session")
 def event_loop():
     """Create event loop for async tests"""
@@ -55,6 +107,22 @@ async def async_session(async_engine) -> AsyncGenerator[AsyncSession, None]:
         yield session
 
 
+@pytest.fixture
+async def session_factory():
+    """Session factory on a fresh in-memory SQLite database with all tables
+
+    Every session shares one connection, so data committed in one session
+    is visible to the next.
+    """
+    engine = create_async_engine(TEST_DATABASE_URL, poolclass=StaticPool, echo=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    yield async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    await engine.dispose()
+
+
 @pytest.fixture(scope="function")
 async def async_client(async_session) -> AsyncGenerator[AsyncClient, None]:
     """Create async HTTP client for testing API endpoints"""
@@ -0,0 +1,735 @@
+"""Tests for AnalysisEngine orchestration"""
+
+import pytest
+import asyncio
+
+from app.services.analysis_engine import AnalysisEngine
+from tests.conftest import FakeSession, make_session_factory
+
+
+@pytest.mark.asyncio
+async def test_segment_users_respects_concurrency_limit(monkeypatch):
+    """No more than `concurrency` users are segmented at the same time"""
+    in_flight = 0
+    peak = 0
+
+    async def fake_segment_batch(self, user_ids):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return user_ids
+
+    monkeypatch.setattr(AnalysisEngine, "segment_batch", fake_segment_batch)
+
+    opened = []
+    engine = AnalysisEngine(
+        None,
+        None,
+        None,
+        session_factory=make_session_factory(opened),
+        concurrency=3,
+        batch_size=1,
+    )
+    stats = await engine.segment_users([f"user_{i}" for i in range(10)])
+
+    assert stats == {"segmented": 10, "failed": 0}
+    assert peak == 3
+    # Every worker got a session of its own
+    assert len(opened) == 3
+
+
+@pytest.mark.asyncio
+async def test_segment_users_isolates_failures(monkeypatch):
+    """One failing user does not stop the others"""
+    done = []
+
+    async def fake_segment_batch(self, user_ids):
+        if "bad_user" in user_ids:
+            raise RuntimeError("LLM exploded")
+        done.extend(user_ids)
+        return user_ids
+
+    monkeypatch.setattr(AnalysisEngine, "segment_batch", fake_segment_batch)
+
+    engine = AnalysisEngine(
+        None,
+        None,
+        None,
+        session_factory=make_session_factory([]),
+        concurrency=2,
+        batch_size=1,
+    )
+    stats = await engine.segment_users(["user_a", "bad_user", "user_b"])
+
+    assert stats == {"segmented": 2, "failed": 1}
+    assert sorted(done) == ["user_a", "user_b"]
+
+
+@pytest.mark.asyncio
+async def test_segment_users_without_factory_runs_sequentially(monkeypatch):
+    """Without a session factory the shared session is used one user at a time"""
+    in_flight = 0
+    peak = 0
+
+    async def fake_segment_batch(self, user_ids):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0)
+        in_flight -= 1
+        return user_ids
+
+    monkeypatch.setattr(AnalysisEngine, "segment_batch", fake_segment_batch)
+
+    engine = AnalysisEngine(None, None, FakeSession(), concurrency=5, batch_size=1)
+    stats = await engine.segment_users(["a", "b", "c"])
+
+    assert stats["segmented"] == 3
+    assert peak == 1
+
+
+@pytest.mark.asyncio
+async def test_segment_users_groups_users_into_batches(monkeypatch):
+    """Users are handed to segment_batch in chunks of batch_size"""
+    batches = []
+
+    async def fake_segment_batch(self, user_ids):
+        batches.append(list(user_ids))
+        return user_ids
+
+    monkeypatch.setattr(AnalysisEngine, "segment_batch", fake_segment_batch)
+
+    engine = AnalysisEngine(None, None, FakeSession(), batch_size=4)
+    stats = await engine.segment_users([f"user_{i}" for i in range(10)])
+
+    assert stats["segmented"] == 10
+    assert [len(batch) for batch in batches] == [4, 4, 2]
+
+
+@pytest.mark.asyncio
+async def test_classify_summaries_skips_llm_for_confident_users():
+    """Only ambiguous users reach the LLM and the bypass ratio is tracked"""
+    sent_to_llm = []
+
+    class FakeLLM:
+        async def segment_users_batch(self, summaries, batch_size=None, use_cache=True):
+            sent_to_llm.extend(summaries)
+            return {user_id: {"segment": "ML_ENGINEER"} for user_id in summaries}
+
+    engine = AnalysisEngine(None, FakeLLM(), FakeSession())
+    results = await engine._classify_summaries(
+        {
+            "casual": {
+                "total_events": 1,
+                "event_distribution": {"section_view": 1},
+            },
+            "ambiguous": {
+                "total_events": 4,
+                "event_distribution": {"project_click": 4},
+            },
+            "empty": {"total_events": 0, "event_distribution": {}},
+        }
+    )
+
+    assert sent_to_llm == ["ambiguous"]
+    assert results["casual"][0]["segment"] == "CASUAL"
+    assert results["empty"][0]["reasoning"] == "No events found"
+    assert engine.decisions == {"heuristic": 1, "llm": 1, "no_events": 1}
+    assert engine.llm_bypass_ratio() == 0.5
+
+
+class FakeWriter(list):
+    """Collects records instead of buffering them for a flush"""
+
+    def add(self, records):
+        self.extend(records)
+
+
+@pytest.mark.asyncio
+async def test_segment_batch_skips_users_without_material_change(monkeypatch):
+    """Only users whose bucketed behavior changed are re-classified"""
+    from datetime import datetime, timedelta
+    from app.models.records import SegmentRecord
+
+    stored = {"event_distribution": {"project_click": 2, "skill_hover": 1}}
+    summaries = {
+        "steady": {
+            "total_events": 4,
+            "event_distribution": {"project_click": 3, "skill_hover": 1},
+        },
+        "changed": {"total_events": 9, "event_distribution": {"contact_intent": 9}},
+    }
+    analyzed_at = datetime(2025, 1, 1)
+
+    async def fake_existing(self, user_ids):
+        return {
+            user_id: SegmentRecord(
+                user_id,
+                "ML_ENGINEER",
+                confidence=0.9,
+                event_summary=stored,
+                analyzed_at=analyzed_at,
+                expires_at=analyzed_at + timedelta(hours=24),
+            )
+            for user_id in user_ids
+        }
+
+    async def fake_summaries(self, user_ids):
+        return {user_id: summaries[user_id] for user_id in user_ids}
+
+    classified = []
+
+    async def fake_classify(self, to_classify):
+        classified.extend(to_classify)
+        return {}
+
+    monkeypatch.setattr(AnalysisEngine, "_load_existing_segments", fake_existing)
+    monkeypatch.setattr(AnalysisEngine, "_load_event_summaries", fake_summaries)
+    monkeypatch.setattr(AnalysisEngine, "_classify_summaries", fake_classify)
+
+    engine = AnalysisEngine(None, None, FakeSession())
+    engine.writer = FakeWriter()
+    records = await engine.segment_batch(["steady", "changed"])
+
+    assert classified == ["changed"]
+    assert [r.user_pseudo_id for r in records] == ["steady"]
+    assert engine.decisions["unchanged"] == 1
+    # The stable segment is kept and its lifetime doubled
+    assert engine.writer == records
+    assert records[0].expires_at - records[0].analyzed_at == timedelta(hours=48)
+
+
+@pytest.mark.asyncio
+async def test_fresh_engine_bypasses_llm_response_cache(session_factory):
+    """use_cache=False reaches every LLM call the engine makes"""
+    calls = []
+
+    class RecordingLLM:
+        async def segment_users_batch(self, summaries, batch_size=None, use_cache=True):
+            calls.append(("segment", use_cache))
+            return {user_id: {"segment": "ML_ENGINEER"} for user_id in summaries}
+
+        async def generate_rules(self, events, segment, use_cache=True):
+            calls.append(("rules", use_cache))
+            return {"priority_sections": ["projects"]}
+
+    async with session_factory() as db:
+        engine = AnalysisEngine(None, RecordingLLM(), db, use_cache=False)
+        await engine._classify_summaries(
+            {"u": {"total_events": 4, "event_distribution": {"project_click": 4}}}
+        )
+        await engine.generate_rules_for_segment("STUDENT", {"event_distribution": {}})
+
+    assert calls == [("segment", False), ("rules", False)]
+
+
+@pytest.mark.asyncio
+async def test_llm_error_fallbacks_are_not_saved():
+    """Users the LLM failed on get no result, so they stay due for a retry"""
+    from app.services.llm_service import _default_segment
+
+    class FailingLLM:
+        async def segment_users_batch(self, summaries, batch_size=None, use_cache=True):
+            return {user_id: _default_segment() for user_id in summaries}
+
+    engine = AnalysisEngine(None, FailingLLM(), FakeSession())
+    results = await engine._classify_summaries(
+        {"ambiguous": {"total_events": 4, "event_distribution": {"project_click": 4}}}
+    )
+
+    assert results == {}
+    assert engine.decisions["llm"] == 1
+
+
+@pytest.mark.asyncio
+async def test_segment_batch_reclassifies_stored_error_fallback(monkeypatch):
+    """A fallback saved by an older version is never kept as unchanged"""
+    from app.models.records import SegmentRecord
+    from app.services.llm_service import DEFAULT_SEGMENT_REASONING
+
+    summary = {"total_events": 4, "event_distribution": {"project_click": 4}}
+
+    async def fake_existing(self, user_ids):
+        return {
+            "u1": SegmentRecord(
+                "u1",
+                "CASUAL",
+                reasoning=DEFAULT_SEGMENT_REASONING,
+                event_summary=summary,
+            )
+        }
+
+    async def fake_summaries(self, user_ids):
+        return {"u1": summary}
+
+    classified = []
+
+    async def fake_classify(self, to_classify):
+        classified.extend(to_classify)
+        return {}
+
+    monkeypatch.setattr(AnalysisEngine, "_load_existing_segments", fake_existing)
+    monkeypatch.setattr(AnalysisEngine, "_load_event_summaries", fake_summaries)
+    monkeypatch.setattr(AnalysisEngine, "_classify_summaries", fake_classify)
+
+    engine = AnalysisEngine(None, None, FakeSession())
+    engine.writer = FakeWriter()
+    assert await engine.segment_batch(["u1"]) == []
+
+    assert classified == ["u1"]
+    assert engine.decisions["unchanged"] == 0
+
+
+@pytest.mark.asyncio
+async def test_segment_users_consumes_async_stream_incrementally(monkeypatch):
+    """Batches start before the user stream is exhausted"""
+    events = []
+
+    async def fake_segment_batch(self, user_ids):
+        events.append(("batch", list(user_ids)))
+        return user_ids
+
+    async def stream():
+        for i in range(6):
+            events.append(("yield", f"user_{i}"))
+            yield f"user_{i}"
+            await asyncio.sleep(0)
+
+    monkeypatch.setattr(AnalysisEngine, "segment_batch", fake_segment_batch)
+
+    engine = AnalysisEngine(
+        None,
+        None,
+        None,
+        session_factory=make_session_factory([]),
+        concurrency=1,
+        batch_size=2,
+    )
+    stats = await engine.segment_users(stream())
+
+    assert stats["segmented"] == 6
+    first_batch = events.index(("batch", ["user_0", "user_1"]))
+    assert first_batch < events.index(("yield", "user_5"))
+
+
+@pytest.mark.asyncio
+async def test_refresh_rules_skips_segments_without_drift(monkeypatch):
+    """Rules are regenerated only where the event mix moved past the threshold"""
+    from app.models.records import RulesRecord
+
+    stored = {"event_distribution": {"project_click": 10}}
+    aggregates = {
+        "ML_ENGINEER": {"event_distribution": {"project_click": 12}},
+        "RECRUITER": {"event_distribution": {"contact_intent": 5}},
+        "STUDENT": {"event_distribution": {"deep_read": 3}},
+    }
+
+    class FakeResultSession(FakeSession):
+        async def execute(self, stmt):
+            return [
+                RulesRecord("ML_ENGINEER", input_summary=stored),
+                RulesRecord("RECRUITER", input_summary=stored),
+            ]
+
+    async def fake_aggregates(self, segments):
+        return aggregates
+
+    regenerated = []
+
+    async def fake_generate(self, segment, event_context=None):
+        regenerated.append(segment)
+        assert event_context is aggregates[segment]
+
+    monkeypatch.setattr(AnalysisEngine, "_segment_aggregates", fake_aggregates)
+    monkeypatch.setattr(AnalysisEngine, "generate_rules_for_segment", fake_generate)
+
+    engine = AnalysisEngine(None, None, FakeResultSession())
+    outcomes = await engine.refresh_rules(list(aggregates))
+
+    assert regenerated == ["RECRUITER", "STUDENT"]
+    assert outcomes == {
+        "ML_ENGINEER": "skipped",
+        "RECRUITER": "regenerated",
+        "STUDENT": "regenerated",
+    }
+
+
+@pytest.mark.asyncio
+async def test_fallback_rules_are_not_saved(session_factory):
+    """Outage rules never replace stored rules or their drift baseline"""
+    from sqlalchemy import select
+    from app.database.models import PersonalizationRules
+
+    class DownLLM:
+        async def generate_rules(self, events, segment, use_cache=True):
+            return {"is_default": True, "priority_sections": ["projects"]}
+
+    async with session_factory() as db:
+        db.add(
+            PersonalizationRules(
+                segment="ML_ENGINEER",
+                priority_sections=["projects", "skills"],
+                reasoning="Good rules",
+                input_summary={"event_distribution": {"deep_read": 1}},
+            )
+        )
+        await db.commit()
+
+        outcomes = await AnalysisEngine(None, DownLLM(), db).refresh_rules(
+            ["ML_ENGINEER", "STUDENT"]
+        )
+
+    assert outcomes == {"ML_ENGINEER": "failed", "STUDENT": "failed"}
+    async with session_factory() as db:
+        rows = (await db.execute(select(PersonalizationRules))).scalars().all()
+    assert [(r.segment, r.reasoning) for r in rows] == [("ML_ENGINEER", "Good rules")]
+
+
+@pytest.mark.asyncio
+async def test_load_event_summaries_from_grouped_rows():
+    """One grouped query yields a summary per user, including users without events"""
+    from datetime import datetime
+    from types import SimpleNamespace
+
+    def row(user_id, event_name, count, duration=None, last_seen=None):
+        return SimpleNamespace(
+            user_pseudo_id=user_id,
+            event_name=event_name,
+            count=count,
+            duration=duration,
+            last_seen=last_seen,
+        )
+
+    class GroupedSession(FakeSession):
+        executed = 0
+
+        async def execute(self, stmt):
+            self.executed += 1
+            return [
+                row("a", "deep_read", 3, 42.5, datetime(2025, 1, 2, 10)),
+                row("a", "project_click", 2, None, datetime(2025, 1, 2, 12)),
+                row("b", "section_view", 1),
+            ]
+
+    session = GroupedSession()
+    engine = AnalysisEngine(None, None, session)
+    summaries = await engine._load_event_summaries(["a", "b", "c"])
+
+    assert session.executed == 1
+    assert summaries["a"] == {
+        "total_events": 5,
+        "unique_event_types": ["deep_read", "project_click"],
+        "event_distribution": {"deep_read": 3, "project_click": 2},
+        "event_durations": {"deep_read": 42.5},
+        "last_seen_at": "2025-01-02T12:00:00",
+    }
+    assert "event_durations" not in summaries["b"]
+    assert summaries["c"]["total_events"] == 0
+
+
+@pytest.mark.asyncio
+async def test_admin_rules_survive_hourly_analysis(monkeypatch, session_factory):
+    """Rules saved through POST /rules are not regenerated by later runs"""
+    from sqlalchemy import select
+    from app.api import admin
+    from app.database import db as database
+    from app.database.models import AnalyticsRaw, PersonalizationRules, UserSegment
+    from app.services import analysis_engine
+
+    monkeypatch.setattr(database, "get_async_session", session_factory)
+    monkeypatch.setattr(analysis_engine.settings, "EVENT_WATERMARK_LAG", 0)
+    await admin.create_or_update_rule(
+        admin.RuleOverrideRequest(
+            segment="ML_ENGINEER",
+            priority_sections=["contact"],
+            featured_projects=["pinned"],
+            reasoning="Hand-picked",
+        )
+    )
+
+    class RulesLLM:
+        segments = []
+
+        async def generate_rules(self, events, segment, use_cache=True):
+            self.segments.append(segment)
+            return {"priority_sections": ["projects"], "reasoning": "Generated"}
+
+    async with session_factory() as db:
+        db.add(UserSegment(user_pseudo_id="u1", segment="ML_ENGINEER"))
+        db.add(
+            AnalyticsRaw(
+                ga4_event_id="e1", event_name="project_click", user_pseudo_id="u1"
+            )
+        )
+        await db.commit()
+
+        llm = RulesLLM()
+        await AnalysisEngine(None, llm, db).run_hourly_analysis()
+
+    async with session_factory() as db:
+        rule = (
+            await db.execute(
+                select(PersonalizationRules).where(
+                    PersonalizationRules.segment == "ML_ENGINEER"
+                )
+            )
+        ).scalar_one()
+    assert "ML_ENGINEER" not in llm.segments
+    assert "STUDENT" in llm.segments
+    assert rule.manual
+    assert (rule.priority_sections, rule.featured_projects, rule.reasoning) == (
+        ["contact"],
+        ["pinned"],
+        "Hand-picked",
+    )
+
+
+@pytest.mark.asyncio
+async def test_non_numeric_durations_are_ignored(session_factory):
+    """A string duration is skipped instead of failing the grouped query"""
+    from app.database.models import AnalyticsRaw
+
+    async with session_factory() as db:
+        db.add_all(
+            AnalyticsRaw(
+                ga4_event_id=f"e{i}",
+                event_name=name,
+                user_pseudo_id="a",
+                event_params=params,
+            )
+            for i, (name, params) in enumerate(
+                [
+                    ("deep_read", {"duration": 1500}),
+                    ("deep_read", {"duration": "abc"}),
+                    ("section_view", {"time_spent": {"ms": 5}}),
+                    ("skill_hover", {"duration": None, "time_spent": 2.5}),
+                ]
+            )
+        )
+        await db.commit()
+
+        summaries = await AnalysisEngine(None, None, db)._load_event_summaries(["a"])
+
+    assert summaries["a"]["event_distribution"] == {
+        "deep_read": 2,
+        "section_view": 1,
+        "skill_hover": 1,
+    }
+    assert summaries["a"]["event_durations"] == {
+        "deep_read": 1500.0,
+        "skill_hover": 2.5,
+    }
+
+
+def test_duration_cast_is_guarded_on_postgres():
+    """Postgres only casts params whose JSON type is number"""
+    from sqlalchemy import select
+    from sqlalchemy.dialects import postgresql
+    from app.services.analysis_engine import numeric_param
+
+    sql = str(
+        select(numeric_param("duration", "postgresql")).compile(
+            dialect=postgresql.dialect()
+        )
+    )
+
+    assert sql.startswith("SELECT CASE WHEN (jsonb_typeof((analytics_raw.event_params")
+    assert ") THEN CAST(analytics_raw.event_params ->> " in sql
+
+
+def patch_run(monkeypatch, **values):
+    """Make the engine start (or resume) the given analysis run"""
+    from app.database.models import AnalysisRun
+    from app.services import analysis_engine
+
+    defaults = dict(
+        id=7,
+        state="running",
+        phase="started",
+        users_done=0,
+        users_failed=0,
+        llm_classified=0,
+    )
+    run = AnalysisRun(**{**defaults, **values})
+    resumed = bool(values)
+
+    async def fake_start(session, job_name):
+        run.job_name = job_name
+        return run, resumed
+
+    monkeypatch.setattr(analysis_engine, "start_or_resume_run", fake_start)
+    return run
+
+
+@pytest.mark.asyncio
+async def test_drain_resegment_queue_stops_at_llm_budget(monkeypatch):
+    """Claims shrink to the remaining budget and stop once it is spent"""
+    from app.services import analysis_engine
+
+    queue = [f"user_{i}" for i in range(20)]
+    claims = []
+
+    async def fake_claim(session, limit, run_id=None):
+        claims.append(limit)
+        claimed = queue[:limit]
+        del queue[:limit]
+        return claimed
+
+    async def fake_segment_users(self, user_ids):
+        self.decisions["llm"] += len(user_ids)
+        return {"segmented": len(user_ids), "failed": 0}
+
+    monkeypatch.setattr(analysis_engine, "claim_due_users", fake_claim)
+    monkeypatch.setattr(AnalysisEngine, "segment_users", fake_segment_users)
+    run = patch_run(monkeypatch)
+
+    engine = AnalysisEngine(None, None, FakeSession(), concurrency=2, batch_size=3)
+    stats = await engine.drain_resegment_queue(llm_budget=8)
+
+    assert claims == [6, 2]
+    assert stats == {"segmented": 8, "failed": 0}
+    assert len(queue) == 12
+    assert (run.state, run.users_done, run.llm_classified) == ("completed", 8, 8)
+
+
+@pytest.mark.asyncio
+async def test_drain_resumes_interrupted_run_from_checkpoint(monkeypatch):
+    """A resumed drain releases its stale claims and keeps its spent budget"""
+    from app.services import analysis_engine
+
+    run = patch_run(monkeypatch, users_done=5, users_failed=1, llm_classified=5)
+    released = []
+    claims = []
+
+    async def fake_release(session, run_id):
+        released.append(run_id)
+        return 3
+
+    async def fake_claim(session, limit, run_id=None):
+        claims.append((limit, run_id))
+        return [f"user_{i}" for i in range(limit)]
+
+    async def fake_segment_users(self, user_ids):
+        self.decisions["llm"] += len(user_ids)
+        return {"segmented": len(user_ids), "failed": 0}
+
+    monkeypatch.setattr(analysis_engine, "release_claims", fake_release)
+    monkeypatch.setattr(analysis_engine, "claim_due_users", fake_claim)
+    monkeypatch.setattr(AnalysisEngine, "segment_users", fake_segment_users)
+
+    engine = AnalysisEngine(None, None, FakeSession(), concurrency=2, batch_size=3)
+    stats = await engine.drain_resegment_queue(llm_budget=8)
+
+    assert released == [7]
+    assert claims == [(3, 7)]
+    assert stats == {"segmented": 8, "failed": 1}
+    assert (run.users_done, run.llm_classified) == (8, 8)
+
+
+@pytest.mark.asyncio
+async def test_hourly_analysis_resumes_after_queued_users(monkeypatch):
+    """A run interrupted after queueing users only refreshes the rules"""
+    run = patch_run(monkeypatch, phase="users_queued", event_low=10, event_high=20)
+    refreshed = []
+
+    async def fail(self, job_name):
+        raise AssertionError("the event window was already processed")
+
+    async def fake_refresh(self):
+        refreshed.append(True)
+
+    monkeypatch.setattr(AnalysisEngine, "_event_window", fail)
+    monkeypatch.setattr(AnalysisEngine, "refresh_rules", fake_refresh)
+
+    engine = AnalysisEngine(None, None, FakeSession())
+    await engine.run_hourly_analysis()
+
+    assert refreshed == [True]
+    assert (run.phase, run.state) == ("rules_refreshed", "completed")
+    assert run.finished_at is not None
+
+
+@pytest.mark.asyncio
+async def test_failed_hourly_run_is_marked_failed_after_rollback(
+    monkeypatch, session_factory
+):
+    """The original error surfaces and the run row leaves 'running'"""
+    from sqlalchemy import select
+    from app.database.models import AnalysisRun, AnalyticsRaw
+    from app.services import analysis_engine
+
+    async def broken_enqueue(session, low, high):
+        raise RuntimeError("queue down")
+
+    monkeypatch.setattr(analysis_engine, "enqueue_active_users", broken_enqueue)
+    monkeypatch.setattr(analysis_engine.settings, "EVENT_WATERMARK_LAG", 0)
+    async with session_factory() as db:
+        db.add(
+            AnalyticsRaw(
+                ga4_event_id="e1", event_name="project_click", user_pseudo_id="u1"
+            )
+        )
+        await db.commit()
+
+        with pytest.raises(RuntimeError, match="queue down"):
+            await AnalysisEngine(None, None, db).run_hourly_analysis()
+
+    async with session_factory() as db:
+        run = (await db.execute(select(AnalysisRun))).scalar_one()
+    assert run.state == "failed"
+    assert run.finished_at is not None
+    assert run.telemetry["users_done"] == 0
+
+
+@pytest.mark.asyncio
+async def test_failed_drain_is_marked_failed_after_rollback(
+    monkeypatch, session_factory
+):
+    """A drain error after rollback still finishes the run as failed"""
+    from sqlalchemy import select
+    from app.database.models import AnalysisRun
+    from app.services import analysis_engine
+
+    async def broken_claim(session, limit, run_id=None):
+        raise RuntimeError("claim failed")
+
+    monkeypatch.setattr(analysis_engine, "claim_due_users", broken_claim)
+    async with session_factory() as db:
+        with pytest.raises(RuntimeError, match="claim failed"):
+            await AnalysisEngine(None, None, db).drain_resegment_queue(llm_budget=5)
+
+    async with session_factory() as db:
+        run = (await db.execute(select(AnalysisRun))).scalar_one()
+    assert (run.job_name, run.state) == (analysis_engine.DRAIN_JOB_NAME, "failed")
+
+
+@pytest.mark.asyncio
+async def test_event_window_stops_before_unsettled_events(session_factory):
+    """Events younger than the lag stay above the watermark for the next run"""
+    from datetime import datetime, timedelta
+    from app.config import settings
+    from app.database.models import AnalysisWatermark, AnalyticsRaw
+
+    now = datetime.utcnow()
+    lag = timedelta(seconds=settings.EVENT_WATERMARK_LAG)
+    async with session_factory() as db:
+        db.add(AnalysisWatermark(job_name="hourly_analysis", last_event_id=1))
+        for i, created_at in enumerate(
+            [now - 2 * lag, now - 2 * lag, now - lag / 2], start=1
+        ):
+            db.add(
+                AnalyticsRaw(
+                    id=i,
+                    ga4_event_id=f"e{i}",
+                    event_name="project_click",
+                    user_pseudo_id="u1",
+                    created_at=created_at,
+                )
+            )
+        await db.commit()
+
+        window = await AnalysisEngine(None, None, db)._event_window("hourly_analysis")
+
+    assert window == (1, 2)
@@ -0,0 +1,153 @@
+"""Tests for admin-triggered analysis jobs (no database required)"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.database.models import AnalysisJob
+from app.services import analysis_jobs
+from app.services.analysis_jobs import (
+    job_status,
+    request_cancel,
+    run_analysis_job,
+)
+from tests.conftest import FakeSession
+
+
+def make_job(**values):
+    defaults = dict(
+        id=1,
+        kind="analysis",
+        state="queued",
+        users_total=None,
+        users_done=0,
+        users_failed=0,
+        cancel_requested=False,
+    )
+    return AnalysisJob(**{**defaults, **values})
+
+
+def test_job_status_reports_progress_and_throughput():
+    """Throughput is users done per second of run time"""
+    started = datetime(2025, 1, 1, 12)
+    job = make_job(
+        state="succeeded",
+        users_total=100,
+        users_done=90,
+        users_failed=10,
+        started_at=started,
+        finished_at=started + timedelta(seconds=30),
+    )
+
+    status = job_status(job)
+
+    assert status["progress"] == {
+        "users_done": 90,
+        "users_failed": 10,
+        "users_total": 100,
+    }
+    assert status["throughput_users_per_sec"] == 3.0
+    assert status["started_at"] == "2025-01-01T12:00:00"
+
+
+@pytest.mark.asyncio
+async def test_cancel_stops_queued_jobs_and_flags_running_ones():
+    """Queued jobs are cancelled at once; running jobs finish their batch first"""
+    queued = await request_cancel(FakeSession(), make_job(state="queued"))
+    running = await request_cancel(FakeSession(), make_job(state="running"))
+
+    assert queued.state == "cancelled" and queued.finished_at
+    assert running.state == "running" and running.cancel_requested
+
+
+@pytest.mark.asyncio
+async def test_run_job_records_progress_and_honours_cancellation(monkeypatch):
+    """The drain reports progress and stops once cancellation is requested"""
+    job = make_job(state="running", started_at=datetime.utcnow())
+    session = FakeSession(job)
+
+    async def fake_count_due(db):
+        return 10
+
+    monkeypatch.setattr(analysis_jobs, "count_due_users", fake_count_due)
+
+    class FakeEngine:
+        db = session
+
+        async def run_hourly_analysis(self):
+            pass
+
+        async def drain_resegment_queue(
+            self, llm_budget=None, on_progress=None, run_name=None
+        ):
+            assert llm_budget == 10
+            assert run_name == "analysis_job:1"
+            assert await on_progress({"segmented": 4, "failed": 0})
+            job.cancel_requested = True
+            assert not await on_progress({"segmented": 8, "failed": 1})
+            return {"segmented": 8, "failed": 1}
+
+    await run_analysis_job(FakeEngine(), job.id)
+
+    assert job.state == "cancelled"
+    assert (job.users_total, job.users_done, job.users_failed) == (10, 8, 1)
+    assert job.finished_at is not None
+
+
+@pytest.mark.asyncio
+async def test_run_job_resumes_interrupted_drain_without_requeue(monkeypatch):
+    """A job counted before a restart keeps its total and resumes its drain run"""
+    job = make_job(state="running", users_total=10, users_done=6)
+    session = FakeSession(job)
+
+    async def fail(db):
+        raise AssertionError("resumed jobs must not requeue or recount")
+
+    monkeypatch.setattr(analysis_jobs, "count_due_users", fail)
+    monkeypatch.setattr(analysis_jobs, "requeue_all_users", fail)
+
+    class FakeEngine:
+        db = session
+
+        async def run_hourly_analysis(self):
+            pass
+
+        async def drain_resegment_queue(
+            self, llm_budget=None, on_progress=None, run_name=None
+        ):
+            assert (llm_budget, run_name) == (10, "analysis_job:1")
+            await on_progress({"segmented": 10, "failed": 0})
+
+    await run_analysis_job(FakeEngine(), job.id)
+
+    assert job.state == "succeeded"
+    assert job.users_done == 10
+
+
+@pytest.mark.asyncio
+async def test_fresh_job_runs_engine_without_llm_cache(session_factory):
+    """An admin "fresh" trigger runs the engine with the LLM cache off"""
+    from app.api import admin
+
+    async with session_factory() as db:
+        queued = await admin.trigger_analysis(
+            admin.TriggerAnalysisRequest(full=True, fresh=True), db
+        )
+        job = await db.get(AnalysisJob, queued["job_id"])
+        assert (job.kind, job_status(job)["use_cache"]) == ("full_analysis", False)
+
+        class FakeEngine:
+            use_cache = True
+
+            async def run_hourly_analysis(self):
+                assert self.use_cache is False
+
+            async def drain_resegment_queue(self, **kwargs):
+                assert self.use_cache is False
+
+        engine = FakeEngine()
+        engine.db = db
+        await run_analysis_job(engine, job.id)
+
+    assert job.state == "succeeded"
+    assert engine.use_cache is False
@@ -30,3 +30,69 @@ def test_event_tracking_endpoint():
         },
     )
     # Will fail without DB setup, but structure is correct
+
+
+@pytest.mark.asyncio
+async def test_personalization_rules_are_cached_until_rewritten(
+    monkeypatch, session_factory
+):
+    """Rule reads come from the cache; generated and admin rules replace it"""
+    from sqlalchemy import update
+    from app.api import admin, public
+    from app.cache import cache
+    from app.database import db as database
+    from app.database.models import PersonalizationRules, UserSegment
+    from app.services.analysis_engine import AnalysisEngine
+
+    store = {}
+
+    async def fake_get(key):
+        return store.get(key)
+
+    async def fake_set(key, value, ttl=None):
+        store[key] = value
+        return True
+
+    async def fake_delete(key):
+        return store.pop(key, None) is not None
+
+    monkeypatch.setattr(cache, "get", fake_get)
+    monkeypatch.setattr(cache, "set", fake_set)
+    monkeypatch.setattr(cache, "delete", fake_delete)
+    monkeypatch.setattr(database, "get_async_session", session_factory)
+
+    class RulesLLM:
+        async def generate_rules(self, events, segment, use_cache=True):
+            return {"priority_sections": ["skills"], "reasoning": "generated"}
+
+    async def sections():
+        async with session_factory() as db:
+            response = await public.get_personalization(user_id="user_1", db=db)
+        return response.priority_sections
+
+    async with session_factory() as db:
+        db.add(UserSegment(user_pseudo_id="user_1", segment="ML_ENGINEER"))
+        await db.commit()
+        await AnalysisEngine(None, RulesLLM(), db).generate_rules_for_segment(
+            "ML_ENGINEER", event_context={}
+        )
+        assert store["personalization_rules:ML_ENGINEER"]["priority_sections"] == [
+            "skills"
+        ]
+
+        # A change that bypasses the writers is not seen: reads hit the cache
+        await db.execute(
+            update(PersonalizationRules).values(priority_sections=["blog"])
+        )
+        await db.commit()
+    assert await sections() == ["skills"]
+
+    await admin.create_or_update_rule(
+        admin.RuleOverrideRequest(segment="ML_ENGINEER", priority_sections=["contact"])
+    )
+    assert await sections() == ["contact"]
+    assert await sections() == ["contact"]  # cached again after the miss
+
+    await admin.delete_rule("ML_ENGINEER")
+    assert "personalization_rules:ML_ENGINEER" not in store
+    assert await sections() == ["projects", "skills", "experience"]
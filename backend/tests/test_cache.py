@@ -229,6 +229,24 @@ async def test_cache_handles_complex_objects(cache):
     assert retrieved["metrics"]["engagement"] == 0.87
 
 
+@pytest.mark.asyncio
+async def test_cache_set_many_get_many(cache):
+    """Test pipelined multi-key set and single round-trip multi-key get"""
+    items = {
+        "segment_memo:aaa": {"segment": "STUDENT"},
+        "segment_memo:bbb": {"segment": "RECRUITER"},
+    }
+
+    result = await cache.set_many(items, ttl=60)
+    assert result is True
+
+    retrieved = await cache.get_many(list(items) + ["segment_memo:missing"])
+    assert retrieved == items
+
+    ttl = await cache.client.ttl("segment_memo:aaa")
+    assert 0 < ttl <= 60
+
+
 @pytest.mark.asyncio
 async def test_cache_graceful_fallback_on_disconnect(cache):
     """Test cache gracefully handles operations when disconnected"""
@@ -248,3 +266,6 @@ async def test_cache_graceful_fallback_on_disconnect(cache):
 
     count = await cache.clear_pattern("*")
     assert count == 0
+
+    assert await cache.get_many(["test_key"]) == {}
+    assert await cache.set_many({"test_key": "value"}) is False
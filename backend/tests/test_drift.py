@@ -0,0 +1,31 @@
+"""Tests for event distribution drift"""
+
+import pytest
+
+from app.services.drift import distribution_drift
+
+
+def summary(**counts):
+    return {"event_distribution": counts}
+
+
+def test_identical_mix_has_no_drift():
+    """Scaling all counts up leaves the event mix unchanged"""
+    assert distribution_drift(
+        summary(project_click=2, skill_hover=1),
+        summary(project_click=20, skill_hover=10),
+    ) == pytest.approx(0.0)
+
+
+def test_drift_is_total_variation_distance():
+    """Half the mass moving to a new event type is a drift of 0.5"""
+    assert distribution_drift(
+        summary(project_click=4),
+        summary(project_click=2, contact_intent=2),
+    ) == pytest.approx(0.5)
+
+
+def test_empty_side_counts_as_full_drift():
+    """Events appearing for a segment that had none is a full change"""
+    assert distribution_drift(summary(), summary(section_view=3)) == 1.0
+    assert distribution_drift(summary(), summary()) == 0.0
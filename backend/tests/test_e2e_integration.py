@@ -192,7 +192,7 @@ async def test_api_personalization_endpoint(async_client, async_session):
 @pytest.mark.asyncio
 async def test_hourly_analysis_job(async_session, mock_llm_service):
     """
-    Test: Full hourly job → Segments users → Generates rules
+    Test: Full hourly job → Queues users → Drain segments them
     Simulates the scheduled analysis job
     """
     # Create events for multiple users
@@ -217,6 +217,8 @@ async def test_hourly_analysis_job(async_session, mock_llm_service):
 
     engine = AnalysisEngine(ga4_svc, mock_llm_service, async_session)
     await engine.run_hourly_analysis()
+    # Active users are queued by the hourly job and segmented by the drain
+    await engine.drain_resegment_queue()
 
     # Verify segments created
     stmt = select(UserSegment).where(UserSegment.user_pseudo_id.in_(users))
@@ -339,6 +341,12 @@ def mock_llm_service():
                 },
             }
 
+        async def segment_users_batch(self, summaries, batch_size=None):
+            return {
+                user_id: await self.segment_user(summary)
+                for user_id, summary in summaries.items()
+            }
+
         async def generate_rules(self, events, segment):
             return {
                 "priority_sections": ["projects", "skills"],
@@ -0,0 +1,66 @@
+"""Tests for the user x event-type feature matrix"""
+
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from app.services.features import EVENT_TYPES, FeatureMatrix
+
+NOW = datetime(2025, 1, 2, 12)
+
+
+def column(name):
+    return EVENT_TYPES.index(name)
+
+
+def test_from_rows_accumulates_counts_and_durations():
+    """Grouped rows land in the right cells and repeated cells add up"""
+    last_seen = datetime(2025, 1, 2, 10).timestamp()
+    rows = [
+        ("a", "deep_read", 2, 30.0, last_seen),
+        ("a", "deep_read", 1, None, None),
+        ("b", "contact_intent", 4, None, None),
+    ]
+    features = FeatureMatrix.from_rows(rows, user_ids=["a", "b", "c"], now=NOW)
+
+    assert features.counts.shape == (3, len(EVENT_TYPES))
+    assert features.counts[0, column("deep_read")] == 3
+    assert features.durations[0, column("deep_read")] == 30.0
+    assert features.counts[1, column("contact_intent")] == 4
+    assert not features.counts[2].any()
+    assert features.recency_hours[0] == pytest.approx(2.0)
+    assert np.isnan(features.recency_hours[1])
+
+
+def test_unknown_events_only_count_towards_totals():
+    """Events outside the columns still dilute the known event shares"""
+    features = FeatureMatrix.from_summaries(
+        {"a": {"event_distribution": {"section_view": 1, "page_view": 3}}}
+    )
+
+    assert features.total_events.tolist() == [4]
+    assert features.shares()[0, column("section_view")] == 0.25
+
+
+def test_shares_of_users_without_events_are_zero():
+    """Normalizing an empty row does not divide by zero"""
+    features = FeatureMatrix.from_summaries({"a": {}, "b": {}})
+
+    assert features.shares().shape == (2, len(EVENT_TYPES))
+    assert not features.shares().any()
+
+
+def test_from_summaries_reads_last_seen():
+    """Recency comes from the summary's last_seen_at"""
+    features = FeatureMatrix.from_summaries(
+        {
+            "a": {
+                "event_distribution": {"deep_read": 1},
+                "last_seen_at": "2025-01-02T06:00:00",
+            }
+        },
+        now=NOW,
+    )
+
+    assert features.recency_hours[0] == pytest.approx(6.0)
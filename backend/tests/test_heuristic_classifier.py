@@ -0,0 +1,113 @@
+"""Tests for the local heuristic pre-classifier"""
+
+from datetime import datetime, timedelta
+
+from app.services.heuristic_classifier import STALE_AFTER_HOURS, HeuristicClassifier
+
+NOW = datetime(2025, 1, 2, 12)
+
+
+def summary(**counts):
+    return {
+        "total_events": sum(counts.values()),
+        "unique_event_types": list(counts),
+        "event_distribution": counts,
+    }
+
+
+def test_single_section_view_is_casual():
+    """A one-event visit is confidently CASUAL"""
+    result = HeuristicClassifier().classify(summary(section_view=1))
+
+    assert result["segment"] == "CASUAL"
+    assert result["confidence"] >= 0.75
+
+
+def test_contact_and_resume_is_recruiter():
+    """Contact intent plus a resume download is confidently RECRUITER"""
+    result = HeuristicClassifier().classify(
+        summary(contact_intent=1, download_resume=1)
+    )
+
+    assert result["segment"] == "RECRUITER"
+    assert set(result["xai_explanation"]) == {
+        "what",
+        "why",
+        "so_what",
+        "recommendation",
+    }
+
+
+def test_long_reads_tip_the_balance_to_student():
+    """Time spent on deep reads makes an otherwise mixed visit STUDENT"""
+    events = summary(deep_read=3, scroll_depth=1)
+    classifier = HeuristicClassifier()
+
+    assert classifier.classify(events) is None
+    events["event_durations"] = {"deep_read": 240000.0, "scroll_depth": 2000.0}
+    result = classifier.classify(events)
+
+    assert result["segment"] == "STUDENT"
+    assert result["confidence"] >= 0.75
+
+
+def test_stale_activity_lowers_confidence():
+    """A borderline profile last seen weeks ago is escalated to the LLM"""
+    events = summary(contact_intent=1, download_resume=1)
+    classifier = HeuristicClassifier()
+
+    events["last_seen_at"] = (NOW - timedelta(hours=1)).isoformat()
+    fresh = classifier.classify(events, now=NOW)
+    events["last_seen_at"] = (NOW - timedelta(hours=STALE_AFTER_HOURS + 1)).isoformat()
+
+    assert fresh["segment"] == "RECRUITER"
+    assert classifier.classify(events, now=NOW) is None
+
+
+def test_developer_segments_are_told_apart():
+    """Skill inspection reads as ML_ENGINEER, demo/repo links as FULLSTACK_DEV"""
+    classifier = HeuristicClassifier()
+
+    ml = classifier.classify(summary(skill_hover=6, deep_read=3, project_click=1))
+    fullstack = classifier.classify(summary(external_link_click=4, project_click=3))
+
+    assert ml["segment"] == "ML_ENGINEER"
+    assert fullstack["segment"] == "FULLSTACK_DEV"
+    assert min(ml["confidence"], fullstack["confidence"]) >= 0.75
+
+
+def test_ambiguous_project_clicks_escalate():
+    """ML vs fullstack cannot be told apart from counts alone"""
+    assert HeuristicClassifier().classify(summary(project_click=5)) is None
+
+
+def test_threshold_controls_escalation():
+    """A threshold above 1 sends everything to the LLM"""
+    classifier = HeuristicClassifier(threshold=1.01)
+
+    assert classifier.classify(summary(section_view=1)) is None
+
+
+def test_empty_summary_is_not_classified():
+    """No events means no heuristic decision"""
+    assert HeuristicClassifier().classify(summary()) is None
+
+
+def test_classify_many_matches_single_classification():
+    """Batch scoring gives the same answer as classifying users one by one"""
+    classifier = HeuristicClassifier()
+    summaries = {
+        "casual": summary(section_view=1),
+        "recruiter": summary(contact_intent=1, download_resume=1),
+        "ambiguous": summary(project_click=5),
+        "empty": summary(),
+    }
+
+    results = classifier.classify_many(summaries)
+
+    assert results == {
+        user_id: classifier.classify(user_summary)
+        for user_id, user_summary in summaries.items()
+    }
+    assert results["recruiter"]["segment"] == "RECRUITER"
+    assert results["ambiguous"] is None
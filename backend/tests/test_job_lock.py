@@ -0,0 +1,113 @@
+"""Tests for scheduled job gating"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.job_lock import (
+    ensure_locks_held,
+    job_lock,
+    lock_key,
+    single_instance,
+)
+from app.utils.exceptions import JobLockLostError
+
+
+class FakeAdvisoryEngine:
+    """Engine stub whose connections share one advisory lock table"""
+
+    dialect = SimpleNamespace(name="postgresql")
+
+    def __init__(self):
+        self.held = set()
+        self.isolation_levels = []
+
+    @asynccontextmanager
+    async def connect(self):
+        held = self.held
+        isolation_levels = self.isolation_levels
+
+        class Conn:
+            async def execution_options(self, isolation_level=None):
+                isolation_levels.append(isolation_level)
+                return self
+
+            async def execute(self, stmt, params=None):
+                if "pg_locks" in str(stmt):
+                    key = (params["classid"] << 32) | params["objid"]
+                    taken = any(k & 0xFFFFFFFFFFFFFFFF == key for k in held)
+                    return SimpleNamespace(scalar=lambda: taken)
+                (key,) = stmt.compile().params.values()
+                if "pg_try_advisory_lock" in str(stmt):
+                    taken = key not in held
+                    held.add(key)
+                else:
+                    taken = key in held
+                    held.discard(key)
+                return SimpleNamespace(scalar=lambda: taken)
+
+        yield Conn()
+
+
+def test_lock_key_is_stable_signed_bigint():
+    """Keys fit Postgres bigint and differ per job"""
+    key = lock_key("hourly_analysis")
+
+    assert key == lock_key("hourly_analysis")
+    assert key != lock_key("resegment_drain")
+    assert -(2**63) <= key < 2**63
+
+
+@pytest.mark.asyncio
+async def test_advisory_lock_is_exclusive_and_released():
+    """A second holder is refused until the first releases the lock"""
+    engine = FakeAdvisoryEngine()
+
+    async with job_lock("job", engine) as first:
+        async with job_lock("job", engine) as second:
+            assert first and not second
+    async with job_lock("job", engine) as third:
+        assert third
+    assert engine.held == set()
+    # No transaction is left open on the lock connection
+    assert set(engine.isolation_levels) == {"AUTOCOMMIT"}
+
+
+@pytest.mark.asyncio
+async def test_lost_lock_is_detected_before_checkpoints():
+    """Once the lock is gone, ensure_locks_held stops the run"""
+    engine = FakeAdvisoryEngine()
+
+    await ensure_locks_held()  # No lock taken: nothing to check
+    async with job_lock("outer", engine), job_lock("inner", engine) as acquired:
+        assert acquired
+        await ensure_locks_held()
+
+        # e.g. the server terminated the lock connection
+        engine.held.discard(lock_key("outer"))
+        with pytest.raises(JobLockLostError, match="outer"):
+            await ensure_locks_held()
+    await ensure_locks_held()
+
+
+@pytest.mark.asyncio
+async def test_single_instance_skips_overlapping_runs():
+    """A run that starts while another is in progress is skipped"""
+    runs = []
+    release = asyncio.Event()
+
+    @single_instance("test_overlap")
+    async def job():
+        runs.append("start")
+        await release.wait()
+        return "done"
+
+    first = asyncio.create_task(job())
+    await asyncio.sleep(0)
+    assert await job() is None
+
+    release.set()
+    assert await first == "done"
+    assert runs == ["start"]
@@ -1,5 +1,7 @@
 import pytest
+import json
 from app.services.llm_service import LLMService
+from app.utils.exceptions import LLMError
 
 
 @pytest.mark.asyncio
@@ -24,3 +26,365 @@ async def test_llm_service_segment_user_fallback():
 
     # Note: Will actually fail with mock keys, but structure is correct
     # In real testing, use proper mock/patch
+
+
+@pytest.mark.asyncio
+async def test_segment_users_batch_packs_users_into_one_prompt():
+    """A well-formed JSON array classifies the whole batch in one call"""
+    service = LLMService("mock_gemini_key", "mock_deepseek_key")
+    calls = []
+
+    async def fake_generate(prompt, context, use_cache=True):
+        calls.append(context)
+        return json.dumps(
+            [
+                {"id": visitor["id"], "segment": "RECRUITER", "confidence": 0.9}
+                for visitor in context["visitors"]
+            ]
+        )
+
+    service.generate_with_fallback = fake_generate
+    summaries = {f"user_{i}": {"total_events": i} for i in range(5)}
+
+    results = await service.segment_users_batch(summaries, batch_size=5)
+
+    assert len(calls) == 1
+    assert set(results) == set(summaries)
+    assert all(r["segment"] == "RECRUITER" for r in results.values())
+    # Pseudo ids never reach the prompt, only short stable ids
+    assert [v["id"] for v in calls[0]["visitors"]] == ["u0", "u1", "u2", "u3", "u4"]
+
+
+@pytest.mark.asyncio
+async def test_segment_users_batch_splits_on_malformed_response():
+    """A malformed array falls back to smaller batches"""
+    service = LLMService("mock_gemini_key", "mock_deepseek_key")
+    batch_sizes = []
+
+    async def fake_generate(prompt, context, use_cache=True):
+        visitors = context.get("visitors")
+        if visitors is None:
+            return json.dumps({"segment": "STUDENT", "confidence": 0.6})
+        batch_sizes.append(len(visitors))
+        if len(visitors) > 2:
+            return "not json at all"
+        return json.dumps([{"id": v["id"], "segment": "STUDENT"} for v in visitors])
+
+    service.generate_with_fallback = fake_generate
+    summaries = {f"user_{i}": {"total_events": 1} for i in range(4)}
+
+    results = await service.segment_users_batch(summaries, batch_size=4)
+
+    assert batch_sizes == [4, 2, 2]
+    assert set(results) == set(summaries)
+
+
+@pytest.mark.asyncio
+async def test_segment_users_batch_defaults_when_providers_fail():
+    """Provider failure yields defaults without retrying smaller batches"""
+    service = LLMService("mock_gemini_key", "mock_deepseek_key")
+    calls = []
+
+    async def failing_generate(prompt, context, use_cache=True):
+        calls.append(context)
+        raise LLMError("All LLM providers failed")
+
+    service.generate_with_fallback = failing_generate
+    summaries = {"user_a": {}, "user_b": {}}
+
+    results = await service.segment_users_batch(summaries, batch_size=2)
+
+    assert len(calls) == 1
+    assert all(r["segment"] == "CASUAL" for r in results.values())
+
+
+@pytest.mark.asyncio
+async def test_deepseek_reuses_pooled_client(monkeypatch):
+    """Calls share one keep-alive client instead of opening one per request"""
+    import httpx
+    from app.services import llm_service
+    from app.services.llm_service import DeepSeekProvider
+    from app.utils.http_client import SharedHTTPClient
+
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(
+            200,
+            json={
+                "choices": [{"message": {"content": '{"segment": "STUDENT"}'}}],
+                "usage": {"prompt_tokens": 12, "completion_tokens": 4},
+            },
+        )
+
+    shared = SharedHTTPClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(llm_service, "http_client", shared)
+    provider = DeepSeekProvider("key")
+
+    await provider.generate("prompt", {"a": 1})
+    client = shared.client
+    await provider.generate("prompt", {"a": 2})
+
+    assert len(requests) == 2
+    assert shared.client is client
+    assert client.timeout.connect == llm_service.settings.LLM_CONNECT_TIMEOUT
+    assert client.timeout.read == llm_service.settings.LLM_READ_TIMEOUT
+
+    await shared.close()
+    assert client.is_closed
+
+
+@pytest.mark.asyncio
+async def test_gemini_call_does_not_block_event_loop():
+    """Other tasks keep running while a slow completion is in flight"""
+    import asyncio
+    import time
+    from types import SimpleNamespace
+    from app.services.llm_service import GeminiProvider
+
+    class SlowModel:
+        def generate_content(self, prompt):
+            time.sleep(0.3)  # What the blocking SDK call would do
+            raise AssertionError("the synchronous SDK call must not be used")
+
+        async def generate_content_async(self, prompt):
+            await asyncio.sleep(0.3)
+            return SimpleNamespace(text='{"segment": "CASUAL"}', usage_metadata=None)
+
+    provider = GeminiProvider("key")
+    provider._client = SlowModel()
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    task = asyncio.create_task(ticker())
+    try:
+        result = await provider.generate("prompt", {})
+    finally:
+        task.cancel()
+
+    assert result == '{"segment": "CASUAL"}'
+    assert ticks >= 10
+
+
+class StubProvider:
+    """Provider answering after a fixed delay, or failing"""
+
+    def __init__(self, name, delay=0.0, fail=False):
+        self.name = name
+        self.delay = delay
+        self.fail = fail
+        self.cancelled = False
+
+    async def generate(self, prompt, context):
+        import asyncio
+
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.fail:
+            raise LLMError(f"{self.name} down")
+        return self.name
+
+
+def stub_service(monkeypatch, primary, secondary, hedge_delay=0.05):
+    from app.services import llm_service, provider_health, rate_limiter
+
+    monkeypatch.setattr(llm_service.settings, "LLM_HEDGE_DELAY", hedge_delay)
+    monkeypatch.setattr(provider_health, "_registry", {})
+    monkeypatch.setattr(rate_limiter, "_registry", {})
+    service = LLMService("mock_gemini_key", "mock_deepseek_key")
+    service.providers = [primary, secondary]
+    service.response_cache = None
+    return service
+
+
+@pytest.mark.asyncio
+async def test_slow_primary_is_hedged_and_loser_cancelled(monkeypatch):
+    """The secondary fires after the hedge delay and the first answer wins"""
+    import asyncio
+
+    primary = StubProvider("primary", delay=5)
+    secondary = StubProvider("secondary", delay=0.01)
+    service = stub_service(monkeypatch, primary, secondary)
+
+    result = await service.generate_with_fallback("prompt", {})
+    await asyncio.sleep(0)  # Let the cancellation reach the loser
+
+    assert result == "secondary"
+    assert primary.cancelled
+    assert service.current_idx == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_loser_latency_counts_towards_hedge_delay(monkeypatch):
+    """A hedge loser is kept as a latency sample of at least the hedge delay"""
+    import asyncio
+
+    from app.config import settings
+    from app.services.provider_health import provider_health
+
+    primary = StubProvider("primary", delay=5)
+    secondary = StubProvider("secondary", delay=0.01)
+    service = stub_service(monkeypatch, primary, secondary, hedge_delay=0.05)
+    monkeypatch.setattr(settings, "LLM_HEDGE_MIN_SAMPLES", 1)
+
+    await service.generate_with_fallback("prompt", {})
+    await asyncio.sleep(0)  # Let the cancellation reach the loser
+
+    (sample,) = provider_health("primary").latencies
+    assert sample >= 0.05
+    # Slow losers now push the hedge delay up instead of being ignored
+    assert service.hedge_delay(primary) == sample
+    assert provider_health("primary").calls == 0  # Not a success or failure
+
+
+@pytest.mark.asyncio
+async def test_fast_primary_failure_falls_back_without_waiting(monkeypatch):
+    """A primary failing before the hedge delay still falls back"""
+    primary = StubProvider("primary", fail=True)
+    secondary = StubProvider("secondary")
+    service = stub_service(monkeypatch, primary, secondary, hedge_delay=5)
+
+    assert await service.generate_with_fallback("prompt", {}) == "secondary"
+
+
+@pytest.mark.asyncio
+async def test_rules_calls_are_not_hedged_by_default(monkeypatch):
+    """Call types without hedging wait for the primary"""
+    primary = StubProvider("primary", delay=0.1)
+    secondary = StubProvider("secondary")
+    service = stub_service(monkeypatch, primary, secondary, hedge_delay=0.01)
+
+    result = await service.generate_with_fallback("prompt", {}, call_type="rules")
+
+    assert result == "primary"
+
+
+def test_hedge_delay_follows_latency_quantile(monkeypatch):
+    """Once enough samples exist, the delay is the primary's p95 latency"""
+    from app.services.provider_health import provider_health
+
+    service = stub_service(monkeypatch, StubProvider("p"), StubProvider("s"), 3.0)
+    assert service.hedge_delay(service.providers[0]) == 3.0
+
+    provider_health("p").latencies.extend(i / 100 for i in range(1, 101))
+    assert service.hedge_delay(service.providers[0]) == 0.95
+
+
+@pytest.mark.asyncio
+async def test_outage_stops_calling_providers(monkeypatch):
+    """Once both circuits open, calls fail fast without touching providers"""
+    from app.services import llm_service
+    from app.utils.exceptions import ProviderUnavailableError
+
+    monkeypatch.setattr(llm_service.settings, "LLM_BREAKER_FAILURES", 2)
+    calls = []
+
+    class CountingProvider(StubProvider):
+        async def generate(self, prompt, context):
+            calls.append(self.name)
+            return await super().generate(prompt, context)
+
+    primary = CountingProvider("primary", fail=True)
+    secondary = CountingProvider("secondary", fail=True)
+    service = stub_service(monkeypatch, primary, secondary, 5)
+
+    for _ in range(2):
+        with pytest.raises(LLMError):
+            await service.generate_with_fallback("p", {})
+    for _ in range(3):
+        with pytest.raises(ProviderUnavailableError):
+            await service.generate_with_fallback("p", {})
+
+    assert sorted(calls) == ["primary", "primary", "secondary", "secondary"]
+
+
+@pytest.mark.asyncio
+async def test_routing_prefers_faster_provider(monkeypatch):
+    """The provider with the lower latency EWMA is tried first"""
+    from app.services.provider_health import provider_health
+
+    service = stub_service(monkeypatch, StubProvider("slow"), StubProvider("fast"))
+    provider_health("slow").record_success(4.0)
+    provider_health("fast").record_success(0.5)
+
+    assert [p.name for p in service.route()] == ["fast", "slow"]
+    result = await service.generate_with_fallback("p", {}, call_type="rules")
+    assert result == "fast"
+    assert service.current_idx == 1
+
+
+@pytest.mark.asyncio
+async def test_all_circuits_open_fails_fast(monkeypatch):
+    """With every circuit open no provider is called at all"""
+    from app.config import settings
+    from app.services.provider_health import provider_health
+    from app.utils.exceptions import ProviderUnavailableError
+
+    primary, secondary = StubProvider("primary"), StubProvider("secondary")
+    service = stub_service(monkeypatch, primary, secondary)
+    for name in ("primary", "secondary"):
+        health = provider_health(name)
+        for _ in range(settings.LLM_BREAKER_FAILURES):
+            health.record_failure(1.0)
+
+    with pytest.raises(ProviderUnavailableError):
+        await service.generate_with_fallback("p", {})
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_provider_falls_back_without_opening_circuit(
+    monkeypatch,
+):
+    """A 429 moves the call to the next provider but is not a health failure"""
+    from app.config import settings
+    from app.services.provider_health import CLOSED, provider_health
+    from app.services.rate_limiter import provider_limiter
+    from app.utils.exceptions import LLMRateLimitError
+
+    class ThrottledProvider(StubProvider):
+        async def generate(self, prompt, context):
+            raise LLMRateLimitError("slow down")
+
+    monkeypatch.setattr(settings, "LLM_BREAKER_FAILURES", 1)
+    service = stub_service(
+        monkeypatch, ThrottledProvider("primary"), StubProvider("secondary"), 5
+    )
+    limit = provider_limiter("primary").concurrency.limit
+
+    result = await service.generate_with_fallback("p", {}, call_type="rules")
+
+    assert result == "secondary"
+    assert provider_health("primary").state == CLOSED
+    assert provider_limiter("primary").concurrency.limit < limit
+
+
+@pytest.mark.asyncio
+async def test_deepseek_429_raises_rate_limit_error(monkeypatch):
+    """A 429 surfaces as LLMRateLimitError with the Retry-After delay"""
+    import httpx
+    from app.services import llm_service
+    from app.services.llm_service import DeepSeekProvider
+    from app.utils.exceptions import LLMRateLimitError
+    from app.utils.http_client import SharedHTTPClient
+
+    shared = SharedHTTPClient(
+        transport=httpx.MockTransport(
+            lambda request: httpx.Response(429, headers={"Retry-After": "7"})
+        )
+    )
+    monkeypatch.setattr(llm_service, "http_client", shared)
+
+    with pytest.raises(LLMRateLimitError) as excinfo:
+        await DeepSeekProvider("key").generate("prompt", {})
+
+    assert excinfo.value.retry_after == 7.0
+    await shared.close()
@@ -0,0 +1,76 @@
+"""Tests for the compact LLM prompt context encoding"""
+
+import json
+
+from app.services import prompt_context
+from app.services.llm_service import BATCH_SEGMENT_PROMPT, render_prompt
+from app.services.prompt_context import encode_context, estimate_tokens
+
+
+def summary(**counts):
+    return {
+        "total_events": sum(counts.values()),
+        "unique_event_types": sorted(counts),
+        "event_distribution": counts,
+        # Milliseconds, as sent by the tracker
+        "event_durations": {name: count * 1234.567 for name, count in counts.items()},
+        "last_seen_at": "2025-01-30T12:34:56.789012",
+    }
+
+
+def test_encoding_is_canonical_and_compact():
+    """Short sorted keys, seconds, rounded floats, derivable fields dropped"""
+    a = summary(project_click=3, skill_hover=1)
+    b = dict(reversed(list(a.items())))
+
+    encoded = encode_context(a)
+
+    assert encoded == encode_context(b)
+    assert json.loads(encoded) == {
+        "n": 4,
+        "ev": {"project_click": 3, "skill_hover": 1},
+        "dur": {"project_click": 3.7, "skill_hover": 1.2},
+        "seen": "2025-01-30T12:34",
+    }
+    assert " " not in encoded
+
+
+def test_large_maps_keep_top_k_and_sum_the_rest(monkeypatch):
+    """Only the most frequent event types are listed individually"""
+    monkeypatch.setattr(prompt_context.settings, "LLM_CONTEXT_TOP_K", 2)
+
+    encoded = json.loads(
+        encode_context({"event_distribution": dict(a=5, b=9, c=1, d=2)})
+    )
+
+    assert encoded["ev"] == {"b": 9, "a": 5, "other": 3}
+
+
+def test_budget_shrinks_top_k_until_context_fits(monkeypatch):
+    """An oversized batch is cut down to fit the token budget"""
+    monkeypatch.setattr(prompt_context.settings, "LLM_CONTEXT_TOP_K", 8)
+    counts = {f"event_type_{i}": i + 1 for i in range(8)}
+    context = {"visitors": [{"id": f"u{i}", **summary(**counts)} for i in range(20)]}
+    full = estimate_tokens(encode_context(context, budget=10**6))
+
+    encoded = encode_context(context, budget=full // 2)
+
+    assert estimate_tokens(encoded) <= full // 2
+    assert [v["id"] for v in json.loads(encoded)["visitors"]] == [
+        f"u{i}" for i in range(20)
+    ]
+
+
+def test_rendered_batch_prompt_is_smaller_than_raw_json():
+    """The compact context cuts the estimated prompt size of a batch"""
+    context = {
+        "visitors": [
+            {"id": f"u{i}", **summary(project_click=i + 1, section_view=2)}
+            for i in range(20)
+        ]
+    }
+    raw = f"{BATCH_SEGMENT_PROMPT}\n\nContext: {json.dumps(context)}"
+
+    assert estimate_tokens(render_prompt(BATCH_SEGMENT_PROMPT, context)) < (
+        0.8 * estimate_tokens(raw)
+    )
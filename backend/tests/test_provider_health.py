@@ -0,0 +1,96 @@
+from app.services.provider_health import CLOSED, HALF_OPEN, OPEN, ProviderHealth
+from tests.conftest import FakeClock
+
+
+def open_breaker(monkeypatch, failures=3, cooldown=60.0):
+    from app.services import provider_health
+
+    monkeypatch.setattr(provider_health.settings, "LLM_BREAKER_FAILURES", failures)
+    monkeypatch.setattr(provider_health.settings, "LLM_BREAKER_COOLDOWN", cooldown)
+    clock = FakeClock()
+    health = ProviderHealth("test", clock=clock)
+    for _ in range(failures):
+        assert health.acquire()
+        health.record_failure(1.0)
+    return health, clock
+
+
+def test_consecutive_failures_open_circuit(monkeypatch):
+    """The breaker opens at the failure threshold and rejects calls"""
+    health, _ = open_breaker(monkeypatch)
+
+    assert health.state == OPEN
+    assert not health.available()
+    assert not health.acquire()
+
+
+def test_half_open_admits_single_probe(monkeypatch):
+    """After the cooldown one probe goes through; a success closes it"""
+    health, clock = open_breaker(monkeypatch)
+    clock.now += 61
+
+    assert health.available()
+    assert health.acquire()
+    assert health.state == HALF_OPEN
+    assert not health.acquire()
+
+    health.record_success(0.5)
+    assert health.state == CLOSED
+    assert health.acquire()
+
+
+def test_failed_probe_reopens_for_another_cooldown(monkeypatch):
+    """A failing probe keeps the circuit open until the next interval"""
+    health, clock = open_breaker(monkeypatch)
+    clock.now += 61
+    assert health.acquire()
+
+    health.record_failure(1.0)
+
+    assert health.state == OPEN
+    assert not health.acquire()
+    clock.now += 61
+    assert health.acquire()
+
+
+def test_cancelled_probe_is_released(monkeypatch):
+    """A probe cancelled mid-flight lets the next call probe instead"""
+    health, clock = open_breaker(monkeypatch)
+    clock.now += 61
+    assert health.acquire()
+
+    health.release()
+
+    assert health.acquire()
+
+
+def test_error_rate_opens_circuit_without_consecutive_failures(monkeypatch):
+    """Intermittent failures open the circuit once the error rate is high"""
+    from app.services import provider_health
+
+    monkeypatch.setattr(provider_health.settings, "LLM_BREAKER_MIN_CALLS", 4)
+    monkeypatch.setattr(provider_health.settings, "LLM_BREAKER_ERROR_RATE", 0.4)
+    health = ProviderHealth("test", clock=FakeClock())
+
+    for failed in [True, True, False] * 3:
+        if health.state == OPEN:
+            break
+        if failed:
+            health.record_failure(1.0)
+        else:
+            health.record_success(1.0)
+
+    assert health.state == OPEN
+    assert health.consecutive_failures < provider_health.settings.LLM_BREAKER_FAILURES
+
+
+def test_score_penalizes_errors_and_latency():
+    """Slower or less reliable providers get a higher expected cost"""
+    fast, slow, flaky = (ProviderHealth(n) for n in ("fast", "slow", "flaky"))
+    fast.record_success(0.5)
+    slow.record_success(3.0)
+    flaky.record_success(0.5)
+    flaky.record_failure(0.5)
+
+    assert fast.score() < flaky.score()
+    assert fast.score() < slow.score()
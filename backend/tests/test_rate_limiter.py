@@ -0,0 +1,96 @@
+"""Tests for the LLM token buckets and adaptive concurrency limits"""
+
+import asyncio
+
+import pytest
+
+from app.services import rate_limiter
+from app.services.rate_limiter import (
+    OVERLOAD,
+    SUCCESS,
+    AdaptiveConcurrency,
+    ProviderLimiter,
+    TokenBucket,
+)
+from app.utils.exceptions import LLMRateLimitError
+from tests.conftest import FakeClock
+
+
+@pytest.mark.asyncio
+async def test_local_bucket_allows_burst_then_paces():
+    """Without Redis a full bucket admits a burst, then refills at the rate"""
+    clock = FakeClock()
+    bucket = TokenBucket("test", per_minute=60, burst=3, clock=clock)
+
+    assert [await bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert await bucket.reserve() == pytest.approx(1.0)
+
+    clock.now += 1
+    assert await bucket.reserve() == 0.0
+
+
+@pytest.mark.asyncio
+async def test_bucket_pause_holds_tokens_back():
+    """A Retry-After pause delays the next token even with tokens left"""
+    clock = FakeClock()
+    bucket = TokenBucket("test", per_minute=600, burst=10, clock=clock)
+
+    await bucket.pause(5)
+
+    assert await bucket.reserve() == pytest.approx(5.0)
+    clock.now += 5
+    assert await bucket.reserve() == 0.0
+
+
+@pytest.mark.asyncio
+async def test_aimd_grows_on_success_and_halves_once_per_burst(monkeypatch):
+    """Successes add ~1 slot per round; one burst of 429s halves the limit once"""
+    monkeypatch.setattr(rate_limiter.settings, "LLM_AIMD_INITIAL", 4)
+    clock = FakeClock()
+    limiter = AdaptiveConcurrency("test", clock=clock)
+
+    for _ in range(4):
+        limiter.release(await limiter.acquire(), SUCCESS)
+    assert int(limiter.limit) == 4 and limiter.limit > 4.9
+
+    started = [await limiter.acquire() for _ in range(3)]
+    clock.now += 1
+    for start in started:
+        limiter.release(start, OVERLOAD)
+
+    assert 2 <= limiter.limit < 3
+
+
+@pytest.mark.asyncio
+async def test_acquire_waits_for_a_free_slot(monkeypatch):
+    """Calls beyond the limit wait until a running call finishes"""
+    monkeypatch.setattr(rate_limiter.settings, "LLM_AIMD_INITIAL", 1)
+    limiter = AdaptiveConcurrency("test")
+    started = await limiter.acquire()
+
+    waiting = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+    assert not waiting.done()
+
+    limiter.release(started, SUCCESS)
+    await asyncio.wait_for(waiting, 1)
+    assert limiter.in_flight == 1
+
+
+@pytest.mark.asyncio
+async def test_slot_fails_fast_when_bucket_wait_is_too_long(monkeypatch):
+    """An empty bucket raises instead of queueing past LLM_RATE_MAX_WAIT"""
+    monkeypatch.setattr(rate_limiter.settings, "LLM_RATE_PER_MINUTE", {"test": 1})
+    monkeypatch.setattr(rate_limiter.settings, "LLM_RATE_BURST", 1)
+    monkeypatch.setattr(rate_limiter.settings, "LLM_RATE_MAX_WAIT", 0.5)
+    limiter = ProviderLimiter("test")
+    calls = []
+
+    async with limiter.slot():
+        calls.append(1)
+    with pytest.raises(LLMRateLimitError):
+        async with limiter.slot():
+            calls.append(2)
+
+    assert calls == [1]
+    assert limiter.concurrency.in_flight == 0
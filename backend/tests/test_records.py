@@ -0,0 +1,70 @@
+"""Tests for the read-only segment and rules records"""
+
+import dataclasses
+import pytest
+from datetime import datetime
+from types import SimpleNamespace
+
+from app.models.records import SegmentRecord, RulesRecord
+
+
+def test_segment_record_is_frozen_and_slotted(sample_segment_data):
+    """Records cannot be mutated and carry no per-instance __dict__"""
+    record = SegmentRecord(**sample_segment_data)
+
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        record.segment = "CASUAL"
+    assert not hasattr(record, "__dict__")
+
+
+def test_segment_record_cache_round_trip(sample_segment_data):
+    """to_cache/from_cache and to_json/from_json preserve every field"""
+    record = SegmentRecord(
+        **sample_segment_data, expires_at=datetime(2025, 1, 19, 10, 0), id=7
+    )
+
+    assert SegmentRecord.from_cache(record.to_cache()) == record
+    assert SegmentRecord.from_json(record.to_json()) == record
+    assert record.to_cache()["expires_at"] == "2025-01-19T10:00:00"
+
+
+def test_segment_record_from_row_fills_defaults():
+    """NULL columns map onto record defaults"""
+    row = SimpleNamespace(
+        user_pseudo_id="user_001",
+        segment="STUDENT",
+        confidence=None,
+        reasoning=None,
+        xai_explanation=None,
+        event_summary=None,
+        expires_at=None,
+    )
+
+    record = SegmentRecord.from_row(row)
+
+    assert record.confidence == 0.5
+    assert record.reasoning == ""
+    assert record.xai_explanation == {}
+    assert record.id is None
+
+
+def test_rules_record_cache_round_trip(sample_rules_data):
+    """Rules survive a trip through the cache format"""
+    record = RulesRecord(**sample_rules_data)
+
+    assert RulesRecord.from_cache(record.to_cache()) == record
+    assert RulesRecord.cache_key("ML_ENGINEER") == "personalization_rules:ML_ENGINEER"
+
+
+def test_select_columns_match_record_fields():
+    """Column selects line up with record fields by name"""
+    segment_columns = [c.key for c in SegmentRecord.select_columns()]
+    rules_columns = [c.key for c in RulesRecord.select_columns()]
+
+    assert segment_columns == [f.name for f in dataclasses.fields(SegmentRecord)]
+    assert rules_columns == [
+        f.name for f in dataclasses.fields(RulesRecord) if f.name != "input_summary"
+    ]
+    assert "input_summary" in [
+        c.key for c in RulesRecord.select_columns(input_summary=True)
+    ]
@@ -0,0 +1,139 @@
+"""Tests for adaptive segment lifetimes and the re-segmentation queue"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from app.config import settings
+from app.database.models import AnalyticsRaw, ResegmentQueue
+from app.services.resegment_queue import (
+    adaptive_ttl,
+    claim_due_users,
+    enqueue_active_users,
+    release_claims,
+)
+
+
+def test_fresh_ttl_scales_with_confidence():
+    """Confident segments live longer than doubtful ones"""
+    assert adaptive_ttl(0.5) == timedelta(hours=settings.SEGMENT_TTL_HOURS)
+    assert adaptive_ttl(0.9) > adaptive_ttl(0.5) > adaptive_ttl(0.3)
+
+
+def test_stable_ttl_doubles_up_to_the_maximum():
+    """Each unchanged re-check doubles the lifetime until the cap"""
+    assert adaptive_ttl(0.5, timedelta(hours=24)) == timedelta(hours=48)
+    assert adaptive_ttl(0.5, timedelta(days=30)) == timedelta(
+        hours=settings.SEGMENT_TTL_MAX_HOURS
+    )
+
+
+def test_ttl_never_drops_below_the_minimum():
+    """Zero-confidence segments still get the minimum lifetime"""
+    assert adaptive_ttl(0.0, None) >= timedelta(hours=settings.SEGMENT_TTL_MIN_HOURS)
+    assert adaptive_ttl(0.0, timedelta(minutes=1)) == timedelta(
+        hours=settings.SEGMENT_TTL_MIN_HOURS
+    )
+
+
+def queued(user_id, due_in_hours, confidence=0.5, active=False, run_id=None):
+    return ResegmentQueue(
+        user_pseudo_id=user_id,
+        due_at=datetime.utcnow() + timedelta(hours=due_in_hours),
+        confidence=confidence,
+        active=active,
+        claimed_by_run=run_id,
+    )
+
+
+async def queue_rows(session):
+    rows = (await session.execute(select(ResegmentQueue))).scalars().all()
+    return {row.user_pseudo_id: row for row in rows}
+
+
+@pytest.mark.asyncio
+async def test_enqueue_active_users_upserts_users_with_new_events(session_factory):
+    """Only events in (low, high] make users due; queued users keep confidence"""
+    async with session_factory() as session:
+        session.add(queued("known", due_in_hours=48, confidence=0.8))
+        session.add_all(
+            AnalyticsRaw(
+                id=event_id,
+                ga4_event_id=f"e{event_id}",
+                event_name="page_view",
+                user_pseudo_id=user_id,
+            )
+            for event_id, user_id in [
+                (1, "old"),
+                (2, "known"),
+                (3, "known"),
+                (4, "new"),
+                (5, "later"),
+            ]
+        )
+        await session.commit()
+
+        assert await enqueue_active_users(session, low=1, high=4) == 2
+        await session.commit()
+
+        rows = await queue_rows(session)
+    assert set(rows) == {"known", "new"}
+    assert all(row.active and row.due_at <= datetime.utcnow() for row in rows.values())
+    assert rows["known"].confidence == 0.8
+    assert rows["new"].confidence == 0.0
+
+
+@pytest.mark.asyncio
+async def test_claim_due_users_takes_most_urgent_first_up_to_limit(session_factory):
+    """Active users first, then lowest confidence, then longest overdue"""
+    async with session_factory() as session:
+        session.add_all(
+            [
+                queued("stale_confident", due_in_hours=-5, confidence=0.9),
+                queued("doubtful", due_in_hours=-1, confidence=0.2),
+                queued("overdue", due_in_hours=-3, confidence=0.5),
+                queued("recent", due_in_hours=-1, confidence=0.5),
+                queued("active", due_in_hours=-1, confidence=0.9, active=True),
+                queued("not_due", due_in_hours=5, confidence=0.0, active=True),
+            ]
+        )
+        await session.commit()
+
+        claimed = [await claim_due_users(session, 1, run_id=7) for _ in range(3)]
+        rest = await claim_due_users(session, 10, run_id=8)
+        assert await claim_due_users(session, 10) == []
+
+        rows = await queue_rows(session)
+    assert claimed == [["active"], ["doubtful"], ["overdue"]]
+    assert sorted(rest) == ["recent", "stale_confident"]
+    lease = datetime.utcnow() + timedelta(seconds=settings.RESEGMENT_CLAIM_LEASE)
+    for user_id in ("active", "doubtful", "overdue"):
+        assert rows[user_id].claimed_by_run == 7
+        assert not rows[user_id].active
+        assert abs(rows[user_id].due_at - lease) < timedelta(minutes=1)
+    assert rows["not_due"].claimed_by_run is None
+
+
+@pytest.mark.asyncio
+async def test_release_claims_only_frees_the_given_run(session_factory):
+    """A resumed run's claims become due now; other runs keep theirs"""
+    async with session_factory() as session:
+        session.add_all(
+            [
+                queued("mine_a", due_in_hours=1, run_id=7),
+                queued("mine_b", due_in_hours=1, run_id=7),
+                queued("theirs", due_in_hours=1, run_id=8),
+            ]
+        )
+        await session.commit()
+
+        assert await release_claims(session, 7) == 2
+        await session.commit()
+
+        rows = await queue_rows(session)
+    now = datetime.utcnow()
+    assert [rows[u].claimed_by_run for u in ("mine_a", "mine_b")] == [None, None]
+    assert rows["mine_a"].due_at <= now and rows["mine_b"].due_at <= now
+    assert rows["theirs"].claimed_by_run == 8
+    assert rows["theirs"].due_at > now
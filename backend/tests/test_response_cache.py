@@ -0,0 +1,131 @@
+"""Tests for the persistent LLM response cache"""
+
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select, update
+
+from app.database.models import LLMResponseCache
+from app.services.llm_service import LLMService, render_prompt
+from app.services.response_cache import ResponseCache, cache_key
+
+
+class CountingProvider:
+    def __init__(self, name, response):
+        self.name = name
+        self.model_name = f"{name}-model"
+        self.response = response
+        self.calls = 0
+
+    async def generate(self, prompt, context):
+        self.calls += 1
+        return self.response
+
+
+def cached_service(monkeypatch, session_factory, *providers):
+    from app.services import provider_health, rate_limiter
+
+    monkeypatch.setattr(provider_health, "_registry", {})
+    monkeypatch.setattr(rate_limiter, "_registry", {})
+    service = LLMService("mock_gemini_key", "mock_deepseek_key")
+    service.providers = list(providers)
+    service.response_cache = ResponseCache(session_factory)
+    return service
+
+
+@pytest.mark.asyncio
+async def test_get_prefers_first_cached_key_and_counts_hits(session_factory):
+    """Lookups follow the key order and bump the hit counter"""
+    cache = ResponseCache(session_factory)
+    await cache.put("b", "model-b", "from b")
+    await cache.put("c", "model-c", "from c")
+
+    assert await cache.get(["a", "b", "c"]) == "from b"
+    assert await cache.get(["a"]) is None
+
+    async with session_factory() as session:
+        hits = await session.scalar(
+            select(LLMResponseCache.hits).where(LLMResponseCache.key == "b")
+        )
+    assert hits == 1
+
+
+@pytest.mark.asyncio
+async def test_evict_drops_expired_then_least_recently_hit(session_factory):
+    """Expired rows go first, then the oldest hits beyond the cap"""
+    cache = ResponseCache(session_factory)
+    now = datetime.utcnow()
+    for i, key in enumerate(["old", "mid", "new", "expired"]):
+        await cache.put(key, "m", key)
+        async with session_factory() as session:
+            await session.execute(
+                update(LLMResponseCache)
+                .where(LLMResponseCache.key == key)
+                .values(last_hit_at=now + timedelta(minutes=i))
+            )
+            await session.commit()
+    async with session_factory() as session:
+        await session.execute(
+            update(LLMResponseCache)
+            .where(LLMResponseCache.key == "expired")
+            .values(expires_at=now - timedelta(seconds=1))
+        )
+        await session.commit()
+
+    assert await cache.get(["expired"]) is None
+    assert await cache.evict(max_entries=2) == 2
+
+    async with session_factory() as session:
+        keys = set((await session.scalars(select(LLMResponseCache.key))).all())
+    assert keys == {"mid", "new"}
+
+
+@pytest.mark.asyncio
+async def test_identical_request_is_answered_from_cache(monkeypatch, session_factory):
+    """The second identical call costs no provider request"""
+    provider = CountingProvider("p", json.dumps({"segment": "STUDENT"}))
+    service = cached_service(monkeypatch, session_factory, provider)
+
+    first = await service.generate_with_fallback("prompt", {"a": 1})
+    second = await service.generate_with_fallback("prompt", {"a": 1})
+    await service.generate_with_fallback("prompt", {"a": 2})
+
+    assert first == second
+    assert provider.calls == 2
+    key = cache_key("p-model", render_prompt("prompt", {"a": 1}))
+    assert await ResponseCache(session_factory).get([key]) == first
+
+
+@pytest.mark.asyncio
+async def test_bypass_and_malformed_responses_skip_the_cache(
+    monkeypatch, session_factory
+):
+    """use_cache=False always calls; non-JSON answers are never stored"""
+    good = CountingProvider("good", json.dumps({"segment": "STUDENT"}))
+    service = cached_service(monkeypatch, session_factory, good)
+    await service.generate_with_fallback("prompt", {})
+    await service.generate_with_fallback("prompt", {}, use_cache=False)
+    assert good.calls == 2
+
+    bad = CountingProvider("bad", "sorry, I cannot help")
+    service = cached_service(monkeypatch, session_factory, bad)
+    await service.generate_with_fallback("prompt", {})
+    await service.generate_with_fallback("prompt", {})
+    assert bad.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_callers_can_bypass_the_cache(monkeypatch, session_factory):
+    """use_cache=False reaches the provider from every public entry point"""
+    provider = CountingProvider("p", json.dumps({"segment": "STUDENT"}))
+    service = cached_service(monkeypatch, session_factory, provider)
+    summaries = {"a": {"total_events": 1}, "b": {"total_events": 2}}
+
+    for _ in range(2):
+        await service.segment_user(summaries["a"], use_cache=False)
+        await service.segment_users_batch(summaries, use_cache=False)
+        await service.generate_rules({}, "STUDENT", use_cache=False)
+
+    # The batch answer names no visitors, so it is split down to one call each
+    assert provider.calls == 2 * (1 + 3 + 1)
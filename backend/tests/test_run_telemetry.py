@@ -0,0 +1,94 @@
+"""Tests for analysis run telemetry"""
+
+import asyncio
+
+import pytest
+
+from app.services.run_telemetry import (
+    RunTelemetry,
+    compare_runs,
+    phase,
+    record_cache,
+    record_llm_call,
+    record_llm_tokens,
+)
+
+
+@pytest.mark.asyncio
+async def test_worker_tasks_record_into_the_active_run():
+    """Tasks spawned while a run is active add to its phases and LLM usage"""
+    telemetry = RunTelemetry()
+
+    async def worker():
+        with phase("llm_classification"):
+            await asyncio.sleep(0.01)
+        record_llm_call("gemini", True, 0.5)
+        record_llm_call("gemini", False, 0.25)
+        record_llm_tokens("gemini", 120, 30)
+        record_cache("segment_memo", hits=3, misses=1)
+
+    with telemetry.active():
+        await asyncio.gather(worker(), worker())
+    # Recording outside an active run is a no-op for the telemetry
+    record_llm_call("gemini", True, 1.0)
+
+    snapshot = telemetry.snapshot(users_done=10, users_failed=1)
+    assert snapshot["phase_seconds"]["llm_classification"] >= 0.02
+    assert snapshot["llm"]["gemini"] == {
+        "calls": 4,
+        "failures": 2,
+        "prompt_tokens": 240,
+        "completion_tokens": 60,
+        "seconds": 1.5,
+    }
+    assert snapshot["cache"]["segment_memo"] == {
+        "hits": 6,
+        "misses": 2,
+        "hit_ratio": 0.75,
+    }
+    assert snapshot["users_per_sec"] > 0
+
+
+def test_resumed_telemetry_continues_from_snapshot():
+    """A resumed run keeps accumulating on top of its stored snapshot"""
+    stored = {
+        "elapsed_seconds": 30.0,
+        "phase_seconds": {"db_write": 2.0},
+        "llm": {"deepseek": {"calls": 5, "seconds": 4.0}},
+        "cache": {"user_segment": {"hits": 1, "misses": 1, "hit_ratio": 0.5}},
+    }
+    telemetry = RunTelemetry(stored)
+    with telemetry.active():
+        record_llm_call("deepseek", True, 1.0)
+        record_cache("user_segment", hits=2, misses=0)
+
+    snapshot = telemetry.snapshot(users_done=60)
+    assert snapshot["elapsed_seconds"] >= 30.0
+    assert snapshot["phase_seconds"] == {"db_write": 2.0}
+    assert snapshot["llm"]["deepseek"]["calls"] == 6
+    assert snapshot["cache"]["user_segment"]["hit_ratio"] == 0.75
+
+
+def test_compare_runs_flags_slow_phases_and_throughput():
+    """Runs are compared against the median of the window"""
+
+    def run(llm_seconds, users_per_sec):
+        return {
+            "elapsed_seconds": 10.0,
+            "users_done": 100,
+            "users_per_sec": users_per_sec,
+            "phase_seconds": {"llm_classification": llm_seconds, "db_write": 1.0},
+        }
+
+    comparison = compare_runs(
+        [run(9.0, 4.0), run(3.0, 10.0), run(3.2, 11.0), run(2.9, 10.5)], factor=1.5
+    )
+
+    assert comparison["baseline"]["phase_seconds"]["llm_classification"] == 3.1
+    assert comparison["baseline"]["phase_seconds"]["event_fetch"] is None
+    assert comparison["regressions"] == [
+        ["llm_classification", "users_per_sec"],
+        [],
+        [],
+        [],
+    ]
@@ -113,6 +113,26 @@ class TestInputValidation:
         )
         assert "data" in event.event_params
 
+    def test_non_numeric_duration_is_rejected(self):
+        """Test that duration and time_spent must be JSON numbers."""
+        for params in ({"duration": "abc"}, {"time_spent": True}):
+            with pytest.raises(ValidationError) as exc_info:
+                ValidatedEvent(
+                    event_name="deep_read",
+                    user_pseudo_id="user123",
+                    event_params=params,
+                    event_timestamp=1705600000000,
+                )
+            assert "must be a number" in str(exc_info.value)
+
+        event = ValidatedEvent(
+            event_name="deep_read",
+            user_pseudo_id="user123",
+            event_params={"duration": 1500, "time_spent": 2.5},
+            event_timestamp=1705600000000,
+        )
+        assert event.event_params["duration"] == 1500
+
     def test_negative_event_timestamp(self):
         """Test that negative event_timestamp is rejected."""
         with pytest.raises(ValidationError) as exc_info:
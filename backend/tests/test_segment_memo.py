@@ -0,0 +1,72 @@
+"""Tests for behavior fingerprints and the segment memo"""
+
+import pytest
+from app.services.segment_memo import (
+    SegmentMemo,
+    behavior_fingerprint,
+    bucket_count,
+)
+from app.services.analysis_engine import AnalysisEngine
+
+
+def summary(**counts):
+    return {"total_events": sum(counts.values()), "event_distribution": counts}
+
+
+def test_bucket_count_is_log_scale():
+    """Counts collapse into power-of-two buckets"""
+    assert [bucket_count(n) for n in (0, 1, 2, 3, 4, 7, 8)] == [0, 1, 2, 2, 3, 3, 4]
+
+
+def test_near_duplicate_summaries_share_a_fingerprint():
+    """Counts in the same bucket and key order do not change the hash"""
+    a = summary(project_click=5, skill_hover=2)
+    b = summary(skill_hover=3, project_click=6)
+
+    assert behavior_fingerprint(a) == behavior_fingerprint(b)
+
+
+def test_different_behavior_changes_the_fingerprint():
+    """Crossing a bucket boundary or adding an event type changes the hash"""
+    base = behavior_fingerprint(summary(project_click=5))
+
+    assert behavior_fingerprint(summary(project_click=8)) != base
+    assert behavior_fingerprint(summary(project_click=5, contact_intent=1)) != base
+
+
+class FakeMemo(SegmentMemo):
+    """In-memory memo for engine tests"""
+
+    def __init__(self):
+        super().__init__(ttl=60)
+        self.store = {}
+
+    async def get_many(self, fingerprints):
+        return {fp: self.store[fp] for fp in fingerprints if fp in self.store}
+
+    async def set_many(self, results):
+        self.store.update(
+            {fp: data for fp, data in results.items() if not data.get("is_default")}
+        )
+        return True
+
+
+@pytest.mark.asyncio
+async def test_engine_reuses_memoized_segments():
+    """A second user with the same fingerprint skips the LLM"""
+    llm_calls = []
+
+    class FakeLLM:
+        async def segment_users_batch(self, summaries, batch_size=None):
+            llm_calls.append(list(summaries))
+            return {user_id: {"segment": "STUDENT"} for user_id in summaries}
+
+    engine = AnalysisEngine(None, FakeLLM(), None, memo=FakeMemo())
+
+    await engine._classify_summaries({"user_a": summary(project_click=4)})
+    results = await engine._classify_summaries({"user_b": summary(project_click=5)})
+
+    assert llm_calls == [["user_a"]]
+    assert results["user_b"][0]["segment"] == "STUDENT"
+    assert engine.decisions["memo"] == 1
+    assert engine.llm_bypass_ratio() == 0.5
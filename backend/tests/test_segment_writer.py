@@ -0,0 +1,59 @@
+"""Tests for the batched segment writer and upsert helper"""
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.database.models import UserSegment
+from app.database.upsert import upsert_statement
+from app.models.records import SegmentRecord
+from app.services.segment_writer import SegmentWriter
+from tests.conftest import FakeSession
+
+
+def test_upsert_statement_conflicts_on_user_pseudo_id():
+    """Rows are written as one INSERT ... ON CONFLICT DO UPDATE"""
+    rows = [
+        SegmentRecord(f"user_{i}", "STUDENT", confidence=0.8).to_row() for i in range(3)
+    ]
+
+    stmt = upsert_statement(
+        FakeSession(), UserSegment, rows, index_elements=["user_pseudo_id"]
+    )
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+
+    assert sql.count("INSERT INTO user_segments") == 1
+    assert "ON CONFLICT (user_pseudo_id) DO UPDATE" in sql
+    assert "segment = excluded.segment" in sql
+    assert "user_pseudo_id = excluded.user_pseudo_id" not in sql
+
+
+def test_upsert_statement_rejects_unknown_dialect():
+    """Dialects without ON CONFLICT support fail loudly"""
+    with pytest.raises(NotImplementedError):
+        upsert_statement(
+            FakeSession(dialect_name="mysql"),
+            UserSegment,
+            [{"user_pseudo_id": "u"}],
+            index_elements=["user_pseudo_id"],
+        )
+
+
+def test_writer_buffers_until_full_and_dedups_users():
+    """A repeated user replaces its pending record instead of adding a row"""
+    writer = SegmentWriter(FakeSession(), flush_size=2)
+
+    writer.add([SegmentRecord("user_a", "CASUAL")])
+    writer.add([SegmentRecord("user_a", "RECRUITER")])
+    assert len(writer) == 1
+    assert not writer.full
+
+    writer.add([SegmentRecord("user_b", "STUDENT")])
+    assert writer.full
+
+
+@pytest.mark.asyncio
+async def test_flush_with_nothing_pending_is_a_no_op():
+    """An empty writer never touches the session"""
+    writer = SegmentWriter(FakeSession())
+
+    assert await writer.flush() == []
@@ -0,0 +1,29 @@
+"""Tests for the standalone analysis worker"""
+
+import asyncio
+import os
+import signal
+
+import pytest
+
+from app import worker
+
+
+@pytest.mark.asyncio
+async def test_worker_runs_scheduler_until_sigterm(monkeypatch):
+    """The worker owns the scheduler and stops it cleanly on SIGTERM"""
+    calls = []
+
+    async def noop():
+        pass
+
+    monkeypatch.setattr(worker, "start_scheduler", lambda: calls.append("start"))
+    monkeypatch.setattr(worker, "stop_scheduler", lambda: calls.append("stop"))
+    monkeypatch.setattr(worker.cache, "connect", noop)
+    monkeypatch.setattr(worker.cache, "disconnect", noop)
+    monkeypatch.setattr(worker.settings, "WORKER_METRICS_PORT", 0)
+
+    asyncio.get_running_loop().call_later(0.05, os.kill, os.getpid(), signal.SIGTERM)
+    await asyncio.wait_for(worker.run_worker(), timeout=5)
+
+    assert calls == ["start", "stop"]